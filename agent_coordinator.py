@@ -0,0 +1,344 @@
+"""
+Coordinator for distributed grading agents.
+
+For large events checks can be run by grading agents (grading_agent.py) on
+other machines, e.g. one per network segment, instead of by the scoring
+server itself. The coordinator keeps a queue of check specs (see checks.py);
+agents register over the /api/agents routes in main.py, lease batches of
+checks they can reach, and post results back in bulk. Results are applied
+to the ScoreStore here.
+
+Every lease has a deadline. Checks from a lease that expires before its
+results arrive (for example because the agent died) go back to the front of
+the queue for another agent. The first result for a check wins; late
+duplicates are ignored.
+
+With a probe budget (``rate_limits``, see rate_limiter.py) a check is only
+leased once its slot against its host's and subnet's budgets comes up, so
+agents probe at the same pace the server would.
+"""
+
+import heapq
+import ipaddress
+import itertools
+import secrets
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from rate_limiter import ProbeBudget
+
+
+class _Item:
+    """One queued or leased check."""
+
+    __slots__ = ("id", "spec", "callback", "address", "lease", "done", "attempts")
+
+    def __init__(self, item_id: int, spec: Dict[str, Any], callback):
+        self.id = item_id
+        self.spec = spec
+        self.callback = callback
+        try:
+            self.address = ipaddress.ip_address(spec.get('ip'))
+        except ValueError:
+            self.address = None
+        self.lease: Optional["_Lease"] = None
+        self.done = False
+        self.attempts = 0
+
+
+class _Lease:
+    __slots__ = ("id", "agent", "deadline", "items")
+
+    def __init__(self, lease_id: str, agent: "_Agent", deadline: float):
+        self.id = lease_id
+        self.agent = agent
+        self.deadline = deadline
+        self.items: Dict[int, _Item] = {}
+
+
+class _Agent:
+    __slots__ = ("id", "name", "networks", "registered_at", "last_seen", "leases",
+                 "completed")
+
+    def __init__(self, agent_id: str, name: str, networks):
+        self.id = agent_id
+        self.name = name
+        self.networks = networks
+        self.registered_at = time.time()
+        self.last_seen = time.monotonic()
+        self.leases: Dict[str, _Lease] = {}
+        self.completed = 0
+
+    def can_reach(self, item: _Item) -> bool:
+        if not self.networks:
+            return True
+        if item.address is None:
+            return False
+        return any(item.address in network for network in self.networks)
+
+
+class AgentCoordinator:
+    """Hands out check leases to grading agents and collects their results."""
+
+    def __init__(self, on_result: Callable[[Dict[str, Any], bool, str, float], None],
+                 token: str, lease_seconds: float = 60, batch_size: int = 50,
+                 long_poll_seconds: float = 10, budget: Optional[ProbeBudget] = None):
+        self.on_result = on_result
+        self.token = token
+        self.lease_seconds = float(lease_seconds)
+        self.batch_size = max(1, int(batch_size))
+        self.long_poll_seconds = max(0.0, float(long_poll_seconds))
+        # Agents that miss two lease periods are forgotten
+        self.agent_timeout = 2 * self.lease_seconds
+        self.budget = budget
+
+        self._cond = threading.Condition()
+        self._queue: deque = deque()
+        # Checks waiting for their probe budget: (due, id, item)
+        self._held: List[tuple] = []
+        self._outstanding: Dict[int, _Item] = {}
+        self._agents: Dict[str, _Agent] = {}
+        self._ids = itertools.count(1)
+        self._reaper = None
+        self._stopped = False
+
+    @classmethod
+    def from_config(cls, config_loader, on_result) -> "AgentCoordinator":
+        agents = config_loader.get_agents_config()
+        return cls(
+            on_result,
+            token=agents.get('token', ''),
+            lease_seconds=agents.get('lease_seconds', 60),
+            batch_size=agents.get('batch_size', 50),
+            long_poll_seconds=agents.get('long_poll_seconds', 10),
+            budget=ProbeBudget.from_config(config_loader),
+        )
+
+    def check_token(self, token: Optional[str]) -> bool:
+        """Constant-time comparison against the configured agent token."""
+        if not self.token or not token:
+            return False
+        return secrets.compare_digest(token.encode("utf-8"), self.token.encode("utf-8"))
+
+    def start(self):
+        """Start the thread that expires leases and forgets dead agents."""
+        if self._reaper is not None:
+            return
+
+        def reap_loop():
+            while not self._stopped:
+                time.sleep(1.0)
+                with self._cond:
+                    self._reap(time.monotonic())
+
+        self._reaper = threading.Thread(target=reap_loop, daemon=True)
+        self._reaper.start()
+
+    # --- Executor interface used by the Grader ---
+
+    def submit(self, spec: Dict[str, Any], callback: Optional[Callable[[Any, float], None]] = None):
+        """
+        Queue ``spec`` for the next agent that can reach it.
+        ``callback(result, elapsed_seconds)`` runs once its result arrives.
+        """
+        delay = self.budget.reserve(spec['ip']) if self.budget is not None and spec.get('ip') else 0.0
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("AgentCoordinator has been stopped")
+            item = _Item(next(self._ids), spec, callback)
+            self._outstanding[item.id] = item
+            if delay > 0:
+                heapq.heappush(self._held, (time.monotonic() + delay, item.id, item))
+            else:
+                self._queue.append(item)
+            self._cond.notify_all()
+
+    def pending_count(self) -> int:
+        """Number of checks queued or leased and not yet answered."""
+        with self._cond:
+            return len(self._outstanding)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every submitted check has a result."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._outstanding:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    # --- Agent API (called from the routes in main.py) ---
+
+    def register(self, name: str, networks: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Register an agent. ``networks`` optionally limits it to checks whose
+        target address is in one of the given CIDR ranges.
+        Raises ValueError for an invalid network.
+        """
+        parsed = [ipaddress.ip_network(network, strict=False) for network in (networks or [])]
+        agent = _Agent(secrets.token_hex(8), str(name or "agent"), parsed)
+        with self._cond:
+            self._agents[agent.id] = agent
+        print(f"Grading agent {agent.name} ({agent.id}) registered"
+              + (f" for {', '.join(map(str, parsed))}" if parsed else ""))
+        return {
+            "agent_id": agent.id,
+            "lease_seconds": self.lease_seconds,
+            "batch_size": self.batch_size,
+            "long_poll_seconds": self.long_poll_seconds,
+        }
+
+    def lease(self, agent_id: str, max_checks: Optional[int] = None,
+              wait: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Lease up to ``max_checks`` checks, waiting up to ``wait`` seconds for
+        work if none is queued. Returns None if the agent is unknown.
+        """
+        limit = self.batch_size if max_checks is None else max(0, min(int(max_checks), self.batch_size))
+        wait = self.long_poll_seconds if wait is None else max(0.0, min(float(wait), self.long_poll_seconds))
+        deadline = time.monotonic() + wait
+
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._reap(now)
+                agent = self._agents.get(agent_id)
+                if agent is None:
+                    return None
+                agent.last_seen = now
+
+                next_due = self._release_held(now)
+                batch = self._take(agent, limit)
+                if batch or now >= deadline or self._stopped:
+                    break
+                self._cond.wait(deadline - now if next_due is None else min(deadline - now, next_due))
+
+            if not batch:
+                return {"lease_id": None, "checks": [], "expires_in": 0}
+
+            lease = _Lease(secrets.token_hex(8), agent, time.monotonic() + self.lease_seconds)
+            for item in batch:
+                item.lease = lease
+                item.attempts += 1
+                lease.items[item.id] = item
+            agent.leases[lease.id] = lease
+            return {
+                "lease_id": lease.id,
+                "checks": [{"id": item.id, "spec": item.spec} for item in batch],
+                "expires_in": self.lease_seconds,
+            }
+
+    def _release_held(self, now: float) -> Optional[float]:
+        # Caller holds self._cond. Returns seconds until the next held check
+        # is due, or None if nothing is held.
+        while self._held and self._held[0][0] <= now:
+            self._queue.append(heapq.heappop(self._held)[2])
+        return self._held[0][0] - now if self._held else None
+
+    def _take(self, agent: _Agent, limit: int) -> List[_Item]:
+        # Caller holds self._cond. Keeps the order of checks this agent skips.
+        batch = []
+        skipped = []
+        while self._queue and len(batch) < limit:
+            item = self._queue.popleft()
+            if item.done:
+                continue
+            if agent.can_reach(item):
+                batch.append(item)
+            else:
+                skipped.append(item)
+        self._queue.extendleft(reversed(skipped))
+        return batch
+
+    def complete(self, agent_id: str, results: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Record results posted by an agent. Each result is
+        ``{"id", "ok", "message", "elapsed"}``. Returns how many were
+        accepted, or None if the agent is unknown.
+        """
+        finished = []
+        with self._cond:
+            agent = self._agents.get(agent_id)
+            if agent is None:
+                return None
+            agent.last_seen = time.monotonic()
+            for result in results:
+                try:
+                    item = self._outstanding.pop(int(result["id"]))
+                except (KeyError, TypeError, ValueError):
+                    # Unknown, or already answered after being reassigned
+                    continue
+                item.done = True
+                if item.lease is not None:
+                    item.lease.items.pop(item.id, None)
+                    if not item.lease.items:
+                        item.lease.agent.leases.pop(item.lease.id, None)
+                agent.completed += 1
+                finished.append((item, bool(result.get("ok")), str(result.get("message", "")),
+                                 float(result.get("elapsed", 0.0))))
+
+        # Score and notify outside the lock
+        for item, ok, message, elapsed in finished:
+            try:
+                self.on_result(item.spec, ok, message, elapsed)
+                if item.callback is not None:
+                    item.callback((ok, message), elapsed)
+            except Exception as err:
+                print(f"Result handler for {item.spec.get('service')} raised:", repr(err))
+
+        if finished:
+            with self._cond:
+                self._cond.notify_all()
+        return len(finished)
+
+    def _reap(self, now: float):
+        # Caller holds self._cond
+        requeue = []
+        for agent in list(self._agents.values()):
+            for lease in list(agent.leases.values()):
+                if lease.deadline <= now:
+                    del agent.leases[lease.id]
+                    requeue.extend(item for item in lease.items.values() if not item.done)
+            if now - agent.last_seen > self.agent_timeout:
+                del self._agents[agent.id]
+                for lease in agent.leases.values():
+                    requeue.extend(item for item in lease.items.values() if not item.done)
+                agent.leases.clear()
+                print(f"Grading agent {agent.name} ({agent.id}) timed out")
+        if requeue:
+            print(f"Reassigning {len(requeue)} checks from expired leases")
+            for item in requeue:
+                item.lease = None
+            # Expired checks are retried before newer ones
+            self._queue.extendleft(reversed(requeue))
+            self._cond.notify_all()
+
+    def status(self) -> Dict[str, Any]:
+        """Summary of connected agents and queued work for /api/agents."""
+        now = time.monotonic()
+        with self._cond:
+            return {
+                "queued": sum(1 for item in self._queue if not item.done),
+                "held": len(self._held),
+                "outstanding": len(self._outstanding),
+                "agents": [
+                    {
+                        "id": agent.id,
+                        "name": agent.name,
+                        "networks": [str(network) for network in agent.networks],
+                        "leased": sum(len(lease.items) for lease in agent.leases.values()),
+                        "completed": agent.completed,
+                        "last_seen_seconds": round(now - agent.last_seen, 1),
+                    }
+                    for agent in self._agents.values()
+                ],
+            }
@@ -0,0 +1,83 @@
+"""
+Socket.IO server for the broadcast benchmark.
+
+Runs the real ScoreStore and ScoreBroadcaster under eventlet, as main.py
+does, without the grader. A ``bench_apply`` event from the harness applies
+``count`` results at ``rate`` per second. Each result raises its cell's
+score to the apply time in milliseconds since the server's ``epoch``
+(public deltas carry no error text, and binary deltas hold 32-bit scores),
+so clients can measure how long the resulting delta took to reach them.
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import socketio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from score_broadcaster import PUBLIC_ROOM, ScoreBroadcaster
+from score_store import ScoreStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Broadcast benchmark server")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--scores", required=True, help="JSON file with initial scores")
+    parser.add_argument("--interval-ms", type=float, default=250)
+    parser.add_argument("--binary", action="store_true", help="Send binary public deltas")
+    args = parser.parse_args()
+
+    with open(args.scores) as scores_file:
+        initial = json.load(scores_file)
+    cells = [(team, key) for team, keys in initial.items() for key in keys]
+
+    epoch = time.time()
+    sio = socketio.Server(async_mode="eventlet", cors_allowed_origins="*")
+    store = ScoreStore(os.devnull)
+    store.reset(initial)
+    broadcaster = ScoreBroadcaster(sio, store, args.interval_ms / 1000.0, binary=args.binary)
+    broadcaster.start()
+
+    @sio.event
+    def connect(sid, environ):
+        sio.enter_room(sid, PUBLIC_ROOM)
+        sio.emit("scoresSync", broadcaster.sync_payload(), to=sid)
+
+    @sio.on("resync")
+    def resync(sid, data=None):
+        sio.emit("scoresSync", broadcaster.sync_payload(), to=sid)
+
+    @sio.on("bench_apply")
+    def bench_apply(sid, data):
+        count = int(data.get("count", 1000))
+        rate = float(data.get("rate", 1000))
+
+        def apply_results():
+            started = time.time()
+            for index in range(count):
+                # Pace the results instead of applying them in one burst
+                due = started + index / rate
+                delay = due - time.time()
+                if delay > 0:
+                    eventlet.sleep(delay)
+                team, key = cells[index % len(cells)]
+                score = store.get_team(team)[key]["score"]
+                store.apply(team, key, "Success", int((time.time() - epoch) * 1000) - score)
+            sio.emit("bench_done", {"count": count}, to=sid)
+
+        eventlet.spawn(apply_results)
+
+    listener = eventlet.listen(("127.0.0.1", args.port))
+    print(json.dumps({"port": listener.getsockname()[1], "epoch": epoch}), flush=True)
+    eventlet.wsgi.server(listener, socketio.WSGIApp(sio), log_output=False)
+
+
+if __name__ == "__main__":
+    main()
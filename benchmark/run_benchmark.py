@@ -0,0 +1,467 @@
+"""
+Load test and benchmark harness for the scoring engine.
+
+Generates a synthetic master_config.json with the requested number of teams,
+starts local stand-in services (see standins.py) and measures:
+
+- grading: wall time per cycle and per-check latency percentiles by service
+- score store: results applied per second, with and without the journal
+- broadcast: latency from a score change to its scoresDelta arriving at N
+  Socket.IO clients (see broadcast_server.py)
+
+Results are written as JSON to benchmark/results/ so runs can be compared:
+
+    python benchmark/run_benchmark.py --teams 100
+    python benchmark/run_benchmark.py --teams 500 --slow 0.05 --dead 0.02
+    python benchmark/run_benchmark.py --teams 100 --compare benchmark/results/<earlier>.json
+
+Ping checks need raw ICMP (root) or net.ipv4.ping_group_range, like the
+scoring server itself.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+SERVICES = ["ping", "ssh", "web", "active_directory"]
+
+
+def summarize(values, scale=1000.0):
+    """Percentiles of ``values`` (seconds), reported in milliseconds."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def rank(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * scale
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered) * scale, 3),
+        "p50": round(rank(0.50), 3),
+        "p90": round(rank(0.90), 3),
+        "p99": round(rank(0.99), 3),
+        "max": round(ordered[-1] * scale, 3),
+    }
+
+
+def team_subnet(index):
+    # All of 127.0.0.0/8 reaches the loopback interface
+    return f"127.{1 + index // 256}.{index % 256}.0/24"
+
+
+def build_topology(args, ports, workdir):
+    services = {
+        "ping": {"name": "Ping", "display_name": "Ping", "points": 10, "timeout": args.timeout,
+                 "count": args.ping_count, "reply_timeout": min(2, args.timeout)},
+        "ssh": {"name": "SSH", "display_name": "SSH", "points": 10, "timeout": args.timeout,
+                "default_username": "bench", "default_password": "bench",
+                "default_port": ports["ssh"], "persistent": True},
+        "web": {"name": "Web", "display_name": "Web", "points": 10, "timeout": args.timeout,
+                "default_port": ports["http"]},
+        "active_directory": {"name": "AD", "display_name": "Active Directory", "points": 10,
+                             "timeout": args.timeout, "default_username": "bench",
+                             "default_password": "bench", "port": ports["ldap"], "persistent": True},
+    }
+    return {
+        "teams": [
+            {"name": f"Team{i + 1}", "id": f"team{i + 1}", "password": "bench", "subnet": team_subnet(i)}
+            for i in range(args.teams)
+        ],
+        "systems": [
+            {"name": f"ubuntu{j + 1}", "display_name": f"Ubuntu {j + 1}", "ip_offset": 10 + j,
+             "services": args.services}
+            for j in range(args.systems)
+        ],
+        "services": {name: services[name] for name in args.services},
+        "grading": {
+            "interval_seconds": 40,
+            "mode": "cycle",
+            "concurrent_threads": True,
+            "max_concurrency": args.concurrency,
+            "worker_processes": args.workers,
+            "broadcast_interval_ms": args.broadcast_interval_ms,
+        },
+        "source_addresses": {
+            "addresses": [entry for entry in args.source_addresses.split(",") if entry],
+        },
+        "persistence": {
+            "journal": True,
+            "journal_path": os.path.join(workdir, "scores.journal"),
+            "snapshot_path": os.path.join(workdir, "scores.snapshot.json"),
+            "reset_on_start": True,
+        },
+    }
+
+
+def write_team_configs(config_loader):
+    """Point each team's Active Directory check at its own system address."""
+    team_configs = config_loader.generate_team_configs()
+    for team_id, systems in team_configs.items():
+        for system_name, system_cfg in systems.items():
+            if 'active_directory' in system_cfg:
+                system_cfg['active_directory']['domain'] = config_loader.get_team_ip(team_id, system_name)
+    with open("team_configs.json", "w") as config_file:
+        json.dump(team_configs, config_file, indent=2)
+
+
+def choose_behaviour(args):
+    """Pick which system addresses the stand-ins answer slowly or not at all."""
+    rng = random.Random(args.seed)
+    modes = {}
+    for i in range(args.teams):
+        network = team_subnet(i).rsplit(".", 1)[0]
+        for j in range(args.systems):
+            roll = rng.random()
+            if roll < args.dead:
+                modes[f"{network}.{10 + j}"] = "dead"
+            elif roll < args.dead + args.slow:
+                modes[f"{network}.{10 + j}"] = "slow"
+    return modes
+
+
+def start_process(command):
+    """Start a helper process and read the JSON line it prints when ready."""
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line:
+        raise RuntimeError(f"{command[1]} failed to start")
+    return process, json.loads(line)
+
+
+class _NullSio:
+    """Stands in for the Socket.IO server during the grading benchmark."""
+
+    def __init__(self):
+        self.emits = 0
+
+    def emit(self, *args, **kwargs):
+        self.emits += 1
+
+
+def bench_grading(args):
+    # Dead stand-ins reset connections; don't log every one
+    logging.getLogger("paramiko").setLevel(logging.CRITICAL)
+    from grader import Grader
+
+    grader = Grader(_NullSio())
+    grader.score_store.reset(grader.config_loader.generate_initial_scores())
+    scenarios = grader.config_loader.plan.scenarios
+    executor = grader.executor if grader.executor is not None else grader.engine
+
+    cycles = []
+    latencies = {name: [] for name in args.services}
+    failures = {name: 0 for name in args.services}
+    lock = threading.Lock()
+
+    for cycle in range(args.cycles):
+        def record(result, elapsed, service_name):
+            with lock:
+                latencies[service_name].append(elapsed)
+                if not result[0]:
+                    failures[service_name] += 1
+
+        started = time.perf_counter()
+        grader.begin_cycle()
+        for scenario in scenarios:
+            grader.submit_check(
+                scenario,
+                lambda result, elapsed, name=scenario.service_name: record(result, elapsed, name),
+            )
+        executor.wait_idle()
+        grader.end_cycle()
+        wall = time.perf_counter() - started
+        cycles.append(round(wall, 4))
+        print(f"  cycle {cycle + 1}: {len(scenarios)} checks in {wall:.2f}s")
+
+    if hasattr(executor, "stop"):
+        executor.stop()
+    steady = cycles[1:] or cycles
+    return {
+        "checks_per_cycle": len(scenarios),
+        "cycle_wall_seconds": cycles,
+        "first_cycle_seconds": cycles[0],
+        "steady_cycle_seconds_mean": round(sum(steady) / len(steady), 4),
+        "checks_per_second": round(len(scenarios) / (sum(steady) / len(steady)), 1),
+        "check_latency_ms": {name: summarize(values) for name, values in latencies.items()},
+        "failed_checks": failures,
+    }
+
+
+def bench_score_store(args, workdir, initial):
+    from score_journal import ScoreJournal
+    from score_store import ScoreStore
+
+    cells = [(team, key) for team, keys in initial.items() for key in keys]
+    results = {}
+    for label, journaled in (("memory", False), ("journal", True)):
+        journal = None
+        if journaled:
+            journal = ScoreJournal(os.path.join(workdir, f"bench-{label}.journal"),
+                                   os.path.join(workdir, f"bench-{label}.snapshot.json"))
+        store = ScoreStore(os.path.join(workdir, f"bench-{label}.json"), journal)
+        store.reset(initial)
+
+        started = time.perf_counter()
+        for index in range(args.store_results):
+            team, key = cells[index % len(cells)]
+            store.apply(team, key, "Success" if index % 4 else "Connection refused", 10 if index % 4 else 0)
+        applied = time.perf_counter() - started
+
+        started = time.perf_counter()
+        store.flush(force=True, compact=journaled)
+        flushed = time.perf_counter() - started
+        if journal is not None:
+            journal.close()
+
+        results[label] = {
+            "results": args.store_results,
+            "results_per_second": round(args.store_results / applied),
+            "flush_ms": round(flushed * 1000, 3),
+        }
+        print(f"  {label}: {results[label]['results_per_second']} results/s, "
+              f"flush {results[label]['flush_ms']} ms")
+
+    # Four threads applying at once, as the check engine does
+    store = ScoreStore(os.path.join(workdir, "bench-threads.json"))
+    store.reset(initial)
+    per_thread = args.store_results // 4
+
+    def apply_many(offset):
+        for index in range(per_thread):
+            team, key = cells[(offset + index) % len(cells)]
+            store.apply(team, key, "Success", 10)
+
+    threads = [threading.Thread(target=apply_many, args=(n * 7919,)) for n in range(4)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results["memory_4_threads"] = {
+        "results": per_thread * 4,
+        "results_per_second": round(per_thread * 4 / (time.perf_counter() - started)),
+    }
+    return results
+
+
+def bench_broadcast(args, workdir, initial):
+    import socketio
+
+    scores_path = os.path.join(workdir, "broadcast_initial.json")
+    with open(scores_path, "w") as scores_file:
+        json.dump(initial, scores_file)
+
+    server, info = start_process([
+        sys.executable, os.path.join(BENCH_DIR, "broadcast_server.py"),
+        "--scores", scores_path, "--interval-ms", str(args.broadcast_interval_ms),
+    ] + (["--binary"] if args.binary else []))
+    url = f"http://127.0.0.1:{info['port']}"
+    epoch = info["epoch"]
+
+    lock = threading.Lock()
+    latencies = []
+    deltas = [0]
+    synced = threading.Semaphore(0)
+    done = threading.Event()
+    clients = []
+    transport = None
+    try:
+        for _ in range(args.clients):
+            client = socketio.Client(reconnection=False)
+
+            @client.on("scoresSync")
+            def on_sync(payload):
+                synced.release()
+
+            @client.on("scoresDelta")
+            def on_delta(payload):
+                received = time.time()
+                if isinstance(payload, (bytes, bytearray)):
+                    # uint32 seq, then (uint32 cell, int32 score, uint8 status)
+                    scores = [score for _, score, _ in struct.iter_unpack("<IiB", payload[4:])]
+                else:
+                    scores = [change[2] for change in payload.get("changes", [])]
+                with lock:
+                    deltas[0] += 1
+                    # Scores are the apply time in milliseconds since epoch
+                    latencies.extend(received - epoch - score / 1000.0 for score in scores)
+
+            @client.on("bench_done")
+            def on_done(payload):
+                done.set()
+
+            client.connect(url)
+            clients.append(client)
+        for _ in clients:
+            synced.acquire(timeout=10)
+
+        transport = clients[0].transport()
+        clients[0].emit("bench_apply", {"count": args.broadcast_results, "rate": args.broadcast_rate})
+        done.wait(args.broadcast_results / args.broadcast_rate + 30)
+        # Let the last coalesced delta reach everyone
+        time.sleep(args.broadcast_interval_ms / 1000.0 + 1.0)
+    finally:
+        for client in clients:
+            try:
+                client.disconnect()
+            except Exception:
+                pass
+        server.stdin.close()
+        server.terminate()
+        server.wait()
+
+    result = {
+        "clients": args.clients,
+        "transport": transport,
+        "results_applied": args.broadcast_results,
+        "apply_rate": args.broadcast_rate,
+        "broadcast_interval_ms": args.broadcast_interval_ms,
+        "binary": args.binary,
+        "deltas_received": deltas[0],
+        "latency_ms": summarize(latencies),
+    }
+    print(f"  {args.clients} clients over {result['transport']}: "
+          f"p50 {result['latency_ms'].get('p50')} ms, p99 {result['latency_ms'].get('p99')} ms")
+    return result
+
+
+def _flatten(data, prefix=""):
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(current, previous_path):
+    """Print every numeric metric present in both runs with its change."""
+    with open(previous_path) as previous_file:
+        previous = json.load(previous_file)
+    now, before = _flatten(current["results"]), _flatten(previous["results"])
+    print(f"\nCompared with {previous_path} ({previous.get('git_commit', '?')[:10]}):")
+    for name in sorted(set(now) & set(before)):
+        change = ""
+        if before[name]:
+            change = f"{(now[name] - before[name]) / before[name]:+.1%}"
+        print(f"  {name:55} {before[name]:>12} -> {now[name]:>12} {change}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring engine benchmark")
+    parser.add_argument("--teams", type=int, default=100)
+    parser.add_argument("--systems", type=int, default=3)
+    parser.add_argument("--services", default=",".join(SERVICES),
+                        help="Comma-separated services on every system")
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=5)
+    parser.add_argument("--ping-count", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=0, help="grading.worker_processes")
+    parser.add_argument("--slow", type=float, default=0.0, help="Fraction of systems that answer slowly")
+    parser.add_argument("--slow-delay", type=float, default=2.0)
+    parser.add_argument("--dead", type=float, default=0.0, help="Fraction of systems that reset connections")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--store-results", type=int, default=200000)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--broadcast-results", type=int, default=5000)
+    parser.add_argument("--broadcast-rate", type=float, default=1000)
+    parser.add_argument("--broadcast-interval-ms", type=float, default=250)
+    parser.add_argument("--binary", action="store_true", help="Use binary public score deltas")
+    parser.add_argument("--source-addresses", default="",
+                        help="Comma-separated probe source addresses/ranges, e.g. 127.0.0.2-127.0.0.17")
+    parser.add_argument("--skip", default="", help="Comma-separated: grading,store,broadcast")
+    parser.add_argument("--output", help="Result file (default benchmark/results/<time>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args()
+    args.services = [name for name in args.services.split(",") if name]
+    # Resolve paths before changing into the work directory
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    if args.compare:
+        args.compare = os.path.abspath(args.compare)
+    skip = set(filter(None, args.skip.split(",")))
+
+    workdir = tempfile.mkdtemp(prefix="scoring-bench-")
+    behaviour = choose_behaviour(args)
+    behaviour_path = os.path.join(workdir, "behaviour.json")
+    with open(behaviour_path, "w") as behaviour_file:
+        json.dump(behaviour, behaviour_file)
+
+    standins, ports = start_process([
+        sys.executable, os.path.join(BENCH_DIR, "standins.py"),
+        "--behaviour", behaviour_path, "--slow-delay", str(args.slow_delay),
+    ])
+    results = {}
+    try:
+        with open(os.path.join(workdir, "master_config.json"), "w") as config_file:
+            json.dump(build_topology(args, ports, workdir), config_file, indent=2)
+        # The scoring engine reads master_config.json and writes its state
+        # files relative to the working directory
+        os.chdir(workdir)
+        from config_loader import get_config_loader
+        config_loader = get_config_loader()
+        initial = config_loader.generate_initial_scores()
+        write_team_configs(config_loader)
+
+        print(f"{args.teams} teams x {args.systems} systems x {len(args.services)} services "
+              f"({sum(1 for mode in behaviour.values() if mode == 'slow')} slow, "
+              f"{sum(1 for mode in behaviour.values() if mode == 'dead')} dead systems); workdir {workdir}")
+        if "grading" not in skip:
+            print("Grading:")
+            results["grading"] = bench_grading(args)
+        if "store" not in skip:
+            print("Score store:")
+            results["score_store"] = bench_score_store(args, workdir, initial)
+        if "broadcast" not in skip:
+            print("Broadcast:")
+            results["broadcast"] = bench_broadcast(args, workdir, initial)
+    finally:
+        standins.stdin.close()
+        standins.terminate()
+        standins.wait()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_commit": git_commit(),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", time.strftime("%Y%m%d-%H%M%S") + f"-{args.teams}teams.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Local stand-in services for benchmarking the scoring engine.
+
+Runs an SSH server (paramiko), an HTTP server and a minimal LDAP bind
+responder on loopback. Benchmark topologies put every team on its own
+127.x.y.0/24 subnet, and on Linux all of 127.0.0.0/8 is routed to the
+loopback interface, so each system address also answers ICMP echo with no
+setup.
+
+Each stand-in looks up the address a connection was made to in a behaviour
+file (``{"127.0.1.20": "slow", "127.0.2.30": "dead"}``):
+
+- ``slow``: wait ``--slow-delay`` seconds before answering
+- ``dead``: reset the connection straight away
+
+Started by run_benchmark.py; prints one JSON line with the bound ports once
+it is ready.
+"""
+
+import argparse
+import json
+import socket
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import paramiko
+
+
+BODY = b"<html><body>" + b"scoring engine benchmark " * 80 + b"</body></html>"
+
+
+class Behaviour:
+    def __init__(self, modes, slow_delay):
+        self.modes = modes
+        self.slow_delay = slow_delay
+
+    def mode(self, sock) -> str:
+        return self.modes.get(sock.getsockname()[0], "ok")
+
+    def reset(self, sock):
+        # SO_LINGER with a zero timeout makes close() send RST
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        sock.close()
+
+    def delay(self, sock):
+        if self.mode(sock) == "slow":
+            time.sleep(self.slow_delay)
+
+
+def _listener(bind, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((bind, port))
+    sock.listen(1024)
+    return sock
+
+
+def _accept_loop(sock, behaviour, handler):
+    while True:
+        conn, _ = sock.accept()
+        if behaviour.mode(conn) == "dead":
+            behaviour.reset(conn)
+            continue
+        threading.Thread(target=handler, args=(conn,), daemon=True).start()
+
+
+# --- SSH ---
+
+class _SSHServer(paramiko.ServerInterface):
+    def __init__(self, behaviour, conn):
+        self.behaviour = behaviour
+        self.conn = conn
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_exec_request(self, channel, command):
+        def respond():
+            # Let the transport acknowledge the exec request before the
+            # channel closes, or the client sees "Channel closed."
+            time.sleep(0.01)
+            self.behaviour.delay(self.conn)
+            try:
+                channel.sendall(b"bin\netc\nhome\nusr\nvar\n")
+                channel.send_exit_status(0)
+            finally:
+                channel.close()
+        threading.Thread(target=respond, daemon=True).start()
+        return True
+
+
+def serve_ssh(bind, port, behaviour):
+    host_key = paramiko.RSAKey.generate(2048)
+    sock = _listener(bind, port)
+
+    def handle(conn):
+        transport = paramiko.Transport(conn)
+        transport.add_server_key(host_key)
+        try:
+            transport.start_server(server=_SSHServer(behaviour, conn))
+        except (paramiko.SSHException, EOFError, OSError):
+            transport.close()
+
+    threading.Thread(target=_accept_loop, args=(sock, behaviour, handle), daemon=True).start()
+    return sock.getsockname()[1]
+
+
+# --- HTTP ---
+
+def serve_http(bind, port, behaviour):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            behaviour.delay(self.connection)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+
+        def log_message(self, format, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024
+
+        def verify_request(self, request, client_address):
+            if behaviour.mode(request) == "dead":
+                behaviour.reset(request)
+                return False
+            return True
+
+    server = Server((bind, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+
+# --- LDAP ---
+
+def _ber_length(length):
+    if length < 0x80:
+        return bytes([length])
+    data = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes([0x80 | len(data)]) + data
+
+
+def _tlv(tag, value):
+    return bytes([tag]) + _ber_length(len(value)) + value
+
+
+def _read_exact(conn, size):
+    data = b""
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def _read_message(conn):
+    header = _read_exact(conn, 2)
+    if header is None:
+        return None
+    length = header[1]
+    if length & 0x80:
+        length_bytes = _read_exact(conn, length & 0x7F)
+        if length_bytes is None:
+            return None
+        length = int.from_bytes(length_bytes, "big")
+    return _read_exact(conn, length)
+
+
+def serve_ldap(bind, port, behaviour):
+    """Answers every bind and search with success; enough for ldap3 binds."""
+    # Successful LDAPResult: resultCode 0, empty matchedDN and message
+    success = _tlv(0x0A, b"\x00") + _tlv(0x04, b"") + _tlv(0x04, b"")
+    responses = {
+        0x60: _tlv(0x61, success),   # BindRequest -> BindResponse
+        0x63: _tlv(0x65, success),   # SearchRequest -> SearchResultDone
+    }
+    sock = _listener(bind, port)
+
+    def handle(conn):
+        with conn:
+            while True:
+                try:
+                    body = _read_message(conn)
+                except OSError:
+                    return
+                if body is None or body[0] != 0x02:
+                    return
+                id_length = body[1]
+                message_id = body[2:2 + id_length]
+                operation = body[2 + id_length]
+                if operation == 0x42:  # UnbindRequest
+                    return
+                response = responses.get(operation)
+                if response is None:
+                    continue
+                if operation == 0x60:
+                    behaviour.delay(conn)
+                conn.sendall(_tlv(0x30, _tlv(0x02, message_id) + response))
+
+    threading.Thread(target=_accept_loop, args=(sock, behaviour, handle), daemon=True).start()
+    return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark stand-in services")
+    # 127.0.0.1 would only accept connections to that one address
+    parser.add_argument("--bind", default="0.0.0.0")
+    parser.add_argument("--ssh-port", type=int, default=0)
+    parser.add_argument("--http-port", type=int, default=0)
+    parser.add_argument("--ldap-port", type=int, default=0)
+    parser.add_argument("--behaviour", help="JSON file mapping addresses to slow/dead")
+    parser.add_argument("--slow-delay", type=float, default=2.0)
+    args = parser.parse_args()
+
+    modes = {}
+    if args.behaviour:
+        with open(args.behaviour) as behaviour_file:
+            modes = json.load(behaviour_file)
+    behaviour = Behaviour(modes, args.slow_delay)
+
+    ports = {
+        "ssh": serve_ssh(args.bind, args.ssh_port, behaviour),
+        "http": serve_http(args.bind, args.http_port, behaviour),
+        "ldap": serve_ldap(args.bind, args.ldap_port, behaviour),
+    }
+    print(json.dumps(ports), flush=True)
+    # Run until the harness closes our stdin
+    sys.stdin.read()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Bounded-concurrency check engine for the scoring engine.
+
+Checks are queued per service and executed by a fixed set of long-lived
+workers, so the number of threads no longer grows with the number of
+scenarios. A global limit caps how many checks run at once and a
+per-service limit (the plugin's ``max_parallelism``, or ``max_concurrency``
+in a service definition of master_config.json) keeps expensive protocols
+from starving cheap ones.
+
+When checks are waiting, free workers take the cheapest service first (by
+the plugin's ``cost``, or ``cost`` in the service definition), rotating
+between services of equal cost. Expensive services still get their share
+because the cheap ones are capped by their own limits.
+
+With a probe budget (``rate_limits`` in master_config.json, see
+rate_limiter.py) a check submitted with its target host books a slot
+against that host's and subnet's token buckets first, and is held back
+until its slot comes up. Held checks don't occupy workers.
+"""
+
+import bisect
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from check_plugins import all_plugins
+from rate_limiter import ProbeBudget
+
+
+DEFAULT_MAX_CONCURRENCY = 64
+DEFAULT_COST = 1.0
+
+
+def plugin_limits() -> Dict[str, int]:
+    """Per-service limits declared by the check plugins."""
+    return {name: plugin.max_parallelism for name, plugin in all_plugins().items()
+            if plugin.max_parallelism}
+
+
+def plugin_costs() -> Dict[str, float]:
+    """Expected cost of one check per service, from the check plugins."""
+    return {name: plugin.cost for name, plugin in all_plugins().items()}
+
+
+class CheckEngine:
+    """Runs submitted checks on a bounded pool of worker threads."""
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 service_limits: Optional[Dict[str, int]] = None,
+                 service_costs: Optional[Dict[str, float]] = None,
+                 budget: Optional[ProbeBudget] = None):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.service_limits = {
+            name: max(1, int(limit))
+            for name, limit in (service_limits or {}).items()
+            if limit
+        }
+        self.service_costs = {name: float(cost) for name, cost in (service_costs or {}).items()}
+        self.budget = budget
+
+        self._cond = threading.Condition()
+        self._pending: Dict[str, deque] = {}
+        self._active: Dict[str, int] = {}
+        # Services grouped by cost, cheapest first. Each group is rotated on
+        # every pick so one busy service can't monopolise the workers.
+        self._costs: List[float] = []
+        self._groups: List[deque] = []
+        # Checks waiting for their probe budget: (due, counter, service, job)
+        self._held: List[tuple] = []
+        self._counter = itertools.count()
+        self._in_flight = 0
+        self._queued = 0
+        self._workers = []
+        self._stopped = False
+
+    @classmethod
+    def from_config(cls, config_loader, shards: int = 1) -> "CheckEngine":
+        """
+        Build an engine using the limits declared in master_config.json.
+        With ``shards`` > 1 (one engine per grading worker process) each
+        limit is split evenly so the totals stay the same.
+        """
+        grading = config_loader.get_grading_config()
+        if grading.get('concurrent_threads', True):
+            max_concurrency = grading.get('max_concurrency', DEFAULT_MAX_CONCURRENCY)
+        else:
+            max_concurrency = 1
+
+        service_limits = plugin_limits()
+        service_costs = plugin_costs()
+        for name, service_config in config_loader.get_services().items():
+            if 'max_concurrency' in service_config:
+                service_limits[name] = service_config['max_concurrency']
+            if 'cost' in service_config:
+                service_costs[name] = service_config['cost']
+
+        if shards > 1:
+            max_concurrency = -(-max_concurrency // shards)
+            service_limits = {name: -(-limit // shards) for name, limit in service_limits.items() if limit}
+
+        return cls(max_concurrency, service_limits, service_costs, ProbeBudget.from_config(config_loader))
+
+    def _ensure_workers(self):
+        # Workers are started lazily and live for the lifetime of the engine.
+        while len(self._workers) < self.max_concurrency:
+            worker = threading.Thread(target=self._worker_loop, daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def submit(self, service_name: str, target: Callable[..., Any], args=(),
+               callback: Optional[Callable[[Any, float], None]] = None,
+               host: Optional[str] = None):
+        """
+        Queue ``target(*args)`` to run under ``service_name``'s limits.
+        ``callback(result, elapsed_seconds)`` is invoked from the worker as
+        soon as the check finishes. ``host`` is the check's target, which
+        the probe budget (if any) is charged for.
+        """
+        delay = self.budget.reserve(host) if self.budget is not None and host else 0.0
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("CheckEngine has been stopped")
+            self._ensure_workers()
+            if service_name not in self._pending:
+                self._pending[service_name] = deque()
+                self._active[service_name] = 0
+                self._add_service(service_name)
+            if delay > 0:
+                heapq.heappush(self._held, (time.monotonic() + delay, next(self._counter),
+                                            service_name, (target, args, callback)))
+            else:
+                self._pending[service_name].append((target, args, callback))
+            self._queued += 1
+            self._cond.notify()
+
+    def _add_service(self, service_name: str):
+        # Caller holds self._cond
+        cost = self.service_costs.get(service_name, DEFAULT_COST)
+        index = bisect.bisect_left(self._costs, cost)
+        if index == len(self._costs) or self._costs[index] != cost:
+            self._costs.insert(index, cost)
+            self._groups.insert(index, deque())
+        self._groups[index].append(service_name)
+
+    def _release_held(self) -> Optional[float]:
+        """
+        Queue held checks whose slot has come up. Returns the seconds until
+        the next one is due, or None if nothing is held.
+        """
+        # Caller holds self._cond
+        now = time.monotonic()
+        while self._held and self._held[0][0] <= now:
+            _, _, service_name, job = heapq.heappop(self._held)
+            self._pending[service_name].append(job)
+        return self._held[0][0] - now if self._held else None
+
+    def _limit(self, service_name: str) -> int:
+        return self.service_limits.get(service_name, self.max_concurrency)
+
+    def _next_job(self):
+        """Block until a job whose service has spare capacity is available."""
+        with self._cond:
+            while True:
+                if self._stopped:
+                    return None
+                next_due = self._release_held()
+                for group in self._groups:
+                    for _ in range(len(group)):
+                        service_name = group[0]
+                        group.rotate(-1)
+                        queue = self._pending[service_name]
+                        if queue and self._active[service_name] < self._limit(service_name):
+                            self._active[service_name] += 1
+                            self._queued -= 1
+                            self._in_flight += 1
+                            return (service_name,) + queue.popleft()
+                self._cond.wait(next_due)
+
+    def _worker_loop(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            service_name, target, args, callback = job
+            started = time.monotonic()
+            try:
+                result = target(*args)
+            except Exception as err:
+                print(f"Check for {service_name} raised:", repr(err))
+                result = (False, str(err))
+            elapsed = time.monotonic() - started
+
+            if callback is not None:
+                try:
+                    callback(result, elapsed)
+                except Exception as err:
+                    print(f"Check callback for {service_name} raised:", repr(err))
+
+            with self._cond:
+                self._active[service_name] -= 1
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def pending_count(self) -> int:
+        """Number of checks queued or currently running."""
+        with self._cond:
+            return self._queued + self._in_flight
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every submitted check has finished."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queued or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def stop(self):
+        """Stop the workers once their current check returns."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
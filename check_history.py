@@ -0,0 +1,174 @@
+"""
+Per-check result history for uptime and latency queries.
+
+Every (team, score_key) cell gets a fixed-size ring buffer of its most
+recent results, stored in typed arrays so memory stays at
+``history.samples_per_check`` x 28 bytes per cell however long the
+competition runs. Running totals are stored with each sample, so a window
+query is a binary search for its start and a subtraction, and one call
+answers for every team so the leaderboard can ask once instead of once per
+team.
+
+History is in memory only; it starts empty after a restart.
+"""
+
+import bisect
+import threading
+import time
+from array import array
+from typing import Any, Dict, Optional
+
+
+class CheckRing:
+    """
+    Fixed-capacity ring of (timestamp, latency) samples. Alongside each
+    sample it keeps the running success count and latency total from before
+    the sample was added, so any window's uptime and mean latency come from
+    one subtraction instead of a pass over the samples.
+    """
+
+    __slots__ = ("capacity", "times", "latency", "up_before", "latency_before",
+                 "head", "count", "total_up", "total_latency")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.latency = array("f", bytes(4 * capacity))
+        self.up_before = array("Q", bytes(8 * capacity))
+        self.latency_before = array("d", bytes(8 * capacity))
+        # Next slot to write; the oldest sample when the ring is full
+        self.head = 0
+        self.count = 0
+        self.total_up = 0
+        self.total_latency = 0.0
+
+    def append(self, timestamp: float, ok: bool, latency: float):
+        head = self.head
+        self.times[head] = timestamp
+        self.latency[head] = latency
+        self.up_before[head] = self.total_up
+        self.latency_before[head] = self.total_latency
+        if ok:
+            self.total_up += 1
+        self.total_latency += latency
+        self.head = (head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def _first(self, since: float):
+        """
+        Slot of the oldest sample taken at or after ``since`` and the number
+        of samples from there to the newest, or (None, 0).
+        """
+        if self.count < self.capacity:
+            first = bisect.bisect_left(self.times, since, 0, self.count)
+            return (first, self.count - first) if first < self.count else (None, 0)
+        # Full ring: slots head..capacity are older than slots 0..head
+        head = self.head
+        first = bisect.bisect_left(self.times, since, head, self.capacity)
+        if first < self.capacity:
+            return first, self.capacity - first + head
+        first = bisect.bisect_left(self.times, since, 0, head)
+        return (first, head - first) if first < head else (None, 0)
+
+    def _slots(self, first: int, checks: int):
+        end = first + checks
+        if end <= self.capacity:
+            return [self.latency[first:end]]
+        return [self.latency[first:], self.latency[:end - self.capacity]]
+
+    def window(self, since: float, detail: bool = False) -> Dict[str, Any]:
+        """
+        Uptime and mean latency for samples taken at or after ``since``.
+        With ``detail`` also the maximum and 95th percentile latency, which
+        need a pass over the window's samples.
+        """
+        first, checks = self._first(since)
+        if not checks:
+            stats = {"checks": 0, "up": 0, "uptime": None, "avg_latency": None}
+            if detail:
+                stats.update(max_latency=None, p95_latency=None)
+            return stats
+        up = self.total_up - self.up_before[first]
+        stats = {
+            "checks": checks,
+            "up": up,
+            "uptime": round(100.0 * up / checks, 2),
+            "avg_latency": round((self.total_latency - self.latency_before[first]) / checks, 4),
+        }
+        if detail:
+            latencies = sorted(value for part in self._slots(first, checks) for value in part)
+            stats["max_latency"] = round(latencies[-1], 4)
+            stats["p95_latency"] = round(latencies[int(0.95 * (checks - 1))], 4)
+        return stats
+
+
+class CheckHistory:
+    """Ring buffers for every (team, score_key) cell."""
+
+    def __init__(self, samples_per_check: int = 720):
+        self.samples_per_check = max(1, int(samples_per_check))
+        self._lock = threading.Lock()
+        self._rings: Dict[str, Dict[str, CheckRing]] = {}
+
+    def record(self, team: str, score_key: str, ok: bool, latency: float,
+               timestamp: Optional[float] = None):
+        """Append one result to the cell's ring buffer."""
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            cells = self._rings.get(team)
+            if cells is None:
+                cells = self._rings[team] = {}
+            ring = cells.get(score_key)
+            if ring is None:
+                ring = cells[score_key] = CheckRing(self.samples_per_check)
+            ring.append(timestamp, ok, latency)
+
+    def uptime(self, window: float, team: Optional[str] = None,
+               detail: bool = False, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Rolling stats over the last ``window`` seconds for every team (or
+        just ``team``): one entry per score key plus the team's overall
+        uptime across all of its checks. ``detail`` adds max and 95th
+        percentile latency per score key.
+        """
+        since = (now if now is not None else time.time()) - window
+        with self._lock:
+            if team is not None:
+                teams = {team: dict(self._rings.get(team, {}))}
+            else:
+                teams = {name: dict(cells) for name, cells in self._rings.items()}
+
+        result = {}
+        for name, cells in teams.items():
+            checks = 0
+            up = 0
+            stats = {}
+            for score_key, ring in cells.items():
+                # Locking per ring rather than for the whole query keeps
+                # results flowing while a large query runs
+                with self._lock:
+                    cell = ring.window(since, detail)
+                stats[score_key] = cell
+                checks += cell["checks"]
+                up += cell["up"]
+            result[name] = {
+                "checks": checks,
+                "uptime": round(100.0 * up / checks, 2) if checks else None,
+                "services": stats,
+            }
+        return result
+
+
+# Singleton instance
+_check_history = None
+_check_history_lock = threading.Lock()
+
+def get_check_history(samples_per_check: int = 720) -> CheckHistory:
+    """Get or create the singleton CheckHistory instance."""
+    global _check_history
+    with _check_history_lock:
+        if _check_history is None:
+            _check_history = CheckHistory(samples_per_check)
+        return _check_history
@@ -0,0 +1,173 @@
+"""
+Check plugin registry for the scoring engine.
+
+Every service type (``ssh``, ``web``, ``dns``, ...) is a CheckPlugin in a
+module of this package. A plugin declares:
+
+- ``options``: settings read from its service definition in
+  master_config.json, with defaults
+- ``team_fields``: settings each team can edit on /config; their defaults
+  come from ``default_<field>`` in the service definition
+- ``default_timeout``: used when the service definition has no ``timeout``
+- ``cost``: rough relative cost of one check; the check engine starts
+  cheaper checks first when work is queued
+- ``max_parallelism``: how many of its checks may run at once, unless the
+  service definition sets ``max_concurrency``
+
+and implements ``build`` (fill in a check spec) and ``run`` (run it).
+Modules in this package are imported on first use and register their
+plugins with ``register``, so a new service type is one new file here plus
+its entry in master_config.json.
+
+Checks run on the grader's worker threads: green threads under eventlet in
+the web server, real threads in worker processes and on agents. Plugins
+talk to the network through plain sockets with timeouts, which cooperate
+with eventlet, and never block the event loop.
+"""
+
+import importlib
+import pkgutil
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+
+FIELD_KINDS = ("str", "password", "int", "float", "bool", "port")
+
+
+class Field:
+    """One setting in a plugin's schema."""
+
+    __slots__ = ("kind", "default", "label", "required")
+
+    def __init__(self, kind: str = "str", default: Any = None, label: Optional[str] = None,
+                 required: bool = True):
+        if kind not in FIELD_KINDS:
+            raise ValueError(f"Unknown field kind {kind!r}; expected one of {FIELD_KINDS}")
+        self.kind = kind
+        self.default = default
+        self.label = label
+        # Whether the /config form insists on a value
+        self.required = required
+
+    def coerce(self, value: Any, name: str) -> Any:
+        """Validate a value submitted for this field; raises ValueError."""
+        if self.kind in ("str", "password"):
+            if not isinstance(value, str):
+                raise ValueError(f"{name} must be text")
+            return value
+        if self.kind == "bool":
+            if not isinstance(value, bool):
+                raise ValueError(f"{name} must be true or false")
+            return value
+        try:
+            number = float(value) if self.kind == "float" else int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} invalid")
+        if self.kind == "port" and not 1 <= number <= 65535:
+            raise ValueError(f"{name} out of range")
+        return number
+
+
+class CheckPlugin:
+    """Base class for service check plugins."""
+
+    name = ""
+    label = ""
+    default_timeout = 20
+    cost = 1.0
+    max_parallelism: Optional[int] = None
+    options: Dict[str, Field] = {}
+    team_fields: Dict[str, Field] = {}
+
+    def service_options(self, service_config: Dict[str, Any]) -> Dict[str, Any]:
+        """Settings from the service definition, carried on each scenario."""
+        values = {name: service_config.get(name, field.default) for name, field in self.options.items()}
+        for name, field in self.team_fields.items():
+            values[f"default_{name}"] = service_config.get(f"default_{name}", field.default)
+        return values
+
+    def team_defaults(self, service_config: Dict[str, Any]) -> Dict[str, Any]:
+        """A team's initial settings for team_configs.json."""
+        return {name: service_config.get(f"default_{name}", field.default)
+                for name, field in self.team_fields.items()}
+
+    def validate_team(self, values: Dict[str, Any], service_config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Check settings a team submitted and fill in defaults for missing
+        ones. Raises ValueError with a message naming the bad field.
+        """
+        if not isinstance(values, dict):
+            raise ValueError(f"{self.label} settings invalid")
+        result = self.team_defaults(service_config)
+        for name, field in self.team_fields.items():
+            if name in values:
+                result[name] = field.coerce(values[name], f"{self.label} {field.label or name}")
+        return result
+
+    def team_value(self, team: Dict[str, Any], options, name: str) -> Any:
+        """A team setting, falling back to the service's ``default_<name>``."""
+        return team.get(name, options.get(f"default_{name}"))
+
+    def build(self, spec: Dict[str, Any], options, team: Dict[str, Any]):
+        """
+        Add this service's fields to ``spec`` from the scenario's
+        ``options`` and the team's settings for the system (``team``).
+        Everything added must be JSON so the spec can go to a worker.
+        """
+        raise NotImplementedError
+
+    def run(self, spec: Dict[str, Any], services) -> Tuple:
+        """Run a check spec; returns ``(ok, message, ...)``."""
+        raise NotImplementedError
+
+    def describe(self) -> Dict[str, Any]:
+        """Public description for the UI."""
+        return {
+            "label": self.label,
+            "cost": self.cost,
+            "default_timeout": self.default_timeout,
+            "max_parallelism": self.max_parallelism,
+            "team_fields": [
+                {"name": name, "kind": field.kind, "label": field.label or name.capitalize(),
+                 "required": field.required}
+                for name, field in self.team_fields.items()
+            ],
+        }
+
+
+_plugins: Dict[str, CheckPlugin] = {}
+_plugins_lock = threading.RLock()
+_loaded = False
+
+
+def register(plugin: CheckPlugin) -> CheckPlugin:
+    """Add a plugin to the registry, replacing one with the same name."""
+    with _plugins_lock:
+        _plugins[plugin.name] = plugin
+    return plugin
+
+
+def _load():
+    global _loaded
+    with _plugins_lock:
+        if _loaded:
+            return
+        _loaded = True
+        for module in pkgutil.iter_modules(__path__):
+            try:
+                importlib.import_module(f"{__name__}.{module.name}")
+            except Exception as err:
+                print(f"Failed to load check plugin {module.name}:", repr(err))
+
+
+def get_plugin(name: str) -> Optional[CheckPlugin]:
+    """The plugin for a service type, or None if there is none."""
+    _load()
+    return _plugins.get(name)
+
+
+def all_plugins() -> Dict[str, CheckPlugin]:
+    """Every registered plugin by service name."""
+    _load()
+    with _plugins_lock:
+        return dict(_plugins)
@@ -0,0 +1,39 @@
+"""Active Directory check: LDAP bind with the team's credentials."""
+
+from check_plugins import CheckPlugin, Field, register
+
+
+class ActiveDirectoryCheck(CheckPlugin):
+    name = "active_directory"
+    label = "Active Directory"
+    default_timeout = 20
+    cost = 4.0
+    max_parallelism = 16
+    options = {
+        "port": Field("port", 389),
+        "persistent": Field("bool", True),
+    }
+    team_fields = {
+        "username": Field("str", "administrator"),
+        "password": Field("password", "changeme"),
+        "domain": Field("str", "example.com"),
+    }
+
+    def build(self, spec, options, team):
+        spec.update(
+            username=self.team_value(team, options, "username"),
+            password=self.team_value(team, options, "password"),
+            # Without a team override, bind to the system's own address
+            domain=team.get("domain", spec['ip']),
+            port=options.get("port", 389),
+            persistent=options.get("persistent", True),
+        )
+
+    def run(self, spec, services):
+        return services.active_directory(
+            spec['domain'], spec['username'], spec['password'], spec['timeout'],
+            port=spec['port'], persistent=spec['persistent'],
+        )
+
+
+register(ActiveDirectoryCheck())
@@ -0,0 +1,142 @@
+"""
+DNS check: ask the team's server for one record over UDP.
+
+The query and answer are built and parsed here, so the check needs nothing
+beyond a UDP socket. It passes if the server answers NOERROR with at least
+one record of the requested type and, with ``expect`` set, one of the
+returned A/AAAA addresses equals it.
+"""
+
+import random
+import socket
+import struct
+import time
+
+from check_plugins import CheckPlugin, Field, register
+from source_addresses import get_source_pool
+
+
+RECORD_TYPES = {"A": 1, "NS": 2, "CNAME": 5, "SOA": 6, "PTR": 12, "MX": 15, "TXT": 16, "AAAA": 28}
+RCODES = {1: "FORMERR", 2: "SERVFAIL", 3: "NXDOMAIN", 4: "NOTIMP", 5: "REFUSED"}
+
+_HEADER = struct.Struct("!HHHHHH")
+_RECORD = struct.Struct("!HHIH")
+
+
+def _encode_name(name: str) -> bytes:
+    parts = []
+    for label in name.strip(".").split("."):
+        encoded = label.encode("idna")
+        if not 0 < len(encoded) < 64:
+            raise ValueError(f"invalid DNS name {name!r}")
+        parts.append(bytes((len(encoded),)) + encoded)
+    return b"".join(parts) + b"\x00"
+
+
+def _skip_name(data: bytes, offset: int) -> int:
+    """Offset just past a (possibly compressed) name."""
+    while True:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        offset += 1
+        if length == 0:
+            return offset
+        offset += length
+
+
+def build_query(name: str, qtype: int, query_id: int) -> bytes:
+    # Recursion desired, one question
+    return _HEADER.pack(query_id, 0x0100, 1, 0, 0, 0) + _encode_name(name) + struct.pack("!HH", qtype, 1)
+
+
+def parse_answers(data: bytes, qtype: int):
+    """``(rcode, [(type, value), ...])`` from a response; values for A/AAAA only."""
+    _, flags, qdcount, ancount, _, _ = _HEADER.unpack_from(data)
+    offset = _HEADER.size
+    for _ in range(qdcount):
+        offset = _skip_name(data, offset) + 4
+    answers = []
+    for _ in range(ancount):
+        offset = _skip_name(data, offset)
+        rtype, _, _, length = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        rdata = data[offset:offset + length]
+        offset += length
+        if rtype == 1 and length == 4:
+            answers.append((rtype, socket.inet_ntop(socket.AF_INET, rdata)))
+        elif rtype == 28 and length == 16:
+            answers.append((rtype, socket.inet_ntop(socket.AF_INET6, rdata)))
+        else:
+            answers.append((rtype, None))
+    return flags & 0x000F, answers
+
+
+class DnsCheck(CheckPlugin):
+    name = "dns"
+    label = "DNS"
+    default_timeout = 5
+    cost = 1.0
+    options = {
+        "query": Field("str", "example.com"),
+        "record_type": Field("str", "A"),
+        "expect": Field("str"),
+        "port": Field("port", 53),
+    }
+
+    def build(self, spec, options, team):
+        spec.update(
+            query=options.get("query", "example.com"),
+            record_type=str(options.get("record_type", "A")).upper(),
+            expect=options.get("expect"),
+            port=options.get("port", 53),
+        )
+
+    def run(self, spec, services):
+        qtype = RECORD_TYPES.get(spec['record_type'])
+        if qtype is None:
+            return (False, f"Unsupported record type {spec['record_type']}")
+        query_id = random.getrandbits(16)
+        packet = build_query(spec['query'], qtype, query_id)
+        deadline = time.monotonic() + spec['timeout']
+        started = time.monotonic()
+
+        sock = get_source_pool().udp_socket()
+        try:
+            sock.connect((spec['ip'], spec['port']))
+            sock.send(packet)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return (False, f"No DNS reply within {spec['timeout']}s (timed out)")
+                sock.settimeout(remaining)
+                try:
+                    data = sock.recv(4096)
+                except socket.timeout:
+                    return (False, f"No DNS reply within {spec['timeout']}s (timed out)")
+                # Ignore stray datagrams that don't answer our query
+                if len(data) >= _HEADER.size and struct.unpack_from("!H", data)[0] == query_id:
+                    break
+        finally:
+            sock.close()
+        elapsed_ms = (time.monotonic() - started) * 1000
+
+        try:
+            rcode, answers = parse_answers(data, qtype)
+        except (IndexError, struct.error):
+            return (False, "Malformed DNS reply")
+        if rcode:
+            return (False, f"DNS {RCODES.get(rcode, rcode)} for {spec['query']}")
+        matching = [value for rtype, value in answers if rtype == qtype]
+        if not matching:
+            return (False, f"No {spec['record_type']} record for {spec['query']}")
+        if spec['expect'] and spec['expect'] not in matching:
+            return (False, f"{spec['query']} resolved to {', '.join(str(v) for v in matching)}, "
+                           f"expected {spec['expect']}")
+        shown = ", ".join(str(value) for value in matching if value is not None)
+        if not shown:
+            shown = f"{len(matching)} record(s)"
+        return (True, f"{spec['query']} {spec['record_type']} {shown} in {elapsed_ms:.1f} ms")
+
+
+register(DnsCheck())
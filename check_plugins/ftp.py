@@ -0,0 +1,94 @@
+"""FTP check: read the banner and log in with the team's credentials."""
+
+import socket
+
+from check_plugins import CheckPlugin, Field, register
+from source_addresses import get_source_pool
+
+
+MAX_LINE = 1024
+MAX_LINES = 64
+
+
+class FtpSession:
+    """Just enough of the FTP control connection for a login check."""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+
+    def _line(self) -> str:
+        line = self.reader.readline(MAX_LINE)
+        if not line:
+            raise ConnectionError("FTP server closed the connection (EOF)")
+        return line.decode("latin-1").rstrip("\r\n")
+
+    def reply(self):
+        """``(code, text)`` of the next reply, joining multi-line replies."""
+        line = self._line()
+        code = line[:3]
+        lines = [line]
+        # "123-" starts a multi-line reply that ends with "123 "
+        if line[3:4] == "-":
+            while len(lines) < MAX_LINES:
+                line = self._line()
+                lines.append(line)
+                if line[:3] == code and line[3:4] == " ":
+                    break
+        if not code.isdigit():
+            raise ValueError(f"Not an FTP reply: {lines[0][:80]!r}")
+        # The first line carries the message; later ones are detail
+        return int(code), lines[0][4:].strip()
+
+    def command(self, text: str):
+        self.sock.sendall(text.encode("latin-1") + b"\r\n")
+        return self.reply()
+
+    def close(self):
+        try:
+            self.reader.close()
+        finally:
+            self.sock.close()
+
+
+class FtpCheck(CheckPlugin):
+    name = "ftp"
+    label = "FTP"
+    default_timeout = 10
+    cost = 3.0
+    max_parallelism = 32
+    team_fields = {
+        "username": Field("str", "anonymous"),
+        "password": Field("password", "changeme"),
+        "port": Field("port", 21),
+    }
+
+    def build(self, spec, options, team):
+        spec.update(
+            username=self.team_value(team, options, "username"),
+            password=self.team_value(team, options, "password"),
+            port=self.team_value(team, options, "port"),
+        )
+
+    def run(self, spec, services):
+        sock = get_source_pool().connect((spec['ip'], spec['port']), timeout=spec['timeout'])
+        session = FtpSession(sock)
+        try:
+            code, banner = session.reply()
+            if code != 220:
+                return (False, f"FTP not ready: {code} {banner}")
+            code, text = session.command(f"USER {spec['username']}")
+            if code == 331:
+                code, text = session.command(f"PASS {spec['password']}")
+            if code != 230:
+                return (False, f"Authentication failed: {code} {text}")
+            try:
+                session.command("QUIT")
+            except (OSError, ValueError):
+                pass
+            return (True, f"Logged in as {spec['username']} ({banner[:80]})")
+        finally:
+            session.close()
+
+
+register(FtpCheck())
@@ -0,0 +1,26 @@
+"""Ping check: ICMP echo over the shared prober socket."""
+
+from check_plugins import CheckPlugin, Field, register
+
+
+class PingCheck(CheckPlugin):
+    name = "ping"
+    label = "Ping"
+    default_timeout = 20
+    cost = 1.0
+    options = {
+        "count": Field("int", 3),
+        "reply_timeout": Field("float", 2),
+    }
+
+    def build(self, spec, options, team):
+        spec.update(
+            count=options.get("count", 3),
+            reply_timeout=options.get("reply_timeout", 2),
+        )
+
+    def run(self, spec, services):
+        return services.ping_host(spec['ip'], count=spec['count'], timeout=spec['reply_timeout'])
+
+
+register(PingCheck())
@@ -0,0 +1,94 @@
+"""
+SMB check: negotiate an SMB2/3 dialect with the team's file server.
+
+Sends one SMB2 NEGOTIATE request offering dialects 2.0.2 to 3.0.2 and
+passes if the server accepts one. That shows the server process is up and
+speaking SMB without needing credentials or an NTLM implementation. Set
+``min_dialect`` (e.g. ``"3.0"``) to also fail servers that only offer older
+dialects.
+"""
+
+import os
+import socket
+import struct
+
+from check_plugins import CheckPlugin, Field, register
+from source_addresses import get_source_pool
+
+
+DIALECTS = {0x0202: "2.0.2", 0x0210: "2.1", 0x0300: "3.0", 0x0302: "3.0.2"}
+
+_SMB2_MAGIC = b"\xfeSMB"
+# Protocol id, structure size, credit charge, status, command, credits,
+# flags, next command, message id, process id, tree id, session id, signature
+_HEADER = struct.Struct("<4sHHIHHIIQIIQ16s")
+# Structure size, dialect count, security mode, reserved, capabilities,
+# client GUID, client start time
+_NEGOTIATE = struct.Struct("<HHHHI16sQ")
+
+
+def build_negotiate() -> bytes:
+    header = _HEADER.pack(_SMB2_MAGIC, 64, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, b"\x00" * 16)
+    body = _NEGOTIATE.pack(36, len(DIALECTS), 1, 0, 0, os.urandom(16), 0)
+    body += struct.pack(f"<{len(DIALECTS)}H", *DIALECTS)
+    message = header + body
+    # Direct TCP transport: zero byte plus 24-bit length
+    return struct.pack(">I", len(message)) + message
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("SMB server closed the connection (EOF)")
+        data += chunk
+    return data
+
+
+def _dialect_version(name: str):
+    return tuple(int(part) for part in name.split("."))
+
+
+class SmbCheck(CheckPlugin):
+    name = "smb"
+    label = "SMB"
+    default_timeout = 10
+    cost = 3.0
+    max_parallelism = 32
+    options = {
+        "port": Field("port", 445),
+        "min_dialect": Field("str"),
+    }
+
+    def build(self, spec, options, team):
+        spec.update(
+            port=options.get("port", 445),
+            min_dialect=options.get("min_dialect"),
+        )
+
+    def run(self, spec, services):
+        sock = get_source_pool().connect((spec['ip'], spec['port']), timeout=spec['timeout'])
+        try:
+            sock.sendall(build_negotiate())
+            length = struct.unpack(">I", _recv_exactly(sock, 4))[0] & 0xFFFFFF
+            if length < _HEADER.size + 8 or length > 1 << 20:
+                return (False, f"Unexpected SMB reply of {length} bytes")
+            reply = _recv_exactly(sock, length)
+        finally:
+            sock.close()
+
+        magic, _, _, status, command = struct.unpack_from("<4sHHIH", reply)
+        if magic != _SMB2_MAGIC or command != 0:
+            return (False, "Not an SMB2 negotiate reply (SMB1-only server?)")
+        if status:
+            return (False, f"SMB negotiate failed with status 0x{status:08x}")
+        dialect = DIALECTS.get(struct.unpack_from("<H", reply, _HEADER.size + 4)[0])
+        if dialect is None:
+            return (False, "SMB server picked a dialect we did not offer")
+        if spec['min_dialect'] and _dialect_version(dialect) < _dialect_version(spec['min_dialect']):
+            return (False, f"SMB dialect {dialect} is older than {spec['min_dialect']}")
+        return (True, f"SMB dialect {dialect}")
+
+
+register(SmbCheck())
@@ -0,0 +1,279 @@
+"""
+SQL check: log in to the team's MySQL/MariaDB or PostgreSQL server.
+
+Speaks just enough of each wire protocol to authenticate, with no client
+library: MySQL ``mysql_native_password`` and the ``caching_sha2_password``
+fast path, and PostgreSQL cleartext, MD5 and SCRAM-SHA-256. The check
+passes once the server accepts the login.
+
+``caching_sha2_password`` (the MySQL 8 default) only allows the fast path
+after the user has logged in once over TLS since the server started; use
+``mysql_native_password`` for the scoring account if that is a problem.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import socket
+import struct
+
+from check_plugins import CheckPlugin, Field, register
+from source_addresses import get_source_pool
+
+
+DIALECTS = ("mysql", "postgresql")
+
+# MySQL capability flags
+CLIENT_LONG_PASSWORD = 0x1
+CLIENT_CONNECT_WITH_DB = 0x8
+CLIENT_PROTOCOL_41 = 0x200
+CLIENT_SECURE_CONNECTION = 0x8000
+CLIENT_PLUGIN_AUTH = 0x80000
+MYSQL_ACCESS_DENIED = 1045
+
+POSTGRES_PROTOCOL = 196608
+POSTGRES_AUTH_FAILED = ("28P01", "28000")
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Database server closed the connection (EOF)")
+        data += chunk
+    return data
+
+
+def _xor(left: bytes, right: bytes) -> bytes:
+    return bytes(a ^ b for a, b in zip(left, right))
+
+
+# --- MySQL ---
+
+def _mysql_read(sock: socket.socket):
+    header = _recv_exactly(sock, 4)
+    length = header[0] | header[1] << 8 | header[2] << 16
+    return header[3], _recv_exactly(sock, length)
+
+
+def _mysql_send(sock: socket.socket, seq: int, payload: bytes):
+    sock.sendall(struct.pack("<I", len(payload))[:3] + bytes((seq & 0xFF,)) + payload)
+
+
+def _mysql_error(payload: bytes):
+    code = struct.unpack_from("<H", payload, 1)[0]
+    # "#" and a five-character SQL state precede the text in protocol 4.1
+    text = payload[9:] if payload[3:4] == b"#" else payload[3:]
+    return code, text.decode("utf-8", "replace")
+
+
+def mysql_scramble(plugin: str, password: str, nonce: bytes) -> bytes:
+    if not password:
+        return b""
+    secret = password.encode("utf-8")
+    if plugin == "caching_sha2_password":
+        digest = hashlib.sha256(secret).digest()
+        return _xor(digest, hashlib.sha256(hashlib.sha256(digest).digest() + nonce).digest())
+    digest = hashlib.sha1(secret).digest()
+    return _xor(digest, hashlib.sha1(nonce + hashlib.sha1(digest).digest()).digest())
+
+
+def _mysql_greeting(payload: bytes):
+    """``(server version, nonce, auth plugin)`` from the initial handshake."""
+    end = payload.index(b"\x00", 1)
+    version = payload[1:end].decode("latin-1")
+    pos = end + 1 + 4
+    nonce = payload[pos:pos + 8]
+    pos += 8 + 1 + 2
+    plugin = "mysql_native_password"
+    if len(payload) > pos:
+        auth_length = payload[pos + 5]
+        pos += 16
+        rest = max(13, auth_length - 8)
+        nonce += payload[pos:pos + rest].rstrip(b"\x00")
+        pos += rest
+        if pos < len(payload):
+            plugin = payload[pos:].split(b"\x00", 1)[0].decode("latin-1") or plugin
+    return version, nonce[:20], plugin
+
+
+def check_mysql(sock: socket.socket, username: str, password: str, database: str):
+    seq, payload = _mysql_read(sock)
+    if payload[:1] == b"\xff":
+        return (False, "MySQL error %d: %s" % _mysql_error(payload))
+    if payload[:1] != b"\x0a":
+        return (False, "Not a MySQL server (unknown handshake)")
+    version, nonce, plugin = _mysql_greeting(payload)
+
+    capabilities = CLIENT_LONG_PASSWORD | CLIENT_PROTOCOL_41 | CLIENT_SECURE_CONNECTION | CLIENT_PLUGIN_AUTH
+    if database:
+        capabilities |= CLIENT_CONNECT_WITH_DB
+    auth = mysql_scramble(plugin, password, nonce)
+    response = struct.pack("<IIB23x", capabilities, 1 << 24, 33)
+    response += username.encode("utf-8") + b"\x00" + bytes((len(auth),)) + auth
+    if database:
+        response += database.encode("utf-8") + b"\x00"
+    response += plugin.encode("latin-1") + b"\x00"
+    _mysql_send(sock, seq + 1, response)
+
+    while True:
+        seq, payload = _mysql_read(sock)
+        marker = payload[:1]
+        if marker == b"\x00":
+            _mysql_send(sock, 0, b"\x01")  # COM_QUIT
+            return (True, f"Logged in as {username} (MySQL {version})")
+        if marker == b"\xff":
+            code, text = _mysql_error(payload)
+            if code == MYSQL_ACCESS_DENIED:
+                return (False, f"Authentication failed: {text}")
+            return (False, f"MySQL error {code}: {text}")
+        if marker == b"\xfe":
+            # Auth switch: scramble again for the plugin the server wants
+            name, _, data = payload[1:].partition(b"\x00")
+            plugin = name.decode("latin-1")
+            _mysql_send(sock, seq + 1, mysql_scramble(plugin, password, data.rstrip(b"\x00")[:20]))
+        elif marker == b"\x01" and payload[1:2] == b"\x04":
+            return (False, "MySQL wants full caching_sha2_password authentication; "
+                           "use mysql_native_password for the scoring user")
+        elif marker != b"\x01":
+            return (False, "Unexpected MySQL reply during login")
+
+
+# --- PostgreSQL ---
+
+def _pg_read(sock: socket.socket):
+    kind = _recv_exactly(sock, 1)
+    length = struct.unpack("!I", _recv_exactly(sock, 4))[0]
+    return kind, _recv_exactly(sock, length - 4)
+
+
+def _pg_send(sock: socket.socket, kind: bytes, body: bytes):
+    sock.sendall(kind + struct.pack("!I", len(body) + 4) + body)
+
+
+def _pg_error(body: bytes):
+    fields = {}
+    for part in body.split(b"\x00"):
+        if part:
+            fields[part[:1]] = part[1:].decode("utf-8", "replace")
+    return fields.get(b"C", ""), fields.get(b"M", "unknown error")
+
+
+class _Scram:
+    """Client side of SCRAM-SHA-256 (RFC 7677) as PostgreSQL uses it."""
+
+    def __init__(self, password: str):
+        self.password = password.encode("utf-8")
+        self.nonce = base64.b64encode(os.urandom(18)).decode("ascii")
+        # PostgreSQL takes the user name from the startup message
+        self.first_bare = f"n=,r={self.nonce}"
+        self.server_signature = None
+
+    def first(self) -> bytes:
+        message = ("n,," + self.first_bare).encode("ascii")
+        return b"SCRAM-SHA-256\x00" + struct.pack("!I", len(message)) + message
+
+    def final(self, server_first: str) -> bytes:
+        attributes = dict(part.split("=", 1) for part in server_first.split(","))
+        if not attributes["r"].startswith(self.nonce):
+            raise ValueError("SCRAM nonce mismatch")
+        salted = hashlib.pbkdf2_hmac("sha256", self.password, base64.b64decode(attributes["s"]),
+                                     int(attributes["i"]))
+        client_key = hmac.new(salted, b"Client Key", hashlib.sha256).digest()
+        without_proof = f"c=biws,r={attributes['r']}"
+        auth_message = f"{self.first_bare},{server_first},{without_proof}".encode("ascii")
+        signature = hmac.new(hashlib.sha256(client_key).digest(), auth_message, hashlib.sha256).digest()
+        server_key = hmac.new(salted, b"Server Key", hashlib.sha256).digest()
+        self.server_signature = hmac.new(server_key, auth_message, hashlib.sha256).digest()
+        proof = base64.b64encode(_xor(client_key, signature)).decode("ascii")
+        return f"{without_proof},p={proof}".encode("ascii")
+
+    def verify(self, server_final: str) -> bool:
+        attributes = dict(part.split("=", 1) for part in server_final.split(","))
+        return hmac.compare_digest(base64.b64decode(attributes.get("v", "")), self.server_signature or b"")
+
+
+def check_postgresql(sock: socket.socket, username: str, password: str, database: str):
+    params = b"user\x00" + username.encode("utf-8") + b"\x00"
+    if database:
+        params += b"database\x00" + database.encode("utf-8") + b"\x00"
+    body = struct.pack("!I", POSTGRES_PROTOCOL) + params + b"\x00"
+    sock.sendall(struct.pack("!I", len(body) + 4) + body)
+
+    scram = None
+    version = ""
+    while True:
+        kind, body = _pg_read(sock)
+        if kind == b"E":
+            code, text = _pg_error(body)
+            if code in POSTGRES_AUTH_FAILED:
+                return (False, f"Authentication failed: {text}")
+            return (False, f"PostgreSQL error {code}: {text}")
+        if kind == b"S":
+            name, _, value = body.partition(b"\x00")
+            if name == b"server_version":
+                version = value.rstrip(b"\x00").decode("latin-1")
+        elif kind == b"Z":
+            _pg_send(sock, b"X", b"")
+            return (True, f"Logged in as {username} (PostgreSQL {version or 'server'})")
+        elif kind == b"R":
+            code = struct.unpack_from("!I", body)[0]
+            if code == 3:
+                _pg_send(sock, b"p", password.encode("utf-8") + b"\x00")
+            elif code == 5:
+                inner = hashlib.md5((password + username).encode("utf-8")).hexdigest()
+                outer = hashlib.md5(inner.encode("ascii") + body[4:8]).hexdigest()
+                _pg_send(sock, b"p", b"md5" + outer.encode("ascii") + b"\x00")
+            elif code == 10:
+                if b"SCRAM-SHA-256\x00" not in body[4:]:
+                    return (False, "PostgreSQL offered no supported SASL mechanism")
+                scram = _Scram(password)
+                _pg_send(sock, b"p", scram.first())
+            elif code == 11 and scram is not None:
+                _pg_send(sock, b"p", scram.final(body[4:].decode("ascii")))
+            elif code == 12 and scram is not None:
+                if not scram.verify(body[4:].decode("ascii")):
+                    return (False, "PostgreSQL server signature mismatch")
+            elif code != 0:
+                return (False, f"Unsupported PostgreSQL authentication method {code}")
+
+
+class SqlCheck(CheckPlugin):
+    name = "sql"
+    label = "SQL"
+    default_timeout = 10
+    cost = 3.0
+    max_parallelism = 32
+    options = {
+        "dialect": Field("str", "mysql"),
+    }
+    team_fields = {
+        "username": Field("str", "scoring"),
+        "password": Field("password", "changeme"),
+        "database": Field("str", "", required=False),
+        "port": Field("port", 3306),
+    }
+
+    def build(self, spec, options, team):
+        spec.update(
+            dialect=options.get("dialect", "mysql"),
+            username=self.team_value(team, options, "username"),
+            password=self.team_value(team, options, "password"),
+            database=self.team_value(team, options, "database") or "",
+            port=self.team_value(team, options, "port"),
+        )
+
+    def run(self, spec, services):
+        if spec['dialect'] not in DIALECTS:
+            return (False, f"Unknown SQL dialect {spec['dialect']}; expected one of {DIALECTS}")
+        check = check_mysql if spec['dialect'] == "mysql" else check_postgresql
+        sock = get_source_pool().connect((spec['ip'], spec['port']), timeout=spec['timeout'])
+        try:
+            return check(sock, spec['username'], spec['password'], spec['database'])
+        finally:
+            sock.close()
+
+
+register(SqlCheck())
@@ -0,0 +1,42 @@
+"""SSH check: log in and run ``ls`` (``dir`` on Windows systems)."""
+
+from check_plugins import CheckPlugin, Field, register
+
+
+class SshCheck(CheckPlugin):
+    name = "ssh"
+    label = "SSH"
+    default_timeout = 20
+    # Key exchange and login are the most CPU-heavy checks we run
+    cost = 5.0
+    max_parallelism = 32
+    options = {
+        "persistent": Field("bool", True),
+        "max_output_bytes": Field("int", 4096),
+    }
+    team_fields = {
+        "username": Field("str", "sysadmin"),
+        "password": Field("password", "changeme"),
+        "port": Field("port", 22),
+    }
+
+    def build(self, spec, options, team):
+        spec.update(
+            username=self.team_value(team, options, "username"),
+            password=self.team_value(team, options, "password"),
+            port=self.team_value(team, options, "port"),
+            persistent=options.get("persistent", True),
+            max_output=options.get("max_output_bytes", 4096),
+        )
+
+    def run(self, spec, services):
+        # Determine OS based on system name from master config
+        detected_os = "linux" if "ubuntu" in spec['system_name'].lower() else "windows"
+        return services.ssh_connection(
+            spec['username'], spec['password'], spec['ip'], detected_os,
+            port=spec['port'], timeout=spec['timeout'],
+            persistent=spec['persistent'], max_output=spec['max_output'],
+        )
+
+
+register(SshCheck())
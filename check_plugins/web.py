@@ -0,0 +1,41 @@
+"""Web check: fetch the team's page over pooled keep-alive connections."""
+
+from check_plugins import CheckPlugin, Field, register
+
+
+class WebCheck(CheckPlugin):
+    name = "web"
+    label = "Web"
+    default_timeout = 20
+    cost = 2.0
+    options = {
+        "connect_timeout": Field("float", 5),
+        "max_bytes": Field("int", 65536),
+        "expect_substring": Field("str"),
+        "expect_sha256": Field("str"),
+    }
+    team_fields = {
+        "port": Field("port", 80),
+    }
+
+    def build(self, spec, options, team):
+        spec.update(
+            port=self.team_value(team, options, "port"),
+            connect_timeout=options.get("connect_timeout", 5),
+            max_bytes=options.get("max_bytes", 65536),
+            expect_substring=options.get("expect_substring"),
+            expect_sha256=options.get("expect_sha256"),
+        )
+
+    def run(self, spec, services):
+        return services.web_request(
+            f"http://{spec['ip']}:{spec['port']}",
+            connect_timeout=spec['connect_timeout'],
+            timeout=spec['timeout'],
+            max_bytes=spec['max_bytes'],
+            expect_substring=spec['expect_substring'],
+            expect_sha256=spec['expect_sha256'],
+        )
+
+
+register(WebCheck())
@@ -0,0 +1,70 @@
+"""
+Check specs and runners for the scoring engine.
+
+A check spec is a plain dict describing one check with everything resolved:
+target address, the team's credentials and ports from team_configs.json and
+the service settings from master_config.json. Each service type's fields
+and check come from its plugin in check_plugins/. Specs contain only JSON
+types, so the same spec can run in-process on the CheckEngine or be sent to
+a grading worker process (see worker_pool.py) and run there.
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+from check_plugins import get_plugin
+from host_gate import get_host_gate
+
+
+def build_check_spec(scenario, team_cfg) -> Optional[Dict[str, Any]]:
+    """
+    Resolve a scenario and the team's config overrides into a check spec.
+    Returns None for services without a check plugin.
+    """
+    service_name = scenario['service_name']
+    plugin = get_plugin(service_name)
+    if plugin is None:
+        return None
+
+    spec = {
+        'service': service_name,
+        'team_id': scenario['team_id'],
+        'system_name': scenario['system_name'],
+        'score_key': scenario['score_key'],
+        'points': scenario['points'],
+        'ip': scenario['ip_address'],
+        'timeout': scenario['timeout'],
+    }
+
+    # Team-specific config overrides
+    options = scenario[service_name]
+    system_cfg = team_cfg.get(spec['team_id'], {}).get(spec['system_name'], {})
+    plugin.build(spec, options, system_cfg.get(service_name, {}))
+
+    # Probe settings for services that depend on the host being reachable
+    reachability = options.get('reachability')
+    if reachability is not None:
+        spec['reachability'] = dict(reachability)
+    return spec
+
+
+def run_check(spec: Dict[str, Any], services) -> Tuple[bool, str]:
+    """Run one check spec and return ``(ok, message)``."""
+    plugin = get_plugin(spec['service'])
+    if plugin is None:
+        return (False, f"Unknown service {spec['service']}")
+    gate = get_host_gate()
+    reachability = spec.get('reachability')
+    port = spec.get('port') if reachability is not None else None
+    if port is not None:
+        # Fail fast instead of waiting out the full timeout on a dead host
+        blocked = gate.admit(spec['ip'], port, reachability)
+        if blocked is not None:
+            return (False, blocked)
+    try:
+        result = plugin.run(spec, services)
+    except Exception as e:
+        result = (False, str(e))
+    # Ping and web checks return their measurements after (ok, message)
+    ok, message = bool(result[0]), str(result[1])
+    gate.record(spec['ip'], port, ok, message)
+    return (ok, message)
@@ -1,11 +1,205 @@
 """
 Centralized configuration loader for the scoring engine.
 This module provides utilities to load and work with the master configuration.
+
+The list of checks to run is compiled once into an immutable ScenarioPlan
+with indexes by team, system and service. When master_config.json changes on
+disk the config and plan are rebuilt and swapped in together, so readers
+always see a consistent pair without rebuilding anything per cycle.
 """
 
+import ipaddress
 import json
 import os
-from typing import Dict, List, Any
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, List, Any, Mapping, Optional, Tuple
+
+from check_plugins import get_plugin
+
+
+class Scenario:
+    """
+    One (team, system, service) check. Immutable and slot-based; fields can
+    be read as attributes or, for compatibility, like a dict
+    (``scenario['team_id']``, ``scenario['ssh']``).
+    """
+    
+    __slots__ = ('team_id', 'team_num', 'system_name', 'system_display_name',
+                 'service_name', 'service_display_name', 'ip_address', 'ip_offset',
+                 'points', 'timeout', 'score_key', 'options')
+    
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields.get(name))
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("Scenario is immutable")
+    
+    def __getitem__(self, key):
+        if key in self.__slots__:
+            return getattr(self, key)
+        # Service-specific settings, e.g. scenario['ssh']
+        if key == self.service_name and self.options is not None:
+            return self.options
+        raise KeyError(key)
+    
+    def __contains__(self, key):
+        return key in self.__slots__ or key == self.service_name
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    @property
+    def key(self) -> Tuple[str, str, str]:
+        return (self.team_id, self.system_name, self.service_name)
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Plain dict in the historical get_all_test_scenarios() format."""
+        data = {name: getattr(self, name) for name in self.__slots__ if name != 'options'}
+        data[self.service_name] = dict(self.options or {})
+        return data
+    
+    def __repr__(self):
+        return f"Scenario({self.team_id}/{self.system_name}/{self.service_name} @ {self.ip_address})"
+
+
+def _service_options(service_name: str, service_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Service-specific settings carried on each scenario."""
+    plugin = get_plugin(service_name)
+    if plugin is None:
+        return {}
+    return plugin.service_options(service_config)
+
+
+# Services that only run once their host is known to be reachable; see host_gate.py
+DEFAULT_REACHABILITY = {
+    'enabled': True,
+    'services': ['ssh', 'web', 'active_directory', 'ftp', 'smb', 'sql'],
+    'probe_timeout': 1.0,
+    'fresh_seconds': 60,
+    'failure_threshold': 3
+}
+
+
+def _reachability_options(reachability: Dict[str, Any]) -> Dict[str, Any]:
+    """Gate settings carried on the scenarios of dependent services."""
+    return {
+        'probe_timeout': reachability.get('probe_timeout', DEFAULT_REACHABILITY['probe_timeout']),
+        'fresh_seconds': reachability.get('fresh_seconds', DEFAULT_REACHABILITY['fresh_seconds']),
+        'failure_threshold': reachability.get('failure_threshold', DEFAULT_REACHABILITY['failure_threshold'])
+    }
+
+
+def _team_number(team: Dict[str, Any], index: int) -> int:
+    """Team number from an id like "team7", falling back to list position."""
+    try:
+        return int(str(team['id']).replace('team', ''))
+    except ValueError:
+        return index + 1
+
+
+def _system_address(team: Dict[str, Any], team_num: int, ip_offset: int) -> str:
+    """
+    Address of a team's system: the team's ``subnet`` network address plus
+    the system's ``ip_offset``, or 10.0.<team number>.<ip_offset> when the
+    team has no subnet.
+    """
+    subnet = team.get('subnet')
+    if subnet:
+        network = ipaddress.ip_network(subnet, strict=False)
+        return str(network.network_address + int(ip_offset))
+    return f"10.0.{team_num}.{ip_offset}"
+
+
+class ScenarioPlan:
+    """Immutable, indexed set of every check the grader runs."""
+    
+    def __init__(self, config: Dict[str, Any], version: int):
+        self.version = version
+        services = config.get('services', {})
+        teams = config.get('teams', [])
+        systems = config.get('systems', [])
+        
+        scenarios = []
+        by_team: Dict[str, list] = {}
+        by_system: Dict[str, list] = {}
+        by_service: Dict[str, list] = {}
+        by_key: Dict[Tuple[str, str, str], Scenario] = {}
+        addresses: Dict[Tuple[str, str], str] = {}
+        
+        # Service options are shared by every scenario of that service
+        reachability = config.get('reachability', DEFAULT_REACHABILITY)
+        gated = set(reachability.get('services', DEFAULT_REACHABILITY['services']))
+        options = {}
+        for name, service_config in services.items():
+            service_options = _service_options(name, service_config)
+            if reachability.get('enabled', True) and name in gated:
+                service_options['reachability'] = MappingProxyType(_reachability_options(reachability))
+            options[name] = MappingProxyType(service_options)
+        
+        for index, team in enumerate(teams):
+            team_id = team['id']
+            team_num = _team_number(team, index)
+            
+            for system in systems:
+                system_name = system['name']
+                ip_offset = system['ip_offset']
+                ip_address = _system_address(team, team_num, ip_offset)
+                addresses[(team_id, system_name)] = ip_address
+                
+                for service_name in system.get('services', []):
+                    service_config = services.get(service_name, {})
+                    plugin = get_plugin(service_name)
+                    default_timeout = plugin.default_timeout if plugin is not None else 20
+                    scenario = Scenario(
+                        team_id=team_id,
+                        team_num=team_num,
+                        system_name=system_name,
+                        system_display_name=system.get('display_name', system_name),
+                        service_name=service_name,
+                        service_display_name=service_config.get('display_name', service_name),
+                        ip_address=ip_address,
+                        ip_offset=ip_offset,
+                        points=service_config.get('points', 10),
+                        timeout=service_config.get('timeout', default_timeout),
+                        score_key=f"{system_name}{service_name}",
+                        options=options.get(service_name, MappingProxyType({})),
+                    )
+                    scenarios.append(scenario)
+                    by_team.setdefault(team_id, []).append(scenario)
+                    by_system.setdefault(system_name, []).append(scenario)
+                    by_service.setdefault(service_name, []).append(scenario)
+                    by_key[scenario.key] = scenario
+        
+        self.scenarios: Tuple[Scenario, ...] = tuple(scenarios)
+        self.by_team: Mapping[str, Tuple[Scenario, ...]] = MappingProxyType({k: tuple(v) for k, v in by_team.items()})
+        self.by_system: Mapping[str, Tuple[Scenario, ...]] = MappingProxyType({k: tuple(v) for k, v in by_system.items()})
+        self.by_service: Mapping[str, Tuple[Scenario, ...]] = MappingProxyType({k: tuple(v) for k, v in by_service.items()})
+        self.by_key: Mapping[Tuple[str, str, str], Scenario] = MappingProxyType(by_key)
+        self.teams_by_id: Mapping[str, Dict[str, Any]] = MappingProxyType({t['id']: t for t in teams})
+        self.addresses: Mapping[Tuple[str, str], str] = MappingProxyType(addresses)
+    
+    def __len__(self):
+        return len(self.scenarios)
+    
+    def __iter__(self):
+        return iter(self.scenarios)
+
+
+class _LoadedConfig:
+    """A config dict and the plan compiled from it, swapped as one unit."""
+    
+    __slots__ = ('config', 'plan', 'version')
+    
+    def __init__(self, config: Dict[str, Any], version: int):
+        self.config = config
+        self.plan = ScenarioPlan(config, version)
+        self.version = version
 
 
 class ConfigLoader:
@@ -13,7 +207,31 @@ class ConfigLoader:
     
     def __init__(self, config_path="master_config.json"):
         self.config_path = config_path
-        self.config = self._load_config()
+        self._file_stamp = self._stat()
+        self._loaded = _LoadedConfig(self._load_config(), 1)
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+    
+    @property
+    def config(self) -> Dict[str, Any]:
+        return self._loaded.config
+    
+    @property
+    def plan(self) -> ScenarioPlan:
+        """The compiled scenario plan for the current config."""
+        return self._loaded.plan
+    
+    @property
+    def version(self) -> int:
+        """Bumped on every reload so cached views of the config can refresh."""
+        return self._loaded.version
+    
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.config_path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
     
     def _load_config(self) -> Dict[str, Any]:
         """Load the master configuration file."""
@@ -29,8 +247,47 @@ class ConfigLoader:
             raise ValueError(f"Invalid JSON in {self.config_path}: {e}")
     
     def reload(self):
-        """Reload the configuration from disk."""
-        self.config = self._load_config()
+        """Reload the configuration from disk and recompile the plan."""
+        with self._reload_lock:
+            stamp = self._stat()
+            loaded = _LoadedConfig(self._load_config(), self._loaded.version + 1)
+            # Single reference swap: readers see the old or new pair, never a mix
+            self._loaded = loaded
+            self._file_stamp = stamp
+    
+    def check_for_changes(self) -> bool:
+        """
+        Reload if master_config.json changed on disk since it was last read.
+        An invalid file is reported and the current config is kept.
+        """
+        stamp = self._stat()
+        if stamp is None or stamp == self._file_stamp:
+            return False
+        try:
+            self.reload()
+        except (ValueError, KeyError, TypeError) as err:
+            # Probably caught mid-edit; remember the stamp so we don't spin
+            self._file_stamp = stamp
+            print(f"Ignoring invalid {self.config_path}:", err)
+            return False
+        print(f"Reloaded {self.config_path} (version {self.version}, {len(self.plan)} checks)")
+        return True
+    
+    def start_watching(self, interval: float = 2.0):
+        """Poll master_config.json for changes in a background thread."""
+        if self._watcher is not None:
+            return
+        
+        def watch_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.check_for_changes()
+                except Exception as err:
+                    print("Config watch failed:", repr(err))
+        
+        self._watcher = threading.Thread(target=watch_loop, daemon=True)
+        self._watcher.start()
     
     def get_teams(self) -> List[Dict[str, Any]]:
         """Get list of all teams."""
@@ -38,10 +295,7 @@ class ConfigLoader:
     
     def get_team_by_id(self, team_id: str) -> Dict[str, Any]:
         """Get a specific team by its ID."""
-        for team in self.get_teams():
-            if team['id'] == team_id:
-                return team
-        return None
+        return self.plan.teams_by_id.get(team_id)
     
     def get_systems(self) -> List[Dict[str, Any]]:
         """Get list of all systems to be monitored."""
@@ -62,22 +316,36 @@ class ConfigLoader:
             'concurrent_threads': True
         })
     
+    def get_persistence_config(self) -> Dict[str, Any]:
+        """Get score persistence (journal/snapshot) configuration."""
+        return self.config.get('persistence', {
+            'journal': True,
+            'reset_on_start': False
+        })
+    
+    def get_agents_config(self) -> Dict[str, Any]:
+        """Get distributed grading agent configuration."""
+        return self.config.get('agents', {'enabled': False})
+    
+    def get_history_config(self) -> Dict[str, Any]:
+        """Get per-check result history configuration."""
+        return self.config.get('history', {'samples_per_check': 720, 'database': False})
+    
+    def get_rate_limits_config(self) -> Dict[str, Any]:
+        """Get per-subnet and per-host probe budget configuration."""
+        return self.config.get('rate_limits', {'enabled': False})
+    
+    def get_source_addresses_config(self) -> Dict[str, Any]:
+        """Get the source address pool for outgoing probes."""
+        return self.config.get('source_addresses', {'addresses': []})
+    
+    def get_metrics_config(self) -> Dict[str, Any]:
+        """Get /metrics endpoint configuration."""
+        return self.config.get('metrics', {'enabled': True})
+    
     def get_team_ip(self, team_id: str, system_name: str) -> str:
         """Generate IP address for a team's system."""
-        team = self.get_team_by_id(team_id)
-        if not team:
-            return None
-        
-        # Extract team number from team_id (e.g., "team1" -> 1)
-        team_num = int(team_id.replace('team', ''))
-        
-        # Find the system
-        for system in self.get_systems():
-            if system['name'] == system_name:
-                ip_offset = system['ip_offset']
-                return f"10.0.{team_num}.{ip_offset}"
-        
-        return None
+        return self.plan.addresses.get((team_id, system_name))
     
     def generate_login_credentials(self) -> Dict[str, str]:
         """Generate login credentials dict for config.json format."""
@@ -125,75 +393,21 @@ class ConfigLoader:
                 
                 # Check which services this system has and add default configs
                 for service_name in system.get('services', []):
+                    plugin = get_plugin(service_name)
+                    if plugin is None or not plugin.team_fields:
+                        continue
                     service_config = self.get_service_config(service_name)
-                    
-                    if service_name == 'ssh':
-                        team_configs[team_id][system_name]['ssh'] = {
-                            'username': service_config.get('default_username', 'sysadmin'),
-                            'password': service_config.get('default_password', 'changeme'),
-                            'port': service_config.get('default_port', 22)
-                        }
-                    elif service_name == 'web':
-                        team_configs[team_id][system_name]['web'] = {
-                            'port': service_config.get('default_port', 80)
-                        }
-                    elif service_name == 'active_directory':
-                        team_configs[team_id][system_name]['active_directory'] = {
-                            'username': service_config.get('default_username', 'administrator'),
-                            'password': service_config.get('default_password', 'changeme'),
-                            'domain': service_config.get('default_domain', 'example.com')
-                        }
+                    team_configs[team_id][system_name][service_name] = plugin.team_defaults(service_config)
         
         return team_configs
     
-    def get_all_test_scenarios(self) -> List[Dict[str, Any]]:
+    def get_all_test_scenarios(self) -> Tuple[Scenario, ...]:
         """
-        Generate all test scenarios based on teams, systems, and services.
-        Returns a list of test scenario dictionaries.
+        All test scenarios (one per team, system and service) from the
+        compiled plan. The tuple and its scenarios are immutable and shared,
+        so calling this every cycle costs nothing.
         """
-        scenarios = []
-        
-        for team in self.get_teams():
-            team_id = team['id']
-            team_num = int(team_id.replace('team', ''))
-            
-            for system in self.get_systems():
-                system_name = system['name']
-                ip_offset = system['ip_offset']
-                ip_address = f"10.0.{team_num}.{ip_offset}"
-                
-                for service_name in system.get('services', []):
-                    service_config = self.get_service_config(service_name)
-                    
-                    scenario = {
-                        'team_id': team_id,
-                        'team_num': team_num,
-                        'system_name': system_name,
-                        'system_display_name': system.get('display_name', system_name),
-                        'service_name': service_name,
-                        'service_display_name': service_config.get('display_name', service_name),
-                        'ip_address': ip_address,
-                        'ip_offset': ip_offset,
-                        'points': service_config.get('points', 10),
-                        'timeout': service_config.get('timeout', 20),
-                        'score_key': f"{system_name}{service_name}"
-                    }
-                    
-                    # Add service-specific config
-                    if service_name == 'ssh':
-                        scenario['ssh'] = {
-                            'default_username': service_config.get('default_username', 'sysadmin'),
-                            'default_password': service_config.get('default_password', 'changeme'),
-                            'default_port': service_config.get('default_port', 22)
-                        }
-                    elif service_name == 'web':
-                        scenario['web'] = {
-                            'default_port': service_config.get('default_port', 80)
-                        }
-                    
-                    scenarios.append(scenario)
-        
-        return scenarios
+        return self.plan.scenarios
 
 
 # Singleton instance
@@ -1,224 +1,238 @@
 import time
 from test_services import Services
-import json
 import math
-import threading
-import os
+import sys
 from config_loader import get_config_loader
-
-# Use a module-level lock to serialize read/write access to scores.json
-# This prevents the common race where one thread truncates the file to write
-# while another thread attempts to read it and gets an empty file (causing
-# json.JSONDecodeError: Expecting value).
-_scores_file_lock = threading.Lock()
+from check_engine import CheckEngine
+from checks import build_check_spec, run_check
+from worker_pool import WorkerPool
+from agent_coordinator import AgentCoordinator
+from score_store import get_score_store
+from score_journal import ScoreJournal
+from score_broadcaster import ScoreBroadcaster
+from leaderboard import Leaderboard
+from state_confirmer import StateConfirmer
+from rate_limiter import interleave_hosts
+from source_addresses import SourceAddressPool, configure_source_pool
+from team_config_store import get_team_config_store
+from check_history import get_check_history
+from history_db import HistoryDatabase
+import metrics
 
 grading_cycle_count = 0
 
 class Grader:
     def __init__(self, sio):
-        # Ensure the scores file exists and contains a valid JSON object. Use the
-        # lock during initialization to avoid races with concurrently-starting
-        # grader threads.
         self.sio = sio
         self.is_grading = False
         # Initialize instance-level cycle counter mirror
         self.grading_cycle_count = 0
+        # Per-cycle state set by begin_cycle()
+        self.services = None
+        self.team_cfg = {}
+        self._cycle_started = None
         
         # Load centralized configuration
         self.config_loader = get_config_loader()
         
-        # Generate initial scores from master config
-        initial = self.config_loader.generate_initial_scores()
-
-        with _scores_file_lock:
-            # If file doesn't exist or is empty/invalid, write the initial
-            # structure. This avoids json.load() blowing up when reading an
-            # empty file.
-            try:
-                if not os.path.exists("scores.json"):
-                    with open("scores.json", "w") as score_file:
-                        json.dump(initial, score_file)
-                else:
-                    # Try to read existing file; if invalid, overwrite with
-                    # initial content.
-                    with open("scores.json", "r+") as score_file:
-                        try:
-                            data = json.load(score_file)
-                            # If it's not a dict, reset it
-                            if not isinstance(data, dict):
-                                score_file.seek(0)
-                                score_file.truncate()
-                                json.dump(initial, score_file)
-                        except json.JSONDecodeError:
-                            score_file.seek(0)
-                            score_file.truncate()
-                            json.dump(initial, score_file)
-            except Exception:
-                # If any unexpected error occurs during initialization,
-                # ensure the file has valid JSON so later operations don't
-                # fail.
-                with open("scores.json", "w") as score_file:
-                    json.dump(initial, score_file)
-
-    # Track how many grading cycles have completed
-    
-
+        # Long-lived worker pool shared by every grading cycle
+        self.engine = CheckEngine.from_config(self.config_loader)
+        # Probe source addresses are set up once, not per cycle
+        configure_source_pool(SourceAddressPool.from_config(self.config_loader))
+        
+        # Scores live in memory; scores.json is only a periodic snapshot.
+        # Results are journaled so a restart replays them instead of starting
+        # over. Loading fills in any teams/services missing on disk.
+        self.score_store = get_score_store()
+        if self.score_store.journal is None:
+            self.score_store.attach_journal(ScoreJournal.from_config(self.config_loader))
+        self.score_store.load(self.config_loader.generate_initial_scores())
+        
+        # Team-editable settings are read from memory; each cycle grades
+        # against the snapshot it took at its start.
+        self.team_configs = get_team_config_store()
+        self.team_configs.load(self.config_loader.generate_team_configs())
+        
+        # Fixed-size recent result history per cell for uptime queries
+        self.history = get_check_history(
+            self.config_loader.get_history_config().get('samples_per_check', 720)
+        )
+        # Optional long-term record of every result, written in batches
+        self.history_db = HistoryDatabase.from_config(self.config_loader)
+        if self.history_db is not None:
+            self.history_db.start()
+        
+        # Either flush on a timer or once at the end of every cycle
+        grading_config = self.config_loader.get_grading_config()
+        # Up/down flips are only scored once confirm_count results agree
+        self.confirmer = StateConfirmer(grading_config.get('confirm_count', 1))
+        self.flush_interval = grading_config.get('flush_interval_seconds', 0)
+        if self.flush_interval:
+            self.score_store.start_flusher(self.flush_interval)
+        
+        # Stream changed cells to clients as results arrive
+        # Spectators get a coalesced public view; teams get their own
+        # error details in a private room at the faster rate
+        broadcast_interval_ms = grading_config.get('broadcast_interval_ms', 250)
+        self.broadcaster = ScoreBroadcaster(
+            sio, self.score_store, broadcast_interval_ms / 1000.0,
+            public_interval=grading_config.get('public_broadcast_interval_ms', broadcast_interval_ms) / 1000.0,
+            binary=grading_config.get('broadcast_binary', False),
+        )
+        self.broadcaster.start()
+        # Totals and ranks maintained as results arrive
+        self.leaderboard = Leaderboard(sio, self.score_store, broadcast_interval_ms / 1000.0)
+        self.leaderboard.start()
+        
+        # Optionally run checks outside this process: on remote grading
+        # agents, or on local worker processes sharded by team. Either keeps
+        # CPU-heavy work off the web server's event loop.
+        self.executor = None
+        if self.config_loader.get_agents_config().get('enabled', False):
+            self.executor = AgentCoordinator.from_config(self.config_loader, self.record_result)
+            self.executor.start()
+        elif grading_config.get('worker_processes', 0):
+            self.executor = WorkerPool.from_config(self.config_loader, self.record_result)
 
     def append_scores(self, team, subject, error, points):
-        # Acquire the lock for the shortest practical time to avoid blocking
-        # other grading threads while ensuring read/modify/write is atomic.
-        with _scores_file_lock:
-            # Read scores safely; if file is empty or corrupt, replace with
-            # a known-good structure.
-            try:
-                with open("scores.json", "r") as score_file:
-                    scores = json.load(score_file)
-            except (FileNotFoundError, json.JSONDecodeError):
-                # Recreate the initial structure if missing or invalid.
-                scores = self.config_loader.generate_initial_scores()
-
-            # Defensive checks in case keys are missing
-            if team not in scores:
-                scores[team] = {}
-            if subject not in scores[team]:
-                scores[team][subject] = {"error": "Not tested", "score": 0}
-
-            scores[team][subject]["score"] = scores[team][subject].get("score", 0) + points
-            scores[team][subject]["error"] = error
-
-            # Write back atomically by writing to a temp file and renaming.
-            tmp_path = "scores.json.tmp"
-            with open(tmp_path, "w") as score_file:
-                json.dump(scores, score_file)
-            os.replace(tmp_path, "scores.json")
-
-    def grade_projects(self):
-        print("Grading projects...")
-        self.is_grading = True
+        # Pure in-memory update; persistence happens in coalesced snapshots.
+        self.score_store.apply(team, subject, error, points)
+
+    def begin_cycle(self):
+        """
+        Start a new grading cycle: bump the counter, notify clients and load
+        the team configuration and Services instance checks will use.
+        """
         # Increment the grading cycle counter at the start of a cycle
         global grading_cycle_count
         grading_cycle_count += 1
         # Mirror to the instance for reliable access from app.grader
         self.grading_cycle_count = grading_cycle_count
+        self._cycle_started = time.perf_counter()
         # Push live update of cycle to clients
         try:
             self.sio.emit("gradingCycle", {"cycle": int(self.grading_cycle_count)}, namespace="/")
         except Exception:
             pass
-        # If the Flask app is available on the global import, expose the
-        # counter there so templates can read it via the app object.
-        try:
-            import main
-            if getattr(main, 'app', None):
-                main.app.grading_cycle_count = grading_cycle_count
-        except Exception as err:
-            print(err)
+        # If the Flask app is loaded, expose the counter there so templates
+        # can read it via the app object. main.py usually runs as __main__;
+        # importing it again would re-run its module-level setup.
+        app_module = sys.modules.get('main') or sys.modules.get('__main__')
+        app = getattr(app_module, 'app', None)
+        if app is not None:
+            app.grading_cycle_count = grading_cycle_count
         
-        services = Services()
-        thread_list = []
-        
-        # Load team configuration for this grading cycle
-        try:
-            with open("team_configs.json", "r") as f:
-                team_cfg = json.load(f)
-        except Exception:
-            # Fallback to generated defaults from master config
-            team_cfg = self.config_loader.generate_team_configs()
-
-        # Get all test scenarios from centralized config
-        scenarios = self.config_loader.get_all_test_scenarios()
+        self.services = Services()
         
-        for scenario in scenarios:
-            team_id = scenario['team_id']
-            system_name = scenario['system_name']
-            service_name = scenario['service_name']
-            ip_address = scenario['ip_address']
-            
-            # Get team-specific config overrides
-            system_cfg = team_cfg.get(team_id, {}).get(system_name, {})
-            
-            # Create appropriate grading thread based on service type
-            if service_name == "ssh":
-                ssh_user = system_cfg.get("ssh", {}).get("username", scenario['ssh']['default_username'])
-                ssh_pass = system_cfg.get("ssh", {}).get("password", scenario['ssh']['default_password'])
-                ssh_port = system_cfg.get("ssh", {}).get("port", scenario['ssh']['default_port'])
-                
-                t = threading.Thread(
-                    target=self.grade_ssh,
-                    args=(team_id, ssh_user, ssh_pass, ssh_port, ip_address, system_name, scenario['score_key'], scenario['points'], services)
-                )
-            elif service_name == "ping":
-                t = threading.Thread(
-                    target=self.grade_ping,
-                    args=(team_id, ip_address, scenario['score_key'], scenario['points'], services)
-                )
-            elif service_name == "web":
-                web_port = system_cfg.get("web", {}).get("port", scenario['web']['default_port'])
-                
-                t = threading.Thread(
-                    target=self.grade_web,
-                    args=(team_id, web_port, ip_address, scenario['score_key'], scenario['points'], services)
-                )
-            elif service_name == "active_directory":
-                ad_user = system_cfg.get("active_directory", {}).get("username", "administrator")
-                ad_pass = system_cfg.get("active_directory", {}).get("password", "changeme")
-                ad_domain = system_cfg.get("active_directory", {}).get("domain", ip_address)
-                
-                t = threading.Thread(
-                    target=self.grade_active_directory,
-                    args=(team_id, ad_domain, ad_user, ad_pass, scenario['score_key'], scenario['points'], services, 20)
-                )
-            else:
-                t = None
-
-            if t is not None:
-                t.start()
-                thread_list.append(t)
-
-        for thread in thread_list:
-            thread.join()
-
-        print("Grading complete. Updating scores.json and notifying clients.")
-
-        with open("scores.json", "r") as score_file:
-            scores = json.load(score_file)
+        # Immutable snapshot of team configuration for this grading cycle;
+        # edits made while it runs apply from the next cycle
+        _, self.team_cfg = self.team_configs.snapshot()
 
-        self.sio.emit("scores", scores, namespace="/")
+    def end_cycle(self):
+        """Persist the cycle's results and push pending score changes."""
+        if not self.flush_interval:
+            try:
+                self.score_store.flush()
+            except Exception as err:
+                print("Failed to flush scores:", repr(err))
+
+        # Push anything still waiting in the delta buffer
+        self.broadcaster.flush()
+        self.leaderboard.flush()
+        if self.history_db is not None:
+            self.history_db.flush()
+        if self._cycle_started is not None:
+            metrics.CYCLE_DURATION.observe(time.perf_counter() - self._cycle_started)
         # Also re-emit cycle at the end in case clients connected mid-cycle
         try:
             self.sio.emit("gradingCycle", {"cycle": int(self.grading_cycle_count)}, namespace="/")
         except Exception:
             pass
-        self.is_grading = False
 
-    def grade_ssh(self, team_id, username, password, port, ip, system_name, score_key, points, services):
-        # Determine OS based on system name from master config
-        detected_os = "linux" if "ubuntu" in system_name.lower() else "windows"
-        
-        result = services.ssh_connection(username, password, ip, detected_os, port=port)
-        if result[0]:
-            self.append_scores(team_id, score_key, "Success", points)
+    def submit_check(self, scenario, callback=None):
+        """
+        Queue a single scenario using the current cycle's team configuration,
+        on the configured executor or else on the in-process engine.
+        Returns False if the service type is unknown.
+        """
+        spec = build_check_spec(scenario, self.team_cfg)
+        if spec is None:
+            return False
+
+        def on_done(result, elapsed):
+            self.observe_check(spec['service'], result, elapsed)
+            if callback is not None:
+                callback(result, elapsed)
+
+        if self.executor is not None:
+            self.executor.submit(spec, on_done)
         else:
-            self.append_scores(team_id, score_key, result[1], 0)
+            self.engine.submit(spec['service'], self.grade_check, (spec, self.services), on_done,
+                               host=spec['ip'])
+        return True
 
-    def grade_ping(self, team_id, ip, score_key, points, services):
-        result = services.ping_host(ip)
-        if result[0]:
-            self.append_scores(team_id, score_key, "Success", points)
-        else:
-            self.append_scores(team_id, score_key, result[1], 0)
+    def observe_check(self, service, result, elapsed):
+        """Record a finished check's latency and outcome in /metrics."""
+        ok, message = result
+        metrics.CHECK_DURATION.observe(elapsed, service)
+        metrics.CHECK_RESULTS.inc(service, "success" if ok else metrics.classify_error(message))
 
-    def grade_web(self, team_id, port, ip, score_key, points, services):
-        url = f"http://{ip}:{port}"
-        result = services.web_request(url)
-        if result[0]:
-            self.append_scores(team_id, score_key, "Success", points)
-        else:
-            self.append_scores(team_id, score_key, result[1], 0)
+    def grade_projects(self):
+        """Run every scenario once and wait for all of them to finish."""
+        print("Grading projects...")
+        self.is_grading = True
+        self.begin_cycle()
+
+        # Get all test scenarios from centralized config
+        scenarios = self.config_loader.get_all_test_scenarios()
+        if self.config_loader.get_rate_limits_config().get('enabled', False):
+            scenarios = interleave_hosts(scenarios)
+        
+        # Queue every check on the bounded engine; each grade_* method
+        # records its own result as soon as the check finishes.
+        for scenario in scenarios:
+            self.submit_check(scenario)
+        self._wait_idle()
+
+        # No scheduler to recheck held flips, so confirm them before the
+        # cycle closes instead of a whole interval later
+        recheck_seconds = float(self.config_loader.get_grading_config().get('recheck_seconds', 5.0))
+        for _ in range(self.confirmer.confirm_count - 1):
+            pending = [scenario for scenario in scenarios
+                       if self.confirmer.pending(scenario.team_id, scenario.score_key)]
+            if not pending:
+                break
+            time.sleep(recheck_seconds)
+            for scenario in pending:
+                self.submit_check(scenario)
+            self._wait_idle()
+
+        print("Grading complete. Updating scores.json and notifying clients.")
+        self.end_cycle()
+        self.is_grading = False
 
-    def grade_active_directory(self, team_id, domain, username, password, score_key, points, services, timeout):
-        result = services.active_directory(domain, username, password, timeout)
-        if result[0]:
-            self.append_scores(team_id, score_key, "Success", points)
+    def _wait_idle(self):
+        if self.executor is not None:
+            self.executor.wait_idle()
         else:
-            self.append_scores(team_id, score_key, result[1], 0)
+            self.engine.wait_idle()
+
+    def record_result(self, spec, ok, message, elapsed=0.0):
+        """
+        Add one finished check to the cell's history and score it, unless it
+        is an unconfirmed change of the cell's state.
+        """
+        scored = self.confirmer.observe(spec['team_id'], spec['score_key'], ok)
+        points = spec['points'] if ok and scored else 0
+        self.history.record(spec['team_id'], spec['score_key'], ok, elapsed)
+        if self.history_db is not None:
+            self.history_db.record(spec, ok, message, points, elapsed)
+        if scored:
+            self.append_scores(spec['team_id'], spec['score_key'], "Success" if ok else message, points)
+
+    def grade_check(self, spec, services):
+        """Run a check spec in this process and record its result."""
+        started = time.monotonic()
+        ok, message = run_check(spec, services)
+        self.record_result(spec, ok, message, time.monotonic() - started)
+        return ok, message
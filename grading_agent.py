@@ -0,0 +1,152 @@
+"""
+Standalone grading agent.
+
+Runs checks for a scoring server whose ``agents.enabled`` is set in
+master_config.json. The agent registers with the server, leases batches of
+checks (optionally only those in its own network segments), runs them with
+the same Services checks the server uses and posts results back in bulk.
+If the agent dies its leases expire and the server hands the checks to
+another agent.
+
+    python grading_agent.py --server http://scoring:5000 --token SECRET \\
+        --name segment-a --network 10.0.1.0/24 --network 10.0.2.0/24 \\
+        --source-address 10.0.1.200-10.0.1.220
+
+Several agents can run on one machine for testing.
+"""
+
+import argparse
+import socket
+import threading
+import time
+
+import requests
+
+from check_engine import CheckEngine, plugin_costs, plugin_limits
+from checks import run_check
+from source_addresses import SourceAddressPool, configure_source_pool
+from test_services import Services
+
+
+class GradingAgent:
+    """Leases checks from the scoring server and runs them locally."""
+
+    def __init__(self, server: str, token: str, name: str, networks=None,
+                 concurrency: int = 32, post_interval: float = 1.0):
+        self.server = server.rstrip("/")
+        self.name = name
+        self.networks = list(networks or [])
+        self.concurrency = max(1, int(concurrency))
+        self.post_interval = post_interval
+
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+        # Per-service limits and cost ordering declared by the check plugins
+        self.engine = CheckEngine(self.concurrency, plugin_limits(), plugin_costs())
+        self.services = Services()
+
+        self.agent_id = None
+        self.long_poll_seconds = 10.0
+        self._results = []
+        self._results_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def _post(self, path: str, payload, timeout: float = 30):
+        response = self.session.post(f"{self.server}{path}", json=payload, timeout=timeout)
+        if response.status_code == 404:
+            # The server restarted or forgot us; register again
+            raise LookupError(response.text)
+        response.raise_for_status()
+        return response.json()
+
+    def register(self):
+        info = self._post("/api/agents/register", {"name": self.name, "networks": self.networks})
+        self.agent_id = info["agent_id"]
+        self.long_poll_seconds = float(info.get("long_poll_seconds", self.long_poll_seconds))
+        print(f"Registered as {self.agent_id} (lease {info.get('lease_seconds')}s)")
+
+    def _on_done(self, check_id, result, elapsed):
+        ok, message = result
+        with self._results_lock:
+            self._results.append({"id": check_id, "ok": ok, "message": message, "elapsed": elapsed})
+
+    def _post_results(self):
+        with self._results_lock:
+            if not self._results or self.agent_id is None:
+                return
+            batch, self._results = self._results, []
+        try:
+            self._post(f"/api/agents/{self.agent_id}/results", {"results": batch})
+            return
+        except LookupError:
+            # Register again; results for checks nobody else has answered
+            # yet are still accepted afterwards
+            self.agent_id = None
+        except requests.RequestException as err:
+            print("Failed to post results, will retry:", err)
+        with self._results_lock:
+            self._results[:0] = batch
+
+    def _result_loop(self):
+        while not self._stopped.is_set():
+            self._stopped.wait(self.post_interval)
+            self._post_results()
+
+    def run(self):
+        threading.Thread(target=self._result_loop, daemon=True).start()
+        while not self._stopped.is_set():
+            try:
+                if self.agent_id is None:
+                    self.register()
+                room = self.concurrency - self.engine.pending_count()
+                if room <= 0:
+                    time.sleep(0.1)
+                    continue
+                lease = self._post(
+                    f"/api/agents/{self.agent_id}/lease",
+                    {"max": room, "wait": self.long_poll_seconds},
+                    timeout=self.long_poll_seconds + 30,
+                )
+                for check in lease.get("checks", []):
+                    spec = check["spec"]
+                    self.engine.submit(
+                        spec["service"], run_check, (spec, self.services),
+                        lambda result, elapsed, check_id=check["id"]: self._on_done(check_id, result, elapsed),
+                    )
+            except LookupError:
+                self.agent_id = None
+            except (requests.RequestException, ValueError, KeyError) as err:
+                print("Lost contact with the scoring server:", err)
+                time.sleep(2)
+
+    def stop(self):
+        self._stopped.set()
+        self.engine.wait_idle()
+        self._post_results()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring engine grading agent")
+    parser.add_argument("--server", required=True, help="Scoring server URL, e.g. http://10.0.0.1:5000")
+    parser.add_argument("--token", required=True, help="agents.token from master_config.json")
+    parser.add_argument("--name", default=socket.gethostname())
+    parser.add_argument("--network", action="append", default=[],
+                        help="Only run checks against this CIDR range (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--source-address", action="append", default=[],
+                        help="Source address, CIDR range or a-b range for probes (repeatable)")
+    parser.add_argument("--source-strategy", choices=("round_robin", "random"), default="round_robin")
+    args = parser.parse_args()
+
+    configure_source_pool(SourceAddressPool.from_entries(args.source_address, args.source_strategy))
+
+    agent = GradingAgent(args.server, args.token, args.name, args.network, args.concurrency)
+    try:
+        agent.run()
+    except KeyboardInterrupt:
+        print("Stopping; finishing running checks...")
+        agent.stop()
+
+
+if __name__ == "__main__":
+    main()
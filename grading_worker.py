@@ -0,0 +1,74 @@
+"""
+Grading worker process.
+
+Started by WorkerPool (worker_pool.py) when ``grading.worker_processes`` is
+set. Reads one JSON check spec per line on stdin, runs it on this process's
+own CheckEngine and writes one JSON result per line to stdout:
+
+    in:  {"id": 17, "spec": {...}}
+    out: {"id": 17, "ok": true, "message": "...", "elapsed": 0.12}
+
+Workers don't monkey-patch with eventlet, so SSH crypto and other CPU-heavy
+checks run on real threads in their own process instead of stalling the web
+server. The worker exits once stdin is closed and its checks have finished.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+
+from check_engine import CheckEngine
+from checks import run_check
+from config_loader import ConfigLoader
+from source_addresses import SourceAddressPool, configure_source_pool
+from test_services import Services
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring engine grading worker")
+    parser.add_argument("--shard", type=int, default=0)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--config", default="master_config.json")
+    args = parser.parse_args()
+
+    # stdout carries results; route everything else printed to stderr
+    results = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+    write_lock = threading.Lock()
+
+    config_loader = ConfigLoader(args.config)
+    engine = CheckEngine.from_config(config_loader, shards=args.shards)
+    configure_source_pool(SourceAddressPool.from_config(config_loader))
+    services = Services()
+
+    def send(message):
+        line = json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n"
+        with write_lock:
+            results.write(line)
+            results.flush()
+
+    print(f"Grading worker {args.shard + 1}/{args.shards} started (pid {os.getpid()})")
+    for line in sys.stdin.buffer:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            request_id, spec = request["id"], request["spec"]
+        except (ValueError, KeyError, TypeError) as err:
+            print("Ignoring malformed request:", repr(err))
+            continue
+
+        def on_done(result, elapsed, request_id=request_id):
+            ok, message = result
+            send({"id": request_id, "ok": ok, "message": message, "elapsed": elapsed})
+
+        engine.submit(spec["service"], run_check, (spec, services), on_done, host=spec["ip"])
+
+    engine.wait_idle()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Long-term SQLite store of every check result.
+
+The in-memory score store only keeps a running total and the last error per
+cell. When ``history.database`` is enabled in master_config.json, every
+result is also queued here and written to a WAL-mode SQLite database by a
+background writer, in one transaction per batch: when ``batch_size``
+results are waiting or when a grading cycle ends. Recording a result only
+appends to a list, so grading never waits on disk.
+
+Under eventlet the writer's SQLite calls run on a native thread pool, so a
+slow commit does not stall the web server either.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    from eventlet import patcher, tpool
+except ImportError:
+    patcher = tpool = None
+
+
+MAX_ERROR_LENGTH = 512
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    team TEXT NOT NULL,
+    system TEXT NOT NULL,
+    service TEXT NOT NULL,
+    score_key TEXT NOT NULL,
+    ok INTEGER NOT NULL,
+    points INTEGER NOT NULL,
+    latency REAL NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS results_ts ON results (ts);
+CREATE INDEX IF NOT EXISTS results_team_ts ON results (team, ts);
+CREATE INDEX IF NOT EXISTS results_service_ts ON results (service, ts);
+"""
+
+INSERT = ("INSERT INTO results (ts, team, system, service, score_key, ok, points, latency, error) "
+          "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+
+def _blocking(function, *args):
+    """Run ``function`` on a native thread when eventlet is in charge."""
+    if tpool is not None and patcher.is_monkey_patched("thread"):
+        return tpool.execute(function, *args)
+    return function(*args)
+
+
+class HistoryDatabase:
+    """Batches check results into SQLite and answers time-range queries."""
+
+    def __init__(self, path: str = "score_history.db", batch_size: int = 500):
+        self.path = path
+        self.batch_size = max(1, int(batch_size))
+        self._cond = threading.Condition()
+        self._pending: List[tuple] = []
+        self._flush_requested = False
+        self._stopped = False
+        self._writer = None
+        # Only used from the writer; queries open their own connections
+        self._conn = self._connect()
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    @classmethod
+    def from_config(cls, config_loader) -> Optional["HistoryDatabase"]:
+        """Build the database from master_config.json, or None if disabled."""
+        history = config_loader.get_history_config()
+        if not history.get('database', False):
+            return None
+        return cls(
+            path=history.get('database_path', 'score_history.db'),
+            batch_size=history.get('batch_size', 500),
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened here but used from tpool threads
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL stays consistent on power loss with NORMAL; only the last
+        # commits can be lost
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def record(self, spec: Dict[str, Any], ok: bool, message: str, points: int,
+               latency: float, timestamp: Optional[float] = None):
+        """Queue one finished check for the next batch."""
+        row = (
+            timestamp if timestamp is not None else time.time(),
+            spec['team_id'], spec['system_name'], spec['service'], spec['score_key'],
+            1 if ok else 0, points, float(latency),
+            None if ok else str(message)[:MAX_ERROR_LENGTH],
+        )
+        with self._cond:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self):
+        """Ask the writer to commit everything queued so far; returns at once."""
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify()
+
+    def _write(self, rows: List[tuple]):
+        with self._conn:
+            self._conn.executemany(INSERT, rows)
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while (not self._stopped and not self._flush_requested
+                       and len(self._pending) < self.batch_size):
+                    self._cond.wait()
+                rows, self._pending = self._pending, []
+                self._flush_requested = False
+                stopped = self._stopped
+            if rows:
+                try:
+                    _blocking(self._write, rows)
+                except sqlite3.Error as err:
+                    print(f"Failed to write {len(rows)} results to {self.path}:", repr(err))
+            if stopped:
+                return
+
+    def start(self):
+        """Start the background writer."""
+        if self._writer is not None:
+            return
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def stop(self):
+        """Write whatever is queued and stop the writer."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._writer is not None:
+            self._writer.join()
+
+    def _query(self, sql: str, params: tuple) -> List[tuple]:
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def aggregate(self, start: float, end: float, bucket: float,
+                  team: Optional[str] = None, service: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Results between ``start`` and ``end`` grouped into ``bucket``-second
+        buckets per team and service: check count, successes, points and
+        mean latency.
+        """
+        sql = ("SELECT CAST(ts / ? AS INTEGER) * ? AS bucket, team, service, "
+               "COUNT(*), SUM(ok), SUM(points), AVG(latency) "
+               "FROM results WHERE ts >= ? AND ts < ?")
+        params = [bucket, bucket, start, end]
+        if team is not None:
+            sql += " AND team = ?"
+            params.append(team)
+        if service is not None:
+            sql += " AND service = ?"
+            params.append(service)
+        sql += " GROUP BY bucket, team, service ORDER BY bucket, team, service"
+
+        rows = _blocking(self._query, sql, tuple(params))
+        return [
+            {
+                "bucket": bucket_start,
+                "team": row_team,
+                "service": row_service,
+                "checks": checks,
+                "up": up,
+                "points": points,
+                "avg_latency": round(latency, 4),
+            }
+            for bucket_start, row_team, row_service, checks, up, points, latency in rows
+        ]
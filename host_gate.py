@@ -0,0 +1,145 @@
+"""
+Reachability gate and per-target circuit breakers for checks.
+
+A dead team box used to cost every one of its checks a full service timeout
+(20s of SSH connect, HTTP connect and read, ...). Checks listed under
+``reachability.services`` in master_config.json now depend on the host
+being reachable:
+
+- If any check on the host succeeded (or got an answer proving the host is
+  up, such as a refused connection or a failed login) within
+  ``fresh_seconds``, the check runs as usual.
+- Otherwise a TCP connect to the check's port is tried first, with
+  ``probe_timeout``. If nothing answers, the check fails at once instead of
+  running. A refused connection counts as reachable and the check runs.
+
+Each (host, port) target also has a circuit breaker. After
+``failure_threshold`` consecutive timeouts or unreachable errors the circuit
+opens and every later check on that target is preceded by the probe, even if
+other services on the host are up. The first check that succeeds closes it
+again.
+
+Concurrent checks probing the same target share one probe. State lives in
+the process running the checks, so it works the same on the in-process
+engine, in worker processes and on grading agents.
+"""
+
+import socket
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import metrics
+from source_addresses import get_source_pool
+
+
+# Error classes (see metrics.classify_error) meaning the host did not answer
+DOWN_CLASSES = frozenset(("timeout", "unreachable", "no_reply"))
+# Error classes that could only come from a live host
+ALIVE_CLASSES = frozenset(("refused", "auth", "http_status", "content"))
+
+
+class _Probe:
+    """One in-flight probe that concurrent checks wait on."""
+
+    __slots__ = ("done", "result")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Tuple[bool, str] = (False, "probe did not finish")
+
+
+class HostGate:
+    """Host liveness and circuit breaker state for one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Host -> monotonic time of the last sign of life
+        self._alive: Dict[str, float] = {}
+        # (host, port) -> consecutive failures with no answer from the host
+        self._failures: Dict[Tuple[str, int], int] = {}
+        self._probes: Dict[Tuple[str, int], _Probe] = {}
+
+    def admit(self, host: str, port: int, settings: Dict[str, Any]) -> Optional[str]:
+        """
+        Decide whether a check against ``host:port`` should run. Returns
+        None to run it, or the error message to fail it with.
+        """
+        threshold = max(1, int(settings.get('failure_threshold', 3)))
+        now = time.monotonic()
+        with self._lock:
+            alive = self._alive.get(host)
+            fresh = alive is not None and now - alive <= settings.get('fresh_seconds', 60)
+            opened = self._failures.get((host, port), 0) >= threshold
+        if fresh and not opened:
+            return None
+
+        reachable, reason = self._probe(host, port, float(settings.get('probe_timeout', 1.0)))
+        if reachable:
+            return None
+        if opened:
+            return f"Circuit open for {host}:{port}: {reason}"
+        return f"Host unreachable: {reason}"
+
+    def _probe(self, host: str, port: int, timeout: float) -> Tuple[bool, str]:
+        key = (host, port)
+        with self._lock:
+            probe = self._probes.get(key)
+            owner = probe is None
+            if owner:
+                probe = self._probes[key] = _Probe()
+        if not owner:
+            probe.done.wait(timeout + 1.0)
+            return probe.result
+
+        try:
+            probe.result = self._connect(host, port, timeout)
+        finally:
+            with self._lock:
+                del self._probes[key]
+            probe.done.set()
+        reachable, reason = probe.result
+        # Only a real check closes the circuit; a probe just shows the host is up
+        self.record(host, None if reachable else port, reachable, reason)
+        return probe.result
+
+    @staticmethod
+    def _connect(host: str, port: int, timeout: float) -> Tuple[bool, str]:
+        try:
+            sock = get_source_pool().connect((host, port), timeout=timeout)
+        except ConnectionRefusedError:
+            # Something on the host sent a RST, so the host is up
+            return (True, "connection refused")
+        except socket.timeout:
+            return (False, f"no answer from {host}:{port} within {timeout:g}s (timed out)")
+        except OSError as err:
+            return (False, f"{host}:{port}: {err}")
+        sock.close()
+        return (True, "connected")
+
+    def record(self, host: str, port: Optional[int], ok: bool, message: str):
+        """Update host liveness and the target's breaker from a result."""
+        outcome = "success" if ok else metrics.classify_error(message)
+        now = time.monotonic()
+        with self._lock:
+            if ok or outcome in ALIVE_CLASSES:
+                self._alive[host] = now
+            if port is None:
+                return
+            if ok:
+                self._failures.pop((host, port), None)
+            elif outcome in DOWN_CLASSES:
+                self._failures[(host, port)] = self._failures.get((host, port), 0) + 1
+
+
+# Singleton instance
+_host_gate = None
+_host_gate_lock = threading.Lock()
+
+def get_host_gate() -> HostGate:
+    """Get or create the singleton HostGate instance."""
+    global _host_gate
+    with _host_gate_lock:
+        if _host_gate is None:
+            _host_gate = HostGate()
+        return _host_gate
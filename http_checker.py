@@ -0,0 +1,222 @@
+"""
+Pooled, streaming HTTP checker for web service checks.
+
+Each target (scheme, host, port) keeps its own requests.Session so
+keep-alive connections are reused across grading cycles. Bodies are streamed
+and read only up to a byte cap, and optionally verified against an expected
+substring or SHA-256 digest from master_config.json, so a team serving a huge
+page can't slow the grader down or bloat its memory. Connect time and
+response/body read time are recorded separately.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import metrics
+from source_addresses import get_source_pool
+
+
+DEFAULT_MAX_BYTES = 64 * 1024
+CHUNK_SIZE = 8192
+
+# Per-thread accumulator for time spent establishing connections. The
+# request that triggers a connect runs on the calling thread, so this
+# attributes connect time to the right check.
+_timing = threading.local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        # Each new connection (not each request) takes the next pool address
+        self.source_address = get_source_pool().bind_address()
+        started = time.monotonic()
+        try:
+            super().connect()
+        finally:
+            _timing.connect = getattr(_timing, "connect", 0.0) + time.monotonic() - started
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        self.source_address = get_source_pool().bind_address()
+        started = time.monotonic()
+        try:
+            super().connect()
+        finally:
+            _timing.connect = getattr(_timing, "connect", 0.0) + time.monotonic() - started
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections record how long connect() took."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class WebCheckResult:
+    """Measurements from one web check."""
+
+    __slots__ = ("status", "bytes_read", "truncated", "connect_time",
+                 "response_time", "read_time", "content_ok")
+
+    def __init__(self):
+        self.status = None
+        self.bytes_read = 0
+        self.truncated = False
+        # Seconds spent in TCP/TLS connect (0.0 when a pooled connection was reused)
+        self.connect_time = 0.0
+        # Seconds from sending the request until the response headers arrived,
+        # excluding connect time
+        self.response_time = 0.0
+        # Seconds spent streaming the (capped) body
+        self.read_time = 0.0
+        self.content_ok = None
+
+    def as_dict(self) -> Dict[str, object]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class HttpChecker:
+    """Runs web checks over per-target pooled keep-alive sessions."""
+
+    def __init__(self, pool_maxsize: int = 2):
+        self.pool_maxsize = pool_maxsize
+        self._lock = threading.Lock()
+        self._sessions: Dict[Tuple[str, str, int], requests.Session] = {}
+
+    def _session_for(self, url: str) -> requests.Session:
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname or "", port)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = _TimedAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[key] = session
+            return session
+
+    def check(self, url: str, connect_timeout: float = 5.0, read_timeout: float = 20.0,
+              max_bytes: int = DEFAULT_MAX_BYTES, expect_substring: Optional[str] = None,
+              expect_sha256: Optional[str] = None) -> Tuple[bool, str, WebCheckResult]:
+        """
+        GET ``url`` and read at most ``max_bytes`` of the body. Returns
+        ``(ok, message, WebCheckResult)``. Connect, response and body read
+        times also go to the ``scoring_web_phase_seconds`` histogram.
+        """
+        ok, message, result = self._fetch(url, connect_timeout, read_timeout, max_bytes,
+                                          expect_substring, expect_sha256)
+        # A reused keep-alive connection has no connect phase
+        if result.connect_time:
+            metrics.WEB_PHASE_DURATION.observe(result.connect_time, "connect")
+        if result.status is not None:
+            metrics.WEB_PHASE_DURATION.observe(result.response_time, "response")
+            metrics.WEB_PHASE_DURATION.observe(result.read_time, "read")
+        return (ok, message, result)
+
+    def _fetch(self, url, connect_timeout, read_timeout, max_bytes, expect_substring, expect_sha256):
+        result = WebCheckResult()
+        session = self._session_for(url)
+        needle = expect_substring.encode("utf-8") if expect_substring else None
+        digest = hashlib.sha256() if expect_sha256 else None
+
+        _timing.connect = 0.0
+        started = time.monotonic()
+        try:
+            response = session.get(url, timeout=(connect_timeout, read_timeout), stream=True)
+        except requests.RequestException as e:
+            result.connect_time = _timing.connect
+            return (False, str(e), result)
+        headers_at = time.monotonic()
+        result.connect_time = _timing.connect
+        result.response_time = max(0.0, headers_at - started - result.connect_time)
+        result.status = response.status_code
+
+        # Fully read responses hand their connection back to the pool; only
+        # responses abandoned part-way are closed.
+        consumed = False
+        try:
+            if response.status_code != 200:
+                return (False, f"HTTP {response.status_code} {response.reason}", result)
+
+            found = needle is None
+            # Keep enough of the previous chunk to match a needle split
+            # across chunk boundaries.
+            tail = b""
+            for chunk in response.iter_content(CHUNK_SIZE):
+                remaining = max_bytes - result.bytes_read
+                if remaining <= 0:
+                    result.truncated = True
+                    break
+                if len(chunk) > remaining:
+                    chunk = chunk[:remaining]
+                    result.truncated = True
+                result.bytes_read += len(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+                if not found:
+                    window = tail + chunk
+                    if needle in window:
+                        found = True
+                    tail = window[-(len(needle) - 1):] if len(needle) > 1 else b""
+                if result.truncated or (found and digest is None and needle is not None):
+                    # Nothing left to verify; don't download the rest
+                    break
+            else:
+                consumed = True
+            result.read_time = time.monotonic() - headers_at
+        except requests.RequestException as e:
+            result.read_time = time.monotonic() - headers_at
+            return (False, f"Error reading body: {e}", result)
+        finally:
+            if not consumed:
+                response.close()
+
+        if needle is not None and not found:
+            result.content_ok = False
+            return (False, f"Expected content not found in first {result.bytes_read} bytes", result)
+        if digest is not None:
+            if result.truncated:
+                result.content_ok = False
+                return (False, f"Body larger than {max_bytes} bytes; cannot verify hash", result)
+            if digest.hexdigest() != expect_sha256.lower():
+                result.content_ok = False
+                return (False, "Content hash mismatch", result)
+        if needle is not None or digest is not None:
+            result.content_ok = True
+        return (True, f"HTTP 200, {result.bytes_read} bytes", result)
+
+
+# Singleton instance
+_http_checker = None
+_http_checker_lock = threading.Lock()
+
+def get_http_checker() -> HttpChecker:
+    """Get or create the shared HttpChecker instance."""
+    global _http_checker
+    with _http_checker_lock:
+        if _http_checker is None:
+            _http_checker = HttpChecker()
+        return _http_checker
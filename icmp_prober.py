@@ -0,0 +1,340 @@
+"""
+In-process ICMP echo prober for the scoring engine.
+
+All ping checks share one ICMP socket and one receiver thread instead of
+forking a ``ping`` process per target. Echo requests for every host in a
+sweep are sent back to back and replies are matched to their request by
+sequence number (and identifier on raw sockets), so a sweep over many hosts
+takes roughly one reply timeout rather than one per host.
+
+Ping checks each ask for one host, but calls that arrive within
+``batch_window`` seconds of each other are sent as one sweep; each caller
+returns as soon as its own host has answered. A grading cycle's ping checks
+therefore go out together from the shared socket.
+
+An unprivileged datagram ICMP socket is used where the kernel allows it
+(``net.ipv4.ping_group_range``); otherwise a raw socket is opened, which
+needs root or CAP_NET_RAW.
+"""
+
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from source_addresses import get_source_pool
+
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+# Seconds single-host pings wait for others to share their sweep
+DEFAULT_BATCH_WINDOW = 0.02
+
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _build_echo(ident: int, seq: int, payload: bytes) -> bytes:
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    checksum = _checksum(header + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + payload
+
+
+class PingResult:
+    """Replies received from one host during a sweep."""
+
+    __slots__ = ("ip", "sent", "rtts", "error")
+
+    def __init__(self, ip: str):
+        self.ip = ip
+        self.sent = 0
+        self.rtts: List[float] = []
+        self.error: Optional[str] = None
+
+    @property
+    def received(self) -> int:
+        return len(self.rtts)
+
+    @property
+    def loss(self) -> float:
+        """Fraction of echo requests that got no reply (0.0 - 1.0)."""
+        if not self.sent:
+            return 1.0
+        return 1.0 - self.received / self.sent
+
+    @property
+    def avg_rtt(self) -> Optional[float]:
+        """Mean round-trip time in seconds, or None without replies."""
+        if not self.rtts:
+            return None
+        return sum(self.rtts) / len(self.rtts)
+
+    def summary(self) -> str:
+        if self.error:
+            return self.error
+        text = f"{self.received}/{self.sent} replies from {self.ip}, {self.loss:.0%} loss"
+        if self.rtts:
+            text += (f", rtt min/avg/max = {min(self.rtts) * 1000:.2f}/"
+                     f"{self.avg_rtt * 1000:.2f}/{max(self.rtts) * 1000:.2f} ms")
+        return text
+
+
+class _Sweep:
+    """Bookkeeping for one in-progress sweep."""
+
+    def __init__(self, results: Dict[str, PingResult], count: int):
+        self.results = results
+        self.outstanding = 0
+        self.done = threading.Event()
+        # Replies each host still owes, and whether it is finished
+        self.remaining = {host: count for host in results}
+        self.host_done = {host: threading.Event() for host in results}
+
+    def settle(self, host: str):
+        """One request to ``host`` was answered or failed to send."""
+        self.remaining[host] -= 1
+        if self.remaining[host] <= 0:
+            self.host_done[host].set()
+
+    def finish(self):
+        for event in self.host_done.values():
+            event.set()
+
+
+class _Batch:
+    """Single-host pings waiting to go out as one sweep."""
+
+    def __init__(self):
+        self.hosts: Dict[str, None] = {}
+        self.sweep: Optional[_Sweep] = None
+        self.error: Optional[str] = None
+        self.started = threading.Event()
+
+
+class IcmpProber:
+    """Sends ICMP echo requests from a single shared socket."""
+
+    def __init__(self, count: int = 3, timeout: float = 2.0, interval: float = 0.2,
+                 source_address: Optional[str] = None,
+                 batch_window: float = DEFAULT_BATCH_WINDOW):
+        self.count = max(1, int(count))
+        self.timeout = float(timeout)
+        self.interval = max(0.0, float(interval))
+        self.source_address = source_address
+        self.batch_window = max(0.0, float(batch_window))
+        self._batch_lock = threading.Lock()
+        # (count, timeout) -> batch still collecting hosts
+        self._batches: Dict[tuple, _Batch] = {}
+
+        self._lock = threading.Lock()
+        self._sock = None
+        self._datagram = False
+        # Kernels rewrite the identifier of datagram ICMP sockets, so on those
+        # sockets replies are matched by sequence number and address only.
+        self._ident = os.getpid() & 0xFFFF
+        self._seq = 0
+        # seq -> (sweep, host, resolved ip, send time)
+        self._waiting: Dict[int, tuple] = {}
+        self._receiver = None
+
+    def _open_socket(self):
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            self._datagram = True
+        except (PermissionError, OSError):
+            # Unprivileged ICMP is disabled; fall back to a raw socket.
+            sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+            self._datagram = False
+        if self.source_address:
+            sock.bind((self.source_address, 0))
+        return sock
+
+    def _ensure_socket(self):
+        with self._lock:
+            if self._sock is not None:
+                return
+            self._sock = self._open_socket()
+            self._receiver = threading.Thread(target=self._receive_loop, daemon=True)
+            self._receiver.start()
+
+    def _next_seq(self) -> int:
+        # Caller holds self._lock. Skip sequence numbers still awaiting replies.
+        for _ in range(0x10000):
+            self._seq = (self._seq + 1) & 0xFFFF
+            if self._seq not in self._waiting:
+                return self._seq
+        raise RuntimeError("No free ICMP sequence numbers")
+
+    def _receive_loop(self):
+        sock = self._sock
+        while True:
+            try:
+                data, addr = sock.recvfrom(2048)
+            except OSError:
+                return
+            received_at = time.monotonic()
+            if not self._datagram:
+                # Raw sockets include the IP header
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < 8:
+                continue
+            icmp_type, _, _, ident, seq = struct.unpack("!BBHHH", data[:8])
+            if icmp_type != ICMP_ECHO_REPLY:
+                continue
+            if not self._datagram and ident != self._ident:
+                continue
+
+            with self._lock:
+                waiter = self._waiting.get(seq)
+                # Replies come back from the resolved address
+                if waiter is None or waiter[2] != addr[0]:
+                    continue
+                del self._waiting[seq]
+                sweep, host, _, sent_at = waiter
+                sweep.results[host].rtts.append(received_at - sent_at)
+                sweep.settle(host)
+                sweep.outstanding -= 1
+                if sweep.outstanding <= 0:
+                    sweep.done.set()
+
+    def sweep(self, hosts: Iterable[str], count: Optional[int] = None,
+              timeout: Optional[float] = None, on_start=None) -> Dict[str, PingResult]:
+        """
+        Ping every host ``count`` times and wait up to ``timeout`` seconds
+        after the last request for replies. Returns a PingResult per host.
+        ``on_start(sweep)`` is called once requests are about to go out.
+        """
+        count = self.count if count is None else max(1, int(count))
+        timeout = self.timeout if timeout is None else float(timeout)
+
+        results: Dict[str, PingResult] = {host: PingResult(host) for host in hosts}
+        sweep = _Sweep(results, count)
+        try:
+            self._send_sweep(sweep, count, timeout, on_start)
+        finally:
+            sweep.finish()
+        return results
+
+    def _send_sweep(self, sweep: _Sweep, count: int, timeout: float, on_start):
+        results = sweep.results
+        targets = []
+        for host, result in results.items():
+            try:
+                targets.append((host, socket.gethostbyname(host)))
+            except OSError as err:
+                result.error = f"Could not resolve {host}: {err}"
+                sweep.host_done[host].set()
+        if targets:
+            self._ensure_socket()
+        if on_start is not None:
+            on_start(sweep)
+        if not targets:
+            return
+
+        payload = struct.pack("!d", time.time()).ljust(32, b"\x00")
+
+        for round_number in range(count):
+            if round_number:
+                time.sleep(self.interval)
+            for host, ip in targets:
+                with self._lock:
+                    seq = self._next_seq()
+                    self._waiting[seq] = (sweep, host, ip, time.monotonic())
+                    sweep.outstanding += 1
+                    sweep.done.clear()
+                try:
+                    self._sock.sendto(_build_echo(self._ident, seq, payload), (ip, 0))
+                    results[host].sent += 1
+                except OSError as err:
+                    with self._lock:
+                        if self._waiting.pop(seq, None) is not None:
+                            sweep.outstanding -= 1
+                            sweep.settle(host)
+                    results[host].error = f"Failed to send to {host}: {err}"
+
+        if sweep.outstanding > 0:
+            sweep.done.wait(timeout)
+
+        # Anything still outstanding is lost
+        with self._lock:
+            for seq in [s for s, w in self._waiting.items() if w[0] is sweep]:
+                del self._waiting[seq]
+
+    def ping(self, host: str, count: Optional[int] = None,
+             timeout: Optional[float] = None) -> PingResult:
+        """
+        Ping a single host, sharing a sweep with other pings that arrive
+        within ``batch_window`` seconds.
+        """
+        if self.batch_window <= 0:
+            return self.sweep([host], count, timeout)[host]
+        # Resolve here so one slow lookup doesn't hold up the whole batch
+        try:
+            host = socket.gethostbyname(host)
+        except OSError as err:
+            result = PingResult(host)
+            result.error = f"Could not resolve {host}: {err}"
+            return result
+        key = (count, timeout)
+        with self._batch_lock:
+            batch = self._batches.get(key)
+            if batch is None:
+                batch = self._batches[key] = _Batch()
+                threading.Thread(target=self._run_batch, args=(key, batch, count, timeout),
+                                 daemon=True).start()
+            batch.hosts[host] = None
+        batch.started.wait()
+        if batch.sweep is None:
+            result = PingResult(host)
+            result.error = batch.error
+            return result
+        batch.sweep.host_done[host].wait()
+        return batch.sweep.results[host]
+
+    def _run_batch(self, key: tuple, batch: _Batch, count: Optional[int], timeout: Optional[float]):
+        time.sleep(self.batch_window)
+        with self._batch_lock:
+            if self._batches.get(key) is batch:
+                del self._batches[key]
+
+        def start(sweep):
+            batch.sweep = sweep
+            batch.started.set()
+
+        try:
+            self.sweep(list(batch.hosts), count, timeout, on_start=start)
+        except Exception as err:
+            batch.error = str(err)
+        finally:
+            # Release callers even if the sweep never started
+            if batch.error is None and batch.sweep is None:
+                batch.error = "ICMP sweep failed to start"
+            batch.started.set()
+
+    def close(self):
+        with self._lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+
+# Singleton instance
+_icmp_prober = None
+_icmp_prober_lock = threading.Lock()
+
+def get_icmp_prober() -> IcmpProber:
+    """Get or create the shared IcmpProber instance."""
+    global _icmp_prober
+    with _icmp_prober_lock:
+        if _icmp_prober is None:
+            # Pings share one socket, so they all use one pool address
+            _icmp_prober = IcmpProber(source_address=get_source_pool().next())
+        return _icmp_prober
@@ -0,0 +1,159 @@
+"""
+Reusable LDAP connections for Active Directory checks.
+
+Each (domain, port) keeps one ldap3 Connection across cycles, tagged with
+a fingerprint of the credentials it was bound with; when a team changes its
+credentials the old connection is closed and replaced. A check on a pooled
+connection binds again over the open socket, which proves the credentials
+still authenticate without a new TCP handshake; if the socket has gone a
+new connection is opened. Domain names are resolved once and cached for
+``DNS_TTL`` seconds, so checks at scale don't each pay for connection setup
+and a DNS lookup.
+"""
+
+import hashlib
+import socket
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import ldap3
+
+from source_addresses import get_source_pool
+
+
+DNS_TTL = 300
+
+
+def _credential_fingerprint(username: str, password: str) -> str:
+    return hashlib.sha256(f"{username}\0{password}".encode("utf-8")).hexdigest()
+
+
+class _PooledConnection:
+    def __init__(self):
+        # ldap3 synchronous connections are not thread safe
+        self.lock = threading.Lock()
+        self.connection: Optional[ldap3.Connection] = None
+        self.fingerprint: Optional[str] = None
+        self.address: Optional[str] = None
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.unbind()
+            except Exception:
+                pass
+        self.connection = None
+        self.fingerprint = None
+
+
+class LdapPool:
+    """Keeps bound LDAP connections and cached DNS answers per team domain."""
+
+    def __init__(self, dns_ttl: float = DNS_TTL):
+        self.dns_ttl = dns_ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, int], _PooledConnection] = {}
+        self._dns: Dict[str, Tuple[str, float]] = {}
+
+    def resolve(self, domain: str) -> str:
+        """Resolve ``domain`` to an IPv4 address, caching the answer."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._dns.get(domain)
+            if cached is not None and cached[1] > now:
+                return cached[0]
+        address = socket.gethostbyname(domain)
+        with self._lock:
+            self._dns[domain] = (address, now + self.dns_ttl)
+        return address
+
+    def forget(self, domain: str):
+        """Drop a cached DNS answer, e.g. after a connection failure."""
+        with self._lock:
+            self._dns.pop(domain, None)
+
+    def _entry(self, domain: str, port: int) -> _PooledConnection:
+        with self._lock:
+            entry = self._entries.get((domain, port))
+            if entry is None:
+                entry = self._entries[(domain, port)] = _PooledConnection()
+            return entry
+
+    @staticmethod
+    def _rebind(connection: ldap3.Connection) -> Optional[bool]:
+        """Bind again on an open connection; None if the connection is unusable."""
+        try:
+            if connection.closed:
+                return None
+            return bool(connection.bind())
+        except Exception:
+            return None
+
+    def bind(self, domain: str, username: str, password: str, timeout: float = 20,
+             port: int = 389) -> Tuple[bool, str]:
+        """
+        Verify that ``username``/``password`` can bind to ``domain``. Returns
+        ``(ok, message)`` in the same form as Services.active_directory.
+        """
+        entry = self._entry(domain, port)
+        fingerprint = _credential_fingerprint(username, password)
+        with entry.lock:
+            if entry.connection is not None and entry.fingerprint == fingerprint:
+                bound = self._rebind(entry.connection)
+                if bound:
+                    return (True, "Authentication successful")
+                if bound is False:
+                    result = entry.connection.result
+                    entry.close()
+                    return (False, f"Authentication failed: {result}")
+                entry.close()
+            elif entry.connection is not None:
+                # The team changed its credentials; bind again with the new ones
+                entry.close()
+
+            try:
+                address = self.resolve(domain)
+            except OSError as e:
+                return (False, f"Could not resolve {domain}: {e}")
+
+            try:
+                # Skip reading the schema/DSE on bind; the check doesn't need it
+                server = ldap3.Server(address, port=port, connect_timeout=timeout, get_info=ldap3.NONE)
+                connection = ldap3.Connection(server, user=username, password=password,
+                                              receive_timeout=timeout,
+                                              source_address=get_source_pool().next())
+                if not connection.bind():
+                    result = connection.result
+                    connection.unbind()
+                    return (False, f"Authentication failed: {result}")
+            except Exception as e:
+                # The address may have moved; look it up again next time
+                self.forget(domain)
+                return (False, str(e))
+
+            entry.connection = connection
+            entry.fingerprint = fingerprint
+            entry.address = address
+            return (True, "Authentication successful")
+
+    def close_all(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            with entry.lock:
+                entry.close()
+
+
+# Singleton instance
+_ldap_pool = None
+_ldap_pool_lock = threading.Lock()
+
+def get_ldap_pool() -> LdapPool:
+    """Get or create the shared LdapPool instance."""
+    global _ldap_pool
+    with _ldap_pool_lock:
+        if _ldap_pool is None:
+            _ldap_pool = LdapPool()
+        return _ldap_pool
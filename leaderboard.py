@@ -0,0 +1,157 @@
+"""
+Server-side ranked leaderboard.
+
+Team totals and ranks are maintained incrementally as results are applied to
+the score store, instead of every browser re-summing and re-sorting the whole
+scoreboard on each update. Teams are kept in a list sorted by
+``(-total, team)``, so an update moves one entry and a team's rank is a
+binary search. Ties share a rank (1, 2, 2, 4).
+
+Rank changes are coalesced and emitted as ``leaderboardDelta`` events:
+
+    {"version": 12, "teams": [[team, rank, total], ...]}
+
+listing only teams whose rank or total changed since the last event, plus
+``"removed": [team, ...]`` after a reset drops teams.
+"""
+
+import bisect
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class Leaderboard:
+    """Team totals and ranks kept in sync with a ScoreStore."""
+
+    def __init__(self, sio, store, interval: float = 0.25):
+        self.sio = sio
+        self.interval = max(0.0, float(interval))
+        self._lock = threading.Lock()
+        # Last score seen per cell, so updates apply as differences
+        self._cells: Dict[Tuple[str, str], int] = {}
+        self._totals: Dict[str, int] = {}
+        # Sorted (-total, team) pairs
+        self._order: List[Tuple[int, str]] = []
+        # Rank and total clients were last told about
+        self._emitted: Dict[str, Tuple[int, int]] = {}
+        self._dirty = False
+        self.version = 0
+        self._thread = None
+        store.add_listener(self._on_change)
+        store.add_reset_listener(self.reset)
+        self.reset(store.snapshot())
+
+    def reset(self, scores: Dict[str, Dict[str, Dict[str, Any]]]):
+        """Rebuild every total from a full scoreboard."""
+        cells = {}
+        totals = {}
+        for team, team_cells in scores.items():
+            total = 0
+            for key, cell in team_cells.items():
+                score = cell.get("score", 0)
+                cells[(team, key)] = score
+                total += score
+            totals[team] = total
+        with self._lock:
+            self._cells = cells
+            self._totals = totals
+            self._order = sorted((-total, team) for team, total in totals.items())
+            self._dirty = True
+            self.version += 1
+        if not self.interval:
+            self.flush()
+
+    def _on_change(self, team: str, subject: str, cell: Dict[str, Any]):
+        score = cell.get("score", 0)
+        with self._lock:
+            previous = self._cells.get((team, subject), 0)
+            # Scores never go down; an older value arriving late is stale
+            if score <= previous and team in self._totals:
+                return
+            self._cells[(team, subject)] = score
+            old_total = self._totals.get(team)
+            new_total = (old_total or 0) + score - previous
+            if old_total is not None:
+                index = bisect.bisect_left(self._order, (-old_total, team))
+                del self._order[index]
+            bisect.insort(self._order, (-new_total, team))
+            self._totals[team] = new_total
+            self._dirty = True
+            self.version += 1
+        if not self.interval:
+            self.flush()
+
+    def _rank(self, total: int) -> int:
+        # Caller holds self._lock
+        return bisect.bisect_left(self._order, (-total,)) + 1
+
+    def rank(self, team: str) -> Optional[Dict[str, Any]]:
+        """Rank and total of one team, or None if it has no scores."""
+        with self._lock:
+            total = self._totals.get(team)
+            if total is None:
+                return None
+            return {"rank": self._rank(total), "team": team, "total": total}
+
+    def page(self, offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+        """``limit`` teams in rank order starting at ``offset``."""
+        offset = max(0, int(offset))
+        limit = max(0, int(limit))
+        with self._lock:
+            entries = self._order[offset:offset + limit]
+            teams = [{"rank": self._rank(-negative), "team": team, "total": -negative}
+                     for negative, team in entries]
+            return {"version": self.version, "total_teams": len(self._order),
+                    "offset": offset, "teams": teams}
+
+    def _take_changes(self) -> Optional[Dict[str, Any]]:
+        # Caller holds self._lock
+        if not self._dirty:
+            return None
+        self._dirty = False
+        changes = []
+        emitted = {}
+        rank = 0
+        previous_total = None
+        for position, (negative, team) in enumerate(self._order, 1):
+            total = -negative
+            if total != previous_total:
+                rank = position
+                previous_total = total
+            entry = (rank, total)
+            emitted[team] = entry
+            if self._emitted.get(team) != entry:
+                changes.append([team, rank, total])
+        removed = [team for team in self._emitted if team not in emitted]
+        self._emitted = emitted
+        if not changes and not removed:
+            return None
+        delta = {"version": self.version, "teams": changes}
+        if removed:
+            delta["removed"] = removed
+        return delta
+
+    def flush(self):
+        """Emit ranks and totals changed since the last event."""
+        with self._lock:
+            delta = self._take_changes()
+            # Emitting under the lock keeps events in version order
+            if delta is not None:
+                try:
+                    self.sio.emit("leaderboardDelta", delta, namespace="/")
+                except Exception as err:
+                    print("Failed to emit leaderboard delta:", repr(err))
+
+    def start(self):
+        """Emit coalesced rank changes every ``interval`` seconds."""
+        if self._thread is not None or not self.interval:
+            return
+
+        def flush_loop():
+            while True:
+                time.sleep(self.interval)
+                self.flush()
+
+        self._thread = threading.Thread(target=flush_loop, daemon=True)
+        self._thread.start()
@@ -3,14 +3,23 @@ import eventlet
 # so green threads are used everywhere.
 eventlet.monkey_patch()
 
-from flask import Flask, render_template, request, redirect, send_from_directory, session, url_for, jsonify
+from flask import Flask, Response, render_template, request, redirect, send_from_directory, session, url_for, jsonify
 import socketio
 import os
-import json
+import math
 import time
 import threading
 from grader import Grader
+from scheduler import Scheduler
 from config_loader import get_config_loader
+from check_plugins import all_plugins, get_plugin
+from score_store import get_score_store
+from team_config_store import get_team_config_store
+from check_history import get_check_history
+from response_cache import ResponseCache
+from agent_coordinator import AgentCoordinator
+from score_broadcaster import PUBLIC_ROOM, public_view, team_room
+import metrics
 
 
 app = Flask(__name__)
@@ -20,6 +29,9 @@ sio = socketio.Server(cors_allowed_origins="*", logger=False, max_http_buffer_si
 # Default grading cycle count on the app (may be updated by Grader)
 app.grading_cycle_count = 0
 
+# Serialized/gzipped payloads for the polled read-only endpoints
+response_cache = ResponseCache()
+
 
 @app.context_processor
 def inject_grading_cycle():
@@ -46,6 +58,36 @@ def get_json():
 def is_logged_in():
     return ("logged_in" in session and session["logged_in"])
 
+def cached_json_response(key, version, build):
+    """
+    Serve a JSON payload from the response cache, rebuilding it only when
+    ``version`` changes. Honors If-None-Match and Accept-Encoding: gzip.
+    """
+    payload = response_cache.get(key, version, build)
+    # Each encoding is a different representation, so it gets its own ETag
+    gzipped = "gzip" in request.accept_encodings
+    etag = payload.etag + "-gz" if gzipped else payload.etag
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif gzipped:
+        response = Response(payload.gzipped, mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(payload.body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Vary"] = "Accept-Encoding"
+    # Let clients keep a copy but always revalidate with the ETag
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def public_scores_payload():
+    """Cached public view of the scoreboard (statuses, no error text)."""
+    store = get_score_store()
+    return response_cache.get("public-scores", store.version, lambda: _build_public_scores(store))
+
+def _build_public_scores(store):
+    return public_view(store.snapshot())
+
 @app.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
@@ -90,9 +132,18 @@ def leaderboard():
 @app.route('/scores.json', methods=['GET'])
 def serve_scores_json():
     try:
-        with open('scores.json', 'r') as f:
-            data = json.load(f)
-        return jsonify(data)
+        store = get_score_store()
+        team_key = session.get('team') if is_logged_in() else None
+        if not team_key:
+            # Error text stays private; everyone else sees statuses only
+            return cached_json_response("public-scores", store.version, lambda: _build_public_scores(store))
+
+        def build():
+            scores = dict(public_scores_payload().data)
+            scores[team_key] = store.get_team(team_key)
+            return scores
+
+        return cached_json_response(("scores", team_key), store.version, build)
     except Exception:
         return jsonify({}), 200
 
@@ -110,30 +161,15 @@ def get_team_configs():
     if not is_logged_in():
         session["previous_page"] = "config"
         return jsonify({"error": "Unauthorized"}), 401
-    try:
-        with open('team_configs.json', 'r') as f:
-            data = json.load(f)
-    except Exception:
-        # Generate default config from master_config.json
-        config_loader = get_config_loader()
-        data = config_loader.generate_team_configs()
     # Only return the logged-in team's config
     user_team = session.get("team", "team1")
-    return jsonify({user_team: data.get(user_team, {})})
+    return jsonify({user_team: get_team_config_store().get_team(user_team)})
 
 @app.route('/api/team-configs', methods=['POST'])
 def update_team_configs():
     if not is_logged_in():
         session["previous_page"] = "config"
         return jsonify({"error": "Unauthorized"}), 401
-    # Prevent updates while grading is running
-    try:
-        # Access grader instance via a global reference
-        if getattr(app, 'grader', None) and getattr(app.grader, 'is_grading', False):
-            return jsonify({"error": "Grading is in progress. Try again soon."}), 409
-    except Exception:
-        pass
-    
     user_team = session.get("team", "team1")
     
     try:
@@ -160,72 +196,23 @@ def update_team_configs():
                 return jsonify({"error": f"Missing {system_name} in payload"}), 400
             system_cfg = team_data[system_name]
             
-            # Validate SSH config if this system has SSH service
-            if 'ssh' in system.get('services', []):
-                ssh = system_cfg.get('ssh', {})
-                if 'port' in ssh:
-                    try:
-                        p = int(ssh['port'])
-                        if p < 1 or p > 65535:
-                            return jsonify({"error": f"SSH port out of range for {system_name}"}), 400
-                        ssh['port'] = p
-                    except Exception:
-                        return jsonify({"error": f"SSH port invalid for {system_name}"}), 400
-                
-                # Normalize SSH config
-                ssh_service_config = config_loader.get_service_config('ssh')
-                system_cfg['ssh'] = {
-                    'username': ssh.get('username', ssh_service_config.get('default_username', 'sysadmin')),
-                    'password': ssh.get('password', ssh_service_config.get('default_password', 'changeme')),
-                    'port': ssh.get('port', ssh_service_config.get('default_port', 22)),
-                }
-            
-            # Validate Web config if this system has Web service
-            if 'web' in system.get('services', []):
-                web = system_cfg.get('web', {})
-                if 'port' in web:
-                    try:
-                        p = int(web['port'])
-                        if p < 1 or p > 65535:
-                            return jsonify({"error": f"Web port out of range for {system_name}"}), 400
-                        web['port'] = p
-                    except Exception:
-                        return jsonify({"error": f"Web port invalid for {system_name}"}), 400
-                
-                # Normalize Web config
-                web_service_config = config_loader.get_service_config('web')
-                system_cfg['web'] = {
-                    'port': web.get('port', web_service_config.get('default_port', 80))
-                }
-            
-            # Validate Active Directory config if this system has Active Directory service
-            if 'active_directory' in system.get('services', []):
-                ad = system_cfg.get('active_directory', {})
-                
-                # Normalize Active Directory config
-                ad_service_config = config_loader.get_service_config('active_directory')
-                system_cfg['active_directory'] = {
-                    'username': ad.get('username', ad_service_config.get('default_username', 'administrator')),
-                    'password': ad.get('password', ad_service_config.get('default_password', 'changeme')),
-                    'domain': ad.get('domain', ad_service_config.get('default_domain', 'example.com')),
-                }
-        
-        # Read full config, update only this team's section, and write back
-        try:
-            with open('team_configs.json', 'r') as f:
-                full_config = json.load(f)
-        except Exception:
-            # Generate defaults from master config
-            full_config = config_loader.generate_team_configs()
-        
-        full_config[user_team] = team_data
+            # Validate and normalize each service's team settings
+            for service_name in system.get('services', []):
+                plugin = get_plugin(service_name)
+                if plugin is None or not plugin.team_fields:
+                    continue
+                try:
+                    system_cfg[service_name] = plugin.validate_team(
+                        system_cfg.get(service_name, {}),
+                        config_loader.get_service_config(service_name),
+                    )
+                except ValueError as err:
+                    return jsonify({"error": f"{err} for {system_name}"}), 400
         
-        # Write atomically
-        tmp_path = 'team_configs.json.tmp'
-        with open(tmp_path, 'w') as f:
-            json.dump(full_config, f, indent=2)
-        os.replace(tmp_path, 'team_configs.json')
-        return jsonify({"ok": True})
+        # Copy-on-write update; cycles already running keep their snapshot
+        # and the file is written in the background
+        version = get_team_config_store().update_team(user_team, team_data)
+        return jsonify({"ok": True, "version": version})
     except Exception as e:
         return jsonify({"error": f"Failed to update configs: {e}"}), 500
 
@@ -245,18 +232,170 @@ def grading_status():
         cycle = 0
     return jsonify({"isGrading": status, "cycle": cycle})
 
+# --- Grading agent API (see grading_agent.py) ---
+def get_agent_coordinator():
+    """
+    Return the coordinator if agents are enabled and the request carries
+    the agent token, else an error response to return instead.
+    """
+    coordinator = getattr(getattr(app, 'grader', None), 'executor', None)
+    if not isinstance(coordinator, AgentCoordinator):
+        return None, (jsonify({"error": "Grading agents are not enabled"}), 503)
+    auth = request.headers.get('Authorization', '')
+    token = auth[len('Bearer '):] if auth.startswith('Bearer ') else None
+    if not coordinator.check_token(token):
+        return None, (jsonify({"error": "Unauthorized"}), 401)
+    return coordinator, None
+
+@app.route('/api/agents', methods=['GET'])
+def agents_status():
+    coordinator, error = get_agent_coordinator()
+    if error:
+        return error
+    return jsonify(coordinator.status())
+
+@app.route('/api/agents/register', methods=['POST'])
+def register_agent():
+    coordinator, error = get_agent_coordinator()
+    if error:
+        return error
+    payload = request.get_json(silent=True) or {}
+    try:
+        return jsonify(coordinator.register(payload.get('name'), payload.get('networks')))
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid networks: {e}"}), 400
+
+@app.route('/api/agents/<agent_id>/lease', methods=['POST'])
+def lease_checks(agent_id):
+    coordinator, error = get_agent_coordinator()
+    if error:
+        return error
+    payload = request.get_json(silent=True) or {}
+    try:
+        lease = coordinator.lease(agent_id, payload.get('max'), payload.get('wait'))
+    except (ValueError, TypeError):
+        return jsonify({"error": "Invalid lease request"}), 400
+    if lease is None:
+        return jsonify({"error": "Unknown agent; register again"}), 404
+    return jsonify(lease)
+
+@app.route('/api/agents/<agent_id>/results', methods=['POST'])
+def post_check_results(agent_id):
+    coordinator, error = get_agent_coordinator()
+    if error:
+        return error
+    payload = request.get_json(silent=True) or {}
+    results = payload.get('results')
+    if not isinstance(results, list):
+        return jsonify({"error": "Invalid payload"}), 400
+    accepted = coordinator.complete(agent_id, results)
+    if accepted is None:
+        return jsonify({"error": "Unknown agent; register again"}), 404
+    return jsonify({"accepted": accepted})
+
+# Ranked team totals maintained by the grader
+@app.route('/api/leaderboard', methods=['GET'])
+def leaderboard_api():
+    board = getattr(getattr(app, 'grader', None), 'leaderboard', None)
+    if board is None:
+        return jsonify({"error": "Grading has not started"}), 503
+    teams_by_id = get_config_loader().plan.teams_by_id
+
+    def with_name(entry):
+        entry["name"] = teams_by_id.get(entry["team"], {}).get("name", entry["team"])
+        return entry
+
+    team = request.args.get('team')
+    if team is not None:
+        entry = board.rank(team)
+        if entry is None:
+            return jsonify({"error": f"Unknown team {team}"}), 404
+        return jsonify(with_name(entry))
+    try:
+        if 'top' in request.args:
+            offset, limit = 0, int(request.args['top'])
+        else:
+            offset = int(request.args.get('offset', 0))
+            limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({"error": "offset, limit and top must be integers"}), 400
+    if offset < 0:
+        return jsonify({"error": "offset must not be negative"}), 400
+    if not 0 < limit <= 500:
+        return jsonify({"error": "limit must be between 1 and 500"}), 400
+    page = board.page(offset, limit)
+    page["teams"] = [with_name(entry) for entry in page["teams"]]
+    return jsonify(page)
+
+# Rolling uptime from the per-check result history
+@app.route('/api/uptime', methods=['GET'])
+def uptime():
+    try:
+        window = float(request.args.get('window', 1800))
+    except ValueError:
+        return jsonify({"error": "window must be a number of seconds"}), 400
+    if not math.isfinite(window) or window <= 0:
+        return jsonify({"error": "window must be positive"}), 400
+    team = request.args.get('team')
+    history = get_check_history()
+    return jsonify({
+        "window": window,
+        # Max and p95 latency need a pass over every sample; only give them
+        # for single-team queries
+        "teams": history.uptime(window, team=team, detail=team is not None),
+    })
+
+# Time-bucketed aggregates from the SQLite result history
+@app.route('/api/history', methods=['GET'])
+def history():
+    history_db = getattr(getattr(app, 'grader', None), 'history_db', None)
+    if history_db is None:
+        return jsonify({"error": "The result history database is not enabled"}), 503
+    now = time.time()
+    try:
+        end = float(request.args.get('end', now))
+        start = float(request.args.get('start', end - 3600))
+        bucket = float(request.args.get('bucket', 300))
+    except ValueError:
+        return jsonify({"error": "start, end and bucket must be numbers"}), 400
+    if not all(math.isfinite(value) for value in (start, end, bucket)) or bucket <= 0 or end <= start:
+        return jsonify({"error": "Invalid time range"}), 400
+    # Bound the response size
+    if (end - start) / bucket > 10000:
+        return jsonify({"error": "Too many buckets; use a larger bucket or a shorter range"}), 400
+    try:
+        buckets = history_db.aggregate(start, end, bucket,
+                                       team=request.args.get('team'),
+                                       service=request.args.get('service'))
+    except Exception as e:
+        return jsonify({"error": f"History query failed: {e}"}), 500
+    return jsonify({"start": start, "end": end, "bucket": bucket, "buckets": buckets})
+
+@app.route('/metrics', methods=['GET'])
+def serve_metrics():
+    """Prometheus text exposition of the grading metrics."""
+    if not metrics.REGISTRY.enabled:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route('/api/systems', methods=['GET'])
 def get_systems():
     """Get list of systems from master config for dynamic UI rendering."""
     try:
         config_loader = get_config_loader()
-        systems = config_loader.get_systems()
-        services = config_loader.get_services()
-        return jsonify({"systems": systems, "services": services})
+        return cached_json_response(
+            "systems",
+            config_loader.version,
+            lambda: {
+                "systems": config_loader.get_systems(),
+                "services": config_loader.get_services(),
+                "plugins": {name: plugin.describe() for name, plugin in all_plugins().items()},
+            },
+        )
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-# Logged-in team's scores (subset of scores.json)
+# Logged-in team's scores (subset of the live score store)
 @app.route('/api/team-scores', methods=['GET'])
 def team_scores():
     if not is_logged_in():
@@ -266,24 +405,68 @@ def team_scores():
     if not team_key:
         return jsonify({}), 200
     try:
-        with open('scores.json', 'r') as f:
-            data = json.load(f)
-        team_scores = data.get(team_key, {})
-        return jsonify({team_key: team_scores})
+        store = get_score_store()
+        return cached_json_response(
+            ("team-scores", team_key),
+            store.version,
+            lambda: {team_key: store.get_team(team_key)},
+        )
     except Exception:
         return jsonify({team_key: {}})
 
-@sio.on("connect")
-def connect(sid, environ):
-    # Emit current scores to the connecting client
+def send_scores_sync(sid):
+    """Send the public scoreboard with the current delta sequence number."""
     try:
-        with open("scores.json", "r") as score_file:
-            scores = json.load(score_file)
+        grader = getattr(app, 'grader', None)
+        # Built once per score version, however many clients connect
+        if grader is not None:
+            payload = grader.broadcaster.sync_payload(lambda: public_scores_payload().data)
+        else:
+            payload = {"seq": 0, "scores": public_scores_payload().data}
     except Exception:
-        scores = {}
+        payload = {"seq": 0, "scores": {}}
+    sio.emit("scoresSync", payload, to=sid)
 
+def send_team_sync(sid, team):
+    """Send a team's own cells, with error details, to one of its clients."""
+    grader = getattr(app, 'grader', None)
+    try:
+        if grader is not None:
+            payload = grader.broadcaster.team_sync_payload(team)
+        else:
+            payload = {"seq": 0, "scores": {team: get_score_store().get_team(team)}}
+    except Exception:
+        payload = {"seq": 0, "scores": {team: {}}}
+    sio.emit("teamScoresSync", payload, to=sid)
+
+@sio.on("resync")
+def resync(sid, data=None):
+    # A client noticed a gap in a delta sequence; start it over
+    if isinstance(data, dict) and data.get("channel") == "team":
+        team = sio.get_session(sid).get("team")
+        if team:
+            send_team_sync(sid, team)
+        return
+    send_scores_sync(sid)
+
+@sio.on("connect")
+def connect(sid, environ):
     print("Client connected:", sid)
-    sio.emit("scores", scores, to=sid)
+    metrics.CONNECTED_CLIENTS.inc()
+    # Logged-in teams also get their own error details in a private room
+    team = None
+    try:
+        with app.request_context(environ):
+            if is_logged_in():
+                team = session.get("team")
+    except Exception:
+        team = None
+    sio.save_session(sid, {"team": team})
+    sio.enter_room(sid, PUBLIC_ROOM)
+    send_scores_sync(sid)
+    if team:
+        sio.enter_room(sid, team_room(team))
+        send_team_sync(sid, team)
     try:
         # Also send the current cycle to new client for instant navbar update
         cycle = 0
@@ -296,27 +479,36 @@ def connect(sid, environ):
     except Exception:
         pass
 
+@sio.on("disconnect")
+def disconnect(sid, reason=None):
+    metrics.CONNECTED_CLIENTS.dec()
+
 if __name__ == "__main__":
-    # Load centralized configuration
+    # Load centralized configuration and pick up edits without a restart
     config_loader = get_config_loader()
+    config_loader.start_watching(config_loader.get_grading_config().get('config_watch_seconds', 2))
+    metrics.REGISTRY.enabled = config_loader.get_metrics_config().get('enabled', True)
     
-    # Reset scores.json to a known initial state on every server start so
-    # previous runs don't carry over scores.
-    initial_scores = config_loader.generate_initial_scores()
-
-    # Write atomically: write to a temp file then replace
-    try:
-        tmp_path = "scores.json.tmp"
-        with open(tmp_path, "w") as f:
-            json.dump(initial_scores, f)
-        os.replace(tmp_path, "scores.json")
-        print("scores.json reset to initial state on startup")
-    except Exception as e:
-        print("Failed to reset scores.json on startup:", repr(e))
-
+    # Recovers scores from the journal so a restart resumes the competition
     grader = Grader(sio)
     # Expose grader on app for API access to is_grading
     app.grader = grader
+    metrics.CHECKS_IN_FLIGHT.callback = (grader.executor or grader.engine).pending_count
+    # Worker processes keep their own budgets; agents are paced from here
+    budget = getattr(grader.executor or grader.engine, 'budget', None)
+    if budget is not None:
+        metrics.RATE_LIMIT_UTILIZATION.callback = budget.utilization
+        metrics.RATE_LIMIT_BACKLOG.callback = budget.backlog
+    
+    # Only wipe scores when explicitly asked to in master_config.json
+    if config_loader.get_persistence_config().get('reset_on_start', False):
+        try:
+            grader.score_store.reset(config_loader.generate_initial_scores())
+            print("Scores reset to initial state on startup")
+        except Exception as e:
+            print("Failed to reset scores on startup:", repr(e))
+    else:
+        print(f"Recovered scores up to result #{grader.score_store.seq}")
     
     # Get grading interval from master config
     grading_config = config_loader.get_grading_config()
@@ -327,6 +519,13 @@ if __name__ == "__main__":
             grader.grade_projects()
             time.sleep(interval)
     
-    threading.Thread(target=grade_with_interval, args=(grader, grading_interval)).start()
+    if grading_config.get('mode', 'fixed_rate') == 'cycle':
+        # Legacy barrier mode: run everything, wait for the slowest check
+        threading.Thread(target=grade_with_interval, args=(grader, grading_interval)).start()
+    else:
+        # Every check runs on its own fixed-rate timer
+        scheduler = Scheduler.from_config(grader)
+        app.scheduler = scheduler
+        scheduler.start()
     flaskApp = socketio.Middleware(sio, app)
     eventlet.wsgi.server(eventlet.listen(("0.0.0.0", 5000)), flaskApp)
\ No newline at end of file
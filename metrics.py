@@ -0,0 +1,245 @@
+"""
+Lightweight Prometheus-style metrics for the scoring engine.
+
+Counters, gauges and histograms are plain in-memory structures updated with
+a short lock; nothing is formatted until /metrics is scraped. Gauges backed
+by a callback (e.g. checks in flight) are only evaluated at scrape time.
+Setting ``metrics.enabled`` to false in master_config.json turns every
+update into a no-op.
+
+The metrics the engine exposes are defined at the bottom of this module.
+"""
+
+import bisect
+import re
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# Seconds; covers sub-millisecond lock waits up to check timeouts
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str,
+                 labels: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in sorted(values)]
+
+
+class Gauge(_Metric):
+    """A gauge that is set directly, or read from ``callback`` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, *args, callback: Optional[Callable[[], object]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self.callback = callback
+
+    def set(self, value: float, *label_values: str):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[label_values] = value
+
+    def inc(self, *label_values: str, amount: float = 1):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values: str, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+    def render(self) -> List[str]:
+        if self.callback is not None:
+            try:
+                value = self.callback()
+            except Exception:
+                return []
+            if value is None:
+                return []
+            # Callbacks return a number, or {label values: number}
+            items = value.items() if isinstance(value, dict) else [((), value)]
+            items = [((key,) if isinstance(key, str) else tuple(key), val) for key, val in items]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in sorted(items)]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        if not self.registry.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        lines = []
+        for key, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, (('le', _format_value(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds every metric and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self.enabled = True
+        self._metrics: List[_Metric] = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()) -> Counter:
+        return self._add(Counter(self, name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=(), callback=None) -> Gauge:
+        return self._add(Gauge(self, name, help_text, labels, callback=callback))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(self, name, help_text, labels, buckets=buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            body = metric.render()
+            if body:
+                lines.extend(metric.header())
+                lines.extend(body)
+        return "\n".join(lines) + "\n"
+
+
+# Most specific first; matched case-insensitively against check error text
+_ERROR_CLASSES = (
+    ("timeout", re.compile(r"timed? ?out|timeout")),
+    ("refused", re.compile(r"refused")),
+    ("reset", re.compile(r"reset by peer|connection reset|broken pipe|eof|channel closed")),
+    ("unreachable", re.compile(r"unreachable|no route")),
+    ("dns", re.compile(r"resolve|name or service|nodename|getaddrinfo")),
+    ("auth", re.compile(r"authentication|invalidcredentials|permission denied")),
+    ("no_reply", re.compile(r"\b0/\d+ replies|100% loss")),
+    ("http_status", re.compile(r"^http \d{3}")),
+    ("content", re.compile(r"expected content|hash mismatch|cannot verify")),
+)
+
+
+def classify_error(message: str) -> str:
+    """Bucket a check's error message into a small, fixed set of classes."""
+    text = str(message).lower()
+    for name, pattern in _ERROR_CLASSES:
+        if pattern.search(text):
+            return name
+    return "other"
+
+
+REGISTRY = MetricsRegistry()
+
+CYCLE_DURATION = REGISTRY.histogram(
+    "scoring_cycle_duration_seconds", "Time from the start to the end of a grading cycle.")
+SCHEDULE_LAG = REGISTRY.histogram(
+    "scoring_schedule_lag_seconds", "How late fixed-rate checks fired after they were due.")
+CHECK_DURATION = REGISTRY.histogram(
+    "scoring_check_duration_seconds", "Time spent running one check.", ("service",))
+WEB_PHASE_DURATION = REGISTRY.histogram(
+    "scoring_web_phase_seconds", "Time web checks spent connecting, waiting for headers and reading the body.",
+    ("phase",))
+CHECK_RESULTS = REGISTRY.counter(
+    "scoring_check_results_total", "Finished checks by outcome (success or error class).",
+    ("service", "outcome"))
+LOCK_WAIT = REGISTRY.histogram(
+    "scoring_lock_wait_seconds", "Time spent waiting to acquire a hot lock.", ("lock",))
+LOCK_HOLD = REGISTRY.histogram(
+    "scoring_lock_hold_seconds", "Time a hot lock was held.", ("lock",))
+SCORE_FLUSH = REGISTRY.histogram(
+    "scoring_score_flush_seconds", "Time to write a scores.json snapshot.")
+BROADCAST_EMIT = REGISTRY.histogram(
+    "scoring_broadcast_emit_seconds", "Time to emit one score delta to all clients.")
+BROADCAST_CHANGES = REGISTRY.counter(
+    "scoring_broadcast_changes_total", "Score cells sent in deltas.")
+CONNECTED_CLIENTS = REGISTRY.gauge(
+    "scoring_connected_clients", "Connected Socket.IO clients.")
+CHECKS_IN_FLIGHT = REGISTRY.gauge(
+    "scoring_checks_in_flight", "Checks queued or running.")
+RATE_LIMIT_DELAY = REGISTRY.histogram(
+    "scoring_rate_limit_delay_seconds", "How long checks waited for their subnet and host probe budgets.")
+RATE_LIMIT_UTILIZATION = REGISTRY.gauge(
+    "scoring_rate_limit_utilization", "Share of the busiest probe budget used over the last interval.",
+    ("scope",))
+RATE_LIMIT_BACKLOG = REGISTRY.gauge(
+    "scoring_rate_limit_backlog_seconds", "How far ahead the busiest probe budget is booked.", ("scope",))
@@ -0,0 +1,213 @@
+"""
+Per-subnet and per-host probe budgets for the scoring engine.
+
+Every team subnet and every target host gets a token bucket. Before a check
+runs, the check engine takes one token from its host's bucket and one from
+its subnet's; if either is empty the check waits in the engine, without
+holding a worker, until both have a token for it. A team's /24 then sees a
+steady trickle of probes instead of every check in a cycle at once.
+
+By default each bucket's rate comes from the plan: a subnet (or host) with
+N checks gets N / (interval_seconds * window_fraction) tokens per second,
+so with a small burst its checks are spread evenly over that part of the
+cycle. ``subnet_per_second`` and ``host_per_second`` set fixed rates
+instead. Rates follow config reloads.
+
+/metrics exposes how much of the busiest budget was used over the last
+interval and how far ahead it is booked. Utilization near 1, or a backlog
+approaching ``interval_seconds``, means the interval is too short for the
+budgets.
+"""
+
+import ipaddress
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import metrics
+
+
+DEFAULT_RATE_LIMITS = {
+    'enabled': False,
+    'window_fraction': 0.8,
+    'subnet_burst': 2,
+    'host_burst': 1,
+    'subnet_prefix': 24
+}
+
+SCOPES = ("subnet", "host")
+
+
+def interleave_hosts(scenarios: Sequence) -> List:
+    """
+    Scenarios reordered round-robin across their hosts. Budgets are booked
+    in submission order, so a cycle submitted host by host would use up
+    one host's budget before the next host's checks could start.
+    """
+    by_host: Dict[str, list] = {}
+    for scenario in scenarios:
+        by_host.setdefault(scenario.ip_address, []).append(scenario)
+    return [scenario for batch in itertools.zip_longest(*by_host.values())
+            for scenario in batch if scenario is not None]
+
+
+class TokenBucket:
+    """
+    A token bucket stored as the time its next token comes free (GCRA), so
+    a reservation is O(1) and says exactly how long the caller must wait.
+    """
+
+    __slots__ = ("rate", "burst", "free_at", "window_start", "used", "last_utilization")
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.free_at = now
+        self.window_start = now
+        self.used = 0
+        self.last_utilization = 0.0
+
+    def earliest(self, now: float) -> float:
+        """When the next token can be taken."""
+        # A full bucket lets free_at run (burst - 1) tokens ahead of now
+        return max(now, self.free_at - (self.burst - 1) / self.rate)
+
+    def take(self, at: float, now: float, window: float):
+        """Spend one token at time ``at`` (no earlier than ``earliest``)."""
+        self.free_at = max(self.free_at, at) + 1.0 / self.rate
+        if now - self.window_start >= window:
+            self.last_utilization = self.utilization(now, window)
+            self.window_start = now
+            self.used = 0
+        self.used += 1
+
+    def utilization(self, now: float, window: float) -> float:
+        """Tokens used over the last window as a share of the bucket's rate."""
+        elapsed = now - self.window_start
+        if elapsed < window:
+            return self.last_utilization
+        # Window closed with nothing taken since; decays while idle
+        return self.used / (self.rate * elapsed)
+
+
+class ProbeBudget:
+    """Token buckets for every subnet and host the engine probes."""
+
+    def __init__(self, config_loader, settings: Dict):
+        self.config_loader = config_loader
+        self.window_fraction = float(settings.get('window_fraction', DEFAULT_RATE_LIMITS['window_fraction']))
+        self.subnet_prefix = int(settings.get('subnet_prefix', DEFAULT_RATE_LIMITS['subnet_prefix']))
+        self.bursts = {
+            "subnet": max(1, int(settings.get('subnet_burst', DEFAULT_RATE_LIMITS['subnet_burst']))),
+            "host": max(1, int(settings.get('host_burst', DEFAULT_RATE_LIMITS['host_burst']))),
+        }
+        self.fixed_rates = {
+            "subnet": settings.get('subnet_per_second'),
+            "host": settings.get('host_per_second'),
+        }
+
+        self._lock = threading.Lock()
+        self._version = None
+        self.window = 40.0
+        # scope -> key -> derived rate, and the rate for keys not in the plan
+        self._rates: Dict[str, Dict[str, float]] = {scope: {} for scope in SCOPES}
+        self._fallback: Dict[str, Optional[float]] = {scope: None for scope in SCOPES}
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {scope: {} for scope in SCOPES}
+        self._subnets: Dict[str, str] = {}
+
+    @classmethod
+    def from_config(cls, config_loader) -> Optional["ProbeBudget"]:
+        """A budget from ``rate_limits`` in master_config.json, or None if disabled."""
+        settings = config_loader.get_rate_limits_config()
+        if not settings.get('enabled', False):
+            return None
+        return cls(config_loader, settings)
+
+    def _subnet_for(self, host: str, team_subnet: Optional[str] = None) -> str:
+        try:
+            if team_subnet:
+                return str(ipaddress.ip_network(team_subnet, strict=False))
+            return str(ipaddress.ip_network(f"{host}/{self.subnet_prefix}", strict=False))
+        except ValueError:
+            # A hostname; it is its own subnet
+            return host
+
+    def _refresh(self):
+        # Caller holds self._lock
+        plan = self.config_loader.plan
+        interval = float(self.config_loader.get_grading_config().get('interval_seconds', 40))
+        self.window = interval
+        spread = max(0.01, interval * self.window_fraction)
+
+        subnets = {}
+        counts: Dict[str, Dict[str, int]] = {scope: {} for scope in SCOPES}
+        for scenario in plan.scenarios:
+            host = scenario.ip_address
+            subnet = subnets.get(host)
+            if subnet is None:
+                team = plan.teams_by_id.get(scenario.team_id) or {}
+                subnet = subnets[host] = self._subnet_for(host, team.get('subnet'))
+            counts["host"][host] = counts["host"].get(host, 0) + 1
+            counts["subnet"][subnet] = counts["subnet"].get(subnet, 0) + 1
+        self._subnets = subnets
+
+        for scope in SCOPES:
+            self._rates[scope] = {key: count / spread for key, count in counts[scope].items()}
+            self._fallback[scope] = max(self._rates[scope].values(), default=None)
+            for key, bucket in self._buckets[scope].items():
+                rate = self._rate(scope, key)
+                if rate:
+                    bucket.rate = rate
+                    bucket.burst = self.bursts[scope]
+        self._version = self.config_loader.version
+
+    def _rate(self, scope: str, key: str) -> Optional[float]:
+        fixed = self.fixed_rates[scope]
+        if fixed:
+            return float(fixed)
+        return self._rates[scope].get(key, self._fallback[scope])
+
+    def _bucket(self, scope: str, key: str, now: float) -> Optional[TokenBucket]:
+        bucket = self._buckets[scope].get(key)
+        if bucket is None:
+            rate = self._rate(scope, key)
+            if not rate:
+                return None
+            bucket = self._buckets[scope][key] = TokenBucket(rate, self.bursts[scope], now)
+        return bucket
+
+    def reserve(self, host: str) -> float:
+        """
+        Book the next probe of ``host`` against its host and subnet budgets.
+        Returns how many seconds the probe must wait before it runs.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._version != self.config_loader.version:
+                self._refresh()
+            subnet = self._subnets.get(host) or self._subnet_for(host)
+            buckets = [bucket for bucket in (self._bucket("host", host, now), self._bucket("subnet", subnet, now))
+                       if bucket is not None]
+            at = max((bucket.earliest(now) for bucket in buckets), default=now)
+            for bucket in buckets:
+                bucket.take(at, now, self.window)
+        delay = at - now
+        metrics.RATE_LIMIT_DELAY.observe(delay)
+        return delay
+
+    def utilization(self) -> Dict[str, float]:
+        """The busiest bucket's utilization over the last interval, per scope."""
+        now = time.monotonic()
+        with self._lock:
+            return {scope: max((bucket.utilization(now, self.window) for bucket in self._buckets[scope].values()),
+                               default=0.0)
+                    for scope in SCOPES}
+
+    def backlog(self) -> Dict[str, float]:
+        """How many seconds ahead the busiest bucket is booked, per scope."""
+        now = time.monotonic()
+        with self._lock:
+            return {scope: max((max(0.0, bucket.free_at - now) for bucket in self._buckets[scope].values()),
+                               default=0.0)
+                    for scope in SCOPES}
@@ -0,0 +1,54 @@
+"""
+Pre-serialized response cache for the scoring engine's read-heavy routes.
+
+Spectator pages poll /scores.json and friends constantly. Rather than
+re-serializing the same data on every request, each payload is encoded to
+JSON and gzip once per version of the underlying data and tagged with an
+ETag, so unchanged polls can be answered with a bare 304.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class CachedPayload:
+    """One serialized version of a response body."""
+
+    __slots__ = ("version", "data", "body", "gzipped", "etag")
+
+    def __init__(self, version: Any, data: Any):
+        self.version = version
+        self.data = data
+        self.body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        self.gzipped = gzip.compress(self.body, compresslevel=6)
+        self.etag = hashlib.blake2b(self.body, digest_size=8).hexdigest()
+
+
+class ResponseCache:
+    """Maps a cache key to the payload built for the latest data version."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, CachedPayload] = {}
+
+    def get(self, key: Hashable, version: Any, build: Callable[[], Any]) -> CachedPayload:
+        """
+        Return the payload for ``key``, calling ``build()`` to produce fresh
+        data only when ``version`` differs from the cached one.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == version:
+            return entry
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                entry = CachedPayload(version, build())
+                self._entries[key] = entry
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
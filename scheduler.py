@@ -0,0 +1,269 @@
+"""
+Fixed-rate grading scheduler for the scoring engine.
+
+Instead of running every check in lock-step and waiting for the slowest one,
+each (team, system, service) check gets its own timer. Timers fire on a fixed
+grid (``interval_seconds`` from the service definition, falling back to the
+grading interval) with a random phase and a little jitter, so one dead host
+only delays its own check. When a check is still running at its next tick the
+overrun policy decides what happens:
+
+- ``skip``: drop that tick and wait for the next one
+- ``queue``: run once more as soon as the current run finishes
+
+When a result changes a cell's state and ``confirm_count`` asks for more
+results before the change is scored (see state_confirmer.py), the check is
+run again after ``recheck_seconds`` rather than at its next slot. Rechecks
+happen only while a change is pending and never move the fixed-rate grid.
+"""
+
+import heapq
+import random
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+import metrics
+
+
+OVERRUN_POLICIES = ("skip", "queue")
+
+
+class ScheduledCheck:
+    """Timer state for one (team, system, service) check."""
+
+    __slots__ = ("key", "scenario", "interval", "next_base", "next_due",
+                 "in_flight", "queued", "runs", "skipped", "active",
+                 "recheck_due", "rechecks")
+
+    def __init__(self, key, scenario, interval, first_base):
+        self.key = key
+        self.scenario = scenario
+        self.interval = interval
+        # Point on the fixed-rate grid; jitter is applied on top of it so the
+        # period never drifts.
+        self.next_base = first_base
+        self.next_due = first_base
+        self.in_flight = False
+        self.queued = False
+        self.runs = 0
+        self.skipped = 0
+        self.active = True
+        # When the pending recheck is due; None if there is none
+        self.recheck_due = None
+        self.rechecks = 0
+
+
+class Scheduler:
+    """Runs each scenario on its own fixed-rate timer through the Grader."""
+
+    def __init__(self, grader, overrun_policy: str = "skip",
+                 jitter_seconds: float = 1.0, recheck_seconds: float = 5.0):
+        if overrun_policy not in OVERRUN_POLICIES:
+            raise ValueError(f"Unknown overrun policy {overrun_policy!r}; "
+                             f"expected one of {OVERRUN_POLICIES}")
+        self.grader = grader
+        self.config_loader = grader.config_loader
+        self.overrun_policy = overrun_policy
+        self.jitter_seconds = max(0.0, float(jitter_seconds))
+        self.recheck_seconds = max(0.0, float(recheck_seconds))
+
+        grading = self.config_loader.get_grading_config()
+        self.cycle_interval = grading.get('interval_seconds', 40)
+
+        self._cond = threading.Condition()
+        self._checks: Dict[Tuple[str, str, str], ScheduledCheck] = {}
+        self._heap = []
+        self._counter = 0
+        self._stopped = False
+        self._thread = None
+        # Config version the timers were last built from
+        self._plan_version = None
+
+    @classmethod
+    def from_config(cls, grader) -> "Scheduler":
+        """Build a scheduler using the grading section of master_config.json."""
+        grading = grader.config_loader.get_grading_config()
+        return cls(
+            grader,
+            overrun_policy=grading.get('overrun_policy', 'skip'),
+            jitter_seconds=grading.get('jitter_seconds', 1.0),
+            recheck_seconds=grading.get('recheck_seconds', 5.0),
+        )
+
+    def _service_interval(self, service_name: str) -> float:
+        service_config = self.config_loader.get_service_config(service_name)
+        return float(service_config.get('interval_seconds', self.cycle_interval))
+
+    def _push(self, check: ScheduledCheck, recheck: bool = False):
+        # The counter breaks ties so heapq never compares ScheduledChecks
+        self._counter += 1
+        due = check.recheck_due if recheck else check.next_due
+        heapq.heappush(self._heap, (due, self._counter, check, recheck))
+
+    def _jittered(self, base: float) -> float:
+        if not self.jitter_seconds:
+            return base
+        return base + random.uniform(-self.jitter_seconds, self.jitter_seconds)
+
+    def sync(self):
+        """
+        (Re)build timers from the current scenarios. Existing checks keep
+        their phase; removed ones are dropped once their timer next fires.
+        """
+        now = time.monotonic()
+        plan = self.config_loader.plan
+        self.cycle_interval = self.config_loader.get_grading_config().get('interval_seconds', 40)
+        with self._cond:
+            seen = set()
+            for scenario in plan.scenarios:
+                key = scenario.key
+                seen.add(key)
+                interval = self._service_interval(scenario.service_name)
+                check = self._checks.get(key)
+                if check is not None:
+                    check.scenario = scenario
+                    check.interval = interval
+                    continue
+                # A random phase spreads checks across the whole interval
+                first_base = now + random.uniform(0, interval)
+                check = ScheduledCheck(key, scenario, interval, first_base)
+                self._checks[key] = check
+                self._push(check)
+            for key in list(self._checks):
+                if key not in seen:
+                    self._checks.pop(key).active = False
+            self._plan_version = plan.version
+            self._cond.notify_all()
+
+    def _advance(self, check: ScheduledCheck, now: float):
+        """Move a check to its next slot on the fixed-rate grid."""
+        check.next_base += check.interval
+        # If the scheduler itself fell behind, skip the missed slots rather
+        # than firing a burst of catch-up runs.
+        while check.next_base <= now:
+            check.next_base += check.interval
+            check.skipped += 1
+        check.next_due = self._jittered(check.next_base)
+
+    def _dispatch(self, check: ScheduledCheck):
+        check.in_flight = True
+        check.runs += 1
+        # This run's result decides whether another recheck is needed
+        check.recheck_due = None
+
+        def on_done(result, elapsed, check=check):
+            self._finished(check)
+
+        try:
+            if not self.grader.submit_check(check.scenario, on_done):
+                check.in_flight = False
+        except Exception as err:
+            check.in_flight = False
+            print("Failed to submit check", check.key, repr(err))
+
+    def _finished(self, check: ScheduledCheck):
+        scenario = check.scenario
+        pending = self.grader.confirmer.pending(scenario.team_id, scenario.score_key)
+        with self._cond:
+            check.in_flight = False
+            if not check.active:
+                return
+            if check.queued:
+                check.queued = False
+                self._dispatch(check)
+            elif pending and self.recheck_seconds < check.interval:
+                check.recheck_due = time.monotonic() + self.recheck_seconds
+                self._push(check, recheck=True)
+                self._cond.notify_all()
+
+    def _recheck(self, check: ScheduledCheck):
+        # Skip rechecks overtaken by a scheduled run
+        if check.in_flight or check.recheck_due is None:
+            return
+        check.rechecks += 1
+        self._dispatch(check)
+
+    def _fire(self, check: ScheduledCheck, now: float):
+        metrics.SCHEDULE_LAG.observe(max(0.0, now - check.next_due))
+        if check.in_flight:
+            if self.overrun_policy == "queue":
+                check.queued = True
+            else:
+                check.skipped += 1
+        else:
+            self._dispatch(check)
+        self._advance(check, now)
+        self._push(check)
+
+    def _run(self):
+        next_cycle = time.monotonic() + self.cycle_interval
+        with self._cond:
+            while not self._stopped:
+                now = time.monotonic()
+
+                # Cycle ticks only drive the counter, flushes and broadcasts;
+                # checks never wait on them.
+                if now >= next_cycle:
+                    self._cond.release()
+                    try:
+                        self.grader.end_cycle()
+                        # Pick up a reloaded master_config.json
+                        if self.config_loader.version != self._plan_version:
+                            self.sync()
+                        self.grader.begin_cycle()
+                    except Exception as err:
+                        print("Grading cycle tick failed:", repr(err))
+                    finally:
+                        self._cond.acquire()
+                    next_cycle += self.cycle_interval
+                    while next_cycle <= now:
+                        next_cycle += self.cycle_interval
+                    continue
+
+                if self._heap and self._heap[0][0] <= now:
+                    due, _, check, recheck = heapq.heappop(self._heap)
+                    if not check.active:
+                        continue
+                    if recheck:
+                        if due == check.recheck_due:
+                            self._recheck(check)
+                    else:
+                        self._fire(check, now)
+                    continue
+
+                wake_at = next_cycle
+                if self._heap:
+                    wake_at = min(wake_at, self._heap[0][0])
+                self._cond.wait(max(0.0, wake_at - now))
+
+    def start(self):
+        """Start the first cycle and the scheduler thread."""
+        if self._thread is not None:
+            return
+        # Checks run continuously; /api/grading-status reports the scheduler
+        self.grader.is_grading = True
+        self.grader.begin_cycle()
+        self.sync()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self.grader.is_grading = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Run/skip counters summed per service."""
+        with self._cond:
+            per_service: Dict[str, Dict[str, int]] = {}
+            for (_, _, service_name), check in self._checks.items():
+                entry = per_service.setdefault(service_name, {"checks": 0, "runs": 0, "rechecks": 0,
+                                                              "skipped": 0, "in_flight": 0})
+                entry["checks"] += 1
+                entry["runs"] += check.runs
+                entry["rechecks"] += check.rechecks
+                entry["skipped"] += check.skipped
+                entry["in_flight"] += int(check.in_flight)
+            return {"overrun_policy": self.overrun_policy, "services": per_service}
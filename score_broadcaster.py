@@ -0,0 +1,225 @@
+"""
+Delta score broadcasts over Socket.IO.
+
+Rather than emitting the whole teams x services dict after every cycle, the
+broadcaster collects the cells changed by each applied result and streams
+them as numbered deltas. There are two channels:
+
+- Public (room ``public``, every client): ``scoresDelta`` events coalesced
+  at most every ``public_interval`` seconds. Error text is replaced by a
+  status (``Success``, ``Not tested`` or ``Failed``), so a refresh storm of
+  spectators costs little and never sees another team's error details:
+
+      {"seq": 42, "changes": [[team, score_key, score, status], ...]}
+
+- Team (room ``team:<id>``, clients logged in as that team):
+  ``teamScoresDelta`` events every ``interval`` seconds with the full error
+  strings for that team's cells only, numbered per team.
+
+Cells carry absolute values, so applying a delta twice is harmless. Clients
+start from ``scoresSync`` / ``teamScoresSync`` (``{"seq": n, "scores":
+{...}}``) sent on connect, and ask for another one with ``resync`` if they
+notice a gap in the sequence numbers.
+
+With ``binary`` enabled, public deltas are sent as packed bytes instead of
+JSON: a little-endian uint32 seq followed by one 9-byte record per cell
+(uint32 cell id, int32 score, uint8 status 0 = not tested, 1 = success,
+2 = failed). Scores are rounded and clamped to the int32 range. Cell ids
+index the ``cells`` list (``[[team, score_key], ...]``) included in every
+``scoresSync``; a client that sees an id it does not know asks for a resync.
+"""
+
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+
+PUBLIC_ROOM = "public"
+
+STATUS_NOT_TESTED = "Not tested"
+STATUS_SUCCESS = "Success"
+STATUS_FAILED = "Failed"
+STATUS_CODES = {STATUS_NOT_TESTED: 0, STATUS_SUCCESS: 1, STATUS_FAILED: 2}
+
+_DELTA_HEADER = struct.Struct("<I")
+_DELTA_RECORD = struct.Struct("<IiB")
+_INT32_MIN, _INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def team_room(team: str) -> str:
+    """Socket.IO room that receives one team's detailed updates."""
+    return f"team:{team}"
+
+
+def _packed_score(score: Any) -> int:
+    """A score rounded and clamped to fit a binary delta record."""
+    try:
+        return min(_INT32_MAX, max(_INT32_MIN, round(float(score))))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+def public_status(error: str) -> str:
+    """The public form of a cell's error text."""
+    if error == STATUS_SUCCESS or error == STATUS_NOT_TESTED:
+        return error
+    return STATUS_FAILED
+
+
+def public_view(scores: Dict[str, Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Copy of a full scoreboard with error text replaced by statuses."""
+    return {
+        team: {key: {"score": cell.get("score", 0), "error": public_status(cell.get("error", ""))}
+               for key, cell in cells.items()}
+        for team, cells in scores.items()
+    }
+
+
+class ScoreBroadcaster:
+    """Coalesces score changes and emits them as sequenced deltas."""
+
+    def __init__(self, sio, store, interval: float = 0.25,
+                 public_interval: Optional[float] = None, binary: bool = False):
+        self.sio = sio
+        self.store = store
+        self.interval = max(0.0, float(interval))
+        self.public_interval = self.interval if public_interval is None else max(0.0, float(public_interval))
+        self.binary = binary
+        self._lock = threading.Lock()
+        # Latest value of every cell changed since the last emit
+        self._pending: Dict[Tuple[str, str], Tuple[int, str]] = {}
+        self._pending_teams: Dict[str, Dict[str, Tuple[int, str]]] = {}
+        self.seq = 0
+        self._team_seq: Dict[str, int] = {}
+        # Binary mode: (team, score_key) -> id, and the reverse list
+        self._cell_ids: Dict[Tuple[str, str], int] = {}
+        self._cells: List[List[str]] = []
+        self._thread = None
+        store.add_listener(self._on_change)
+
+    def _on_change(self, team: str, subject: str, cell: Dict[str, Any]):
+        score = cell.get("score", 0)
+        error = cell.get("error", "")
+        with self._lock:
+            self._pending[(team, subject)] = (score, public_status(error))
+            self._pending_teams.setdefault(team, {})[subject] = (score, error)
+        if not self.interval:
+            self.flush_teams()
+        if not self.public_interval:
+            self.flush_public()
+
+    def _cell_id(self, team: str, subject: str) -> int:
+        # Caller holds self._lock
+        cell_id = self._cell_ids.get((team, subject))
+        if cell_id is None:
+            cell_id = self._cell_ids[(team, subject)] = len(self._cells)
+            self._cells.append([team, subject])
+        return cell_id
+
+    def _take_delta(self) -> Optional[Any]:
+        # Caller holds self._lock
+        if not self._pending:
+            return None
+        pending, self._pending = self._pending, {}
+        self.seq += 1
+        if self.binary:
+            parts = [_DELTA_HEADER.pack(self.seq)]
+            for (team, subject), (score, status) in pending.items():
+                parts.append(_DELTA_RECORD.pack(self._cell_id(team, subject), _packed_score(score),
+                                                STATUS_CODES[status]))
+            return b"".join(parts)
+        changes = [[team, subject, score, status]
+                   for (team, subject), (score, status) in pending.items()]
+        return {"seq": self.seq, "changes": changes}
+
+    def _emit(self, event: str, payload: Any, room: str, cells: int):
+        # Caller holds self._lock; emitting under it keeps deltas in order
+        started = time.perf_counter()
+        try:
+            self.sio.emit(event, payload, to=room, namespace="/")
+        except Exception as err:
+            print(f"Failed to emit {event}:", repr(err))
+        metrics.BROADCAST_EMIT.observe(time.perf_counter() - started)
+        metrics.BROADCAST_CHANGES.inc(amount=cells)
+
+    def flush_public(self):
+        """Emit the public changes since the last public delta."""
+        with self._lock:
+            cells = len(self._pending)
+            delta = self._take_delta()
+            if delta is not None:
+                self._emit("scoresDelta", delta, PUBLIC_ROOM, cells)
+
+    def _flush_team(self, team: str):
+        # Caller holds self._lock
+        pending = self._pending_teams.pop(team, None)
+        if not pending:
+            return
+        seq = self._team_seq[team] = self._team_seq.get(team, 0) + 1
+        changes = [[team, subject, score, error] for subject, (score, error) in pending.items()]
+        self._emit("teamScoresDelta", {"seq": seq, "changes": changes}, team_room(team), len(changes))
+
+    def flush_teams(self):
+        """Emit each team's detailed changes to its own room."""
+        with self._lock:
+            for team in list(self._pending_teams):
+                self._flush_team(team)
+
+    def flush(self):
+        """Emit everything changed since the last deltas."""
+        self.flush_teams()
+        self.flush_public()
+
+    def sync_payload(self, snapshot: Optional[Callable[[], Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Build a public ``scoresSync`` payload. ``snapshot`` returns the
+        public view of the scores (see ``public_view``). The snapshot is at
+        least as new as delta ``seq``; changes still pending go out in the
+        next coalesced delta, which re-applies their absolute values.
+        """
+        with self._lock:
+            seq = self.seq
+        scores = snapshot() if snapshot is not None else public_view(self.store.snapshot())
+        payload = {"seq": seq, "scores": scores}
+        if self.binary:
+            with self._lock:
+                for team, team_cells in scores.items():
+                    for subject in team_cells:
+                        self._cell_id(team, subject)
+                payload["cells"] = list(self._cells)
+        return payload
+
+    def team_sync_payload(self, team: str) -> Dict[str, Any]:
+        """Build a ``teamScoresSync`` payload with one team's full detail."""
+        with self._lock:
+            seq = self._team_seq.get(team, 0)
+        return {"seq": seq, "scores": {team: self.store.get_team(team)}}
+
+    def start(self):
+        """Stream coalesced deltas on their intervals."""
+        intervals = [value for value in (self.interval, self.public_interval) if value]
+        if self._thread is not None or not intervals:
+            return
+        tick = min(intervals)
+
+        def flush_loop():
+            next_team = next_public = time.monotonic()
+            while True:
+                time.sleep(tick)
+                now = time.monotonic()
+                try:
+                    if self.interval and now >= next_team + self.interval:
+                        next_team = now
+                        self.flush_teams()
+                    if self.public_interval and now >= next_public + self.public_interval:
+                        next_public = now
+                        self.flush_public()
+                except Exception as err:
+                    # Keep broadcasting; a bad cell must not end the thread
+                    print("Failed to flush score deltas:", repr(err))
+
+        self._thread = threading.Thread(target=flush_loop, daemon=True)
+        self._thread.start()
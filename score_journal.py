@@ -0,0 +1,218 @@
+"""
+Append-only score journal for the scoring engine.
+
+Every applied check result is appended as one short JSON line
+(``[seq, team, subject, points, error]``), so persisting a result costs a
+bounded number of bytes regardless of how many teams there are. The journal
+is periodically compacted into a snapshot of the full state, which keeps the
+tail that has to be replayed on startup short.
+
+The score store appends outside its own lock, so records can arrive out of
+order; each one waits here until every earlier seq has been written, and
+the file always stays in seq order.
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Recently written records kept in memory so a rotation can carry over the
+# ones that belong after the snapshot without rereading the file
+RECENT_RECORDS = 1024
+
+
+class ScoreJournal:
+    """Writes, compacts and replays the score event journal."""
+
+    def __init__(self, journal_path: str = "scores.journal",
+                 snapshot_path: str = "scores.snapshot.json",
+                 compact_every: int = 50000, fsync: bool = False):
+        self.journal_path = journal_path
+        self.snapshot_path = snapshot_path
+        self.compact_every = max(1, int(compact_every))
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._file = None
+        self.records_since_snapshot = 0
+        # Next seq to write, and records waiting for an earlier one
+        self._next_seq = 1
+        self._pending: Dict[int, str] = {}
+        self._recent = deque(maxlen=RECENT_RECORDS)
+
+    @classmethod
+    def from_config(cls, config_loader) -> Optional["ScoreJournal"]:
+        """Build a journal from master_config.json, or None if disabled."""
+        persistence = config_loader.get_persistence_config()
+        if not persistence.get('journal', True):
+            return None
+        return cls(
+            journal_path=persistence.get('journal_path', 'scores.journal'),
+            snapshot_path=persistence.get('snapshot_path', 'scores.snapshot.json'),
+            compact_every=persistence.get('compact_every', 50000),
+            fsync=persistence.get('fsync', False),
+        )
+
+    @property
+    def _rotated_path(self) -> str:
+        return f"{self.journal_path}.old"
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+
+    def exists(self) -> bool:
+        """True if there is anything on disk to recover from."""
+        return any(os.path.exists(p) for p in
+                   (self.snapshot_path, self.journal_path, self._rotated_path))
+
+    def start(self, seq: int):
+        """Continue the journal after record ``seq``."""
+        with self._lock:
+            self._next_seq = seq + 1
+            self._pending.clear()
+
+    def append(self, seq: int, team: str, subject: str, points: int, error: str):
+        """
+        Append one result record and hand it to the OS, along with any later
+        records that were waiting for it.
+        """
+        line = json.dumps([seq, team, subject, points, error],
+                          separators=(",", ":"), ensure_ascii=False)
+        with self._lock:
+            if seq < self._next_seq:
+                # Numbered before start(); nothing can be waiting on it
+                lines = [line]
+            else:
+                self._pending[seq] = line
+                lines = []
+                while self._next_seq in self._pending:
+                    ready = self._pending.pop(self._next_seq)
+                    self._recent.append((self._next_seq, ready))
+                    lines.append(ready)
+                    self._next_seq += 1
+                if not lines:
+                    # An earlier record is still on its way
+                    return
+            self._open()
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+            self.records_since_snapshot += len(lines)
+
+    def sync(self):
+        """Force journal writes to stable storage when fsync is enabled."""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+
+    def needs_compaction(self) -> bool:
+        return self.records_since_snapshot >= self.compact_every
+
+    def _written_after(self, seq: int) -> List[str]:
+        # Caller holds self._lock; records after seq are all in the current file
+        if self._recent and self._recent[0][0] <= seq + 1:
+            return [line for rec_seq, line in self._recent if rec_seq > seq]
+        lines = []
+        with open(self.journal_path, "r", encoding="utf-8") as journal_file:
+            for line in journal_file:
+                try:
+                    if json.loads(line)[0] > seq:
+                        lines.append(line.rstrip("\n"))
+                except (ValueError, TypeError, IndexError):
+                    continue
+        return lines
+
+    def rotate(self, seq: Optional[int] = None):
+        """
+        Move the current journal aside so new records start a fresh file,
+        then pass the state as of record ``seq`` to ``write_snapshot``.
+        Records after ``seq`` that were already written are carried over to
+        the new file.
+        """
+        with self._lock:
+            carried = []
+            if seq is not None and self._next_seq - 1 > seq:
+                if self._file is not None:
+                    self._file.flush()
+                carried = self._written_after(seq)
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.journal_path):
+                if os.path.exists(self._rotated_path):
+                    # A previous compaction never finished; keep its records.
+                    with open(self._rotated_path, "a", encoding="utf-8") as old, \
+                            open(self.journal_path, "r", encoding="utf-8") as cur:
+                        old.write(cur.read())
+                    os.remove(self.journal_path)
+                else:
+                    os.replace(self.journal_path, self._rotated_path)
+            self._recent.clear()
+            self.records_since_snapshot = len(carried)
+            if carried:
+                self._open()
+                self._file.write("\n".join(carried) + "\n")
+                self._file.flush()
+
+    def write_snapshot(self, scores: Dict[str, Any], seq: int):
+        """Persist a compacted snapshot and drop the rotated journal."""
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as snapshot_file:
+            json.dump({"seq": seq, "scores": scores}, snapshot_file,
+                      separators=(",", ":"))
+            snapshot_file.flush()
+            if self.fsync:
+                os.fsync(snapshot_file.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        if os.path.exists(self._rotated_path):
+            os.remove(self._rotated_path)
+
+    def recover(self) -> Tuple[Dict[str, Dict[str, Dict[str, Any]]], int]:
+        """
+        Rebuild the scores from the last snapshot plus every journal record
+        written after it. Returns ``(scores, seq)``.
+        """
+        scores: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        seq = 0
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            scores = snapshot.get("scores", {})
+            seq = int(snapshot.get("seq", 0))
+        except (FileNotFoundError, json.JSONDecodeError, ValueError):
+            pass
+
+        replayed = 0
+        for path in (self._rotated_path, self.journal_path):
+            try:
+                journal_file = open(path, "r", encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            with journal_file:
+                for line in journal_file:
+                    try:
+                        rec_seq, team, subject, points, error = json.loads(line)
+                    except (ValueError, TypeError):
+                        # A torn final line from a crash mid-write
+                        continue
+                    if rec_seq <= seq:
+                        continue
+                    cell = scores.setdefault(team, {}).setdefault(
+                        subject, {"error": "Not tested", "score": 0})
+                    cell["score"] = cell.get("score", 0) + points
+                    cell["error"] = error
+                    seq = rec_seq
+                    replayed += 1
+
+        self.records_since_snapshot = replayed
+        return scores, seq
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
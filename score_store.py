@@ -0,0 +1,239 @@
+"""
+Authoritative in-memory score store for the scoring engine.
+
+Grading results are applied to an in-memory dict under a short lock with no
+disk I/O; journal writes happen after the lock is released. The state is written to scores.json as one atomic snapshot per
+grading cycle (or on a timer when ``grading.flush_interval_seconds`` is set),
+and routes in main.py read straight from memory. When a ScoreJournal is
+attached every result is also appended to it, so scores survive restarts.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict
+
+import metrics
+
+
+# Errors are stored truncated so a journal record stays small no matter how
+# much output a failing service produced.
+MAX_ERROR_LENGTH = 512
+
+
+class ScoreStore:
+    """Holds the live scores and persists coalesced snapshots to disk."""
+
+    def __init__(self, path: str = "scores.json", journal=None):
+        self.path = path
+        self.journal = journal
+        self._lock = threading.Lock()
+        # Serializes snapshot writes so two flushes never race on the tmp file
+        self._flush_lock = threading.Lock()
+        self._scores: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._version = 0
+        # Number of results applied over the life of the competition
+        self._seq = 0
+        self._flushed_version = 0
+        self._flusher = None
+        self._listeners = []
+        self._reset_listeners = []
+
+    @property
+    def version(self) -> int:
+        """Monotonic counter bumped on every change to the scores."""
+        return self._version
+
+    @property
+    def seq(self) -> int:
+        """Sequence number of the last applied result."""
+        return self._seq
+
+    def attach_journal(self, journal):
+        """Append every future result to ``journal``."""
+        if journal is not None:
+            with self._lock:
+                journal.start(self._seq)
+        self.journal = journal
+
+    def add_listener(self, listener):
+        """Call ``listener(team, subject, cell)`` after every applied result."""
+        self._listeners.append(listener)
+
+    def add_reset_listener(self, listener):
+        """Call ``listener(scores)`` with a full copy after a load or reset."""
+        self._reset_listeners.append(listener)
+
+    def _notify_reset(self):
+        if not self._reset_listeners:
+            return
+        scores = self.snapshot()
+        for listener in self._reset_listeners:
+            try:
+                listener(scores)
+            except Exception as err:
+                print("Score reset listener failed:", repr(err))
+
+    def load(self, initial: Dict[str, Dict[str, Dict[str, Any]]]):
+        """
+        Recover scores from the journal (or scores.json when there is no
+        journal yet), falling back to ``initial`` if nothing valid is on
+        disk. Cells missing from the recovered state are filled in from
+        ``initial`` so newly added teams or services show up as not tested.
+        """
+        data = {}
+        seq = 0
+        if self.journal is not None and self.journal.exists():
+            data, seq = self.journal.recover()
+        else:
+            try:
+                with open(self.path, "r") as score_file:
+                    data = json.load(score_file)
+                if not isinstance(data, dict):
+                    data = {}
+            except (FileNotFoundError, json.JSONDecodeError):
+                data = {}
+
+        scores = {}
+        for team, cells in initial.items():
+            scores[team] = {key: dict(cell) for key, cell in cells.items()}
+        for team, cells in data.items():
+            if not isinstance(cells, dict):
+                continue
+            team_scores = scores.setdefault(team, {})
+            for key, cell in cells.items():
+                if isinstance(cell, dict):
+                    team_scores[key] = {
+                        "error": cell.get("error", "Not tested"),
+                        "score": cell.get("score", 0),
+                    }
+
+        with self._lock:
+            self._scores = scores
+            self._seq = seq
+            self._version += 1
+            if self.journal is not None:
+                self.journal.start(seq)
+        self.flush(force=True, compact=self.journal is not None)
+        self._notify_reset()
+
+    def reset(self, initial: Dict[str, Dict[str, Dict[str, Any]]]):
+        """Replace all scores with ``initial`` and persist immediately."""
+        scores = {}
+        for team, cells in initial.items():
+            scores[team] = {key: dict(cell) for key, cell in cells.items()}
+        with self._lock:
+            self._scores = scores
+            self._version += 1
+        self.flush(force=True, compact=self.journal is not None)
+        self._notify_reset()
+
+    def apply(self, team: str, subject: str, error: str, points: int) -> Dict[str, Any]:
+        """Record one check result in memory and return the updated cell."""
+        error = str(error)[:MAX_ERROR_LENGTH]
+        wait_started = time.perf_counter()
+        with self._lock:
+            acquired = time.perf_counter()
+            team_scores = self._scores.setdefault(team, {})
+            cell = team_scores.get(subject)
+            if cell is None:
+                cell = team_scores[subject] = {"error": "Not tested", "score": 0}
+            cell["score"] = cell.get("score", 0) + points
+            cell["error"] = error
+            self._seq += 1
+            self._version += 1
+            seq = self._seq
+            journal = self.journal
+            cell = dict(cell)
+            released = time.perf_counter()
+        metrics.LOCK_WAIT.observe(acquired - wait_started, "score_store")
+        metrics.LOCK_HOLD.observe(released - acquired, "score_store")
+
+        # Written outside the lock; the journal puts records back in seq order
+        if journal is not None:
+            journal.append(seq, team, subject, points, error)
+
+        for listener in self._listeners:
+            try:
+                listener(team, subject, cell)
+            except Exception as err:
+                print("Score listener failed:", repr(err))
+        return cell
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Return a copy of all scores that is safe to serialize or mutate."""
+        with self._lock:
+            return {
+                team: {key: dict(cell) for key, cell in cells.items()}
+                for team, cells in self._scores.items()
+            }
+
+    def get_team(self, team: str) -> Dict[str, Dict[str, Any]]:
+        """Return a copy of a single team's scores."""
+        with self._lock:
+            cells = self._scores.get(team, {})
+            return {key: dict(cell) for key, cell in cells.items()}
+
+    def flush(self, force: bool = False, compact: bool = False) -> bool:
+        """
+        Write the current state to disk if it changed since the last flush,
+        compacting the journal once enough records have accumulated.
+        Returns True when a snapshot was written.
+        """
+        started = time.perf_counter()
+        with self._flush_lock:
+            journal = self.journal
+            if journal is not None:
+                journal.sync()
+                compact = compact or journal.needs_compaction()
+            with self._lock:
+                version = self._version
+                if not force and not compact and version == self._flushed_version:
+                    return False
+                seq = self._seq
+                scores = {
+                    team: {key: dict(cell) for key, cell in cells.items()}
+                    for team, cells in self._scores.items()
+                }
+
+            if journal is not None and compact:
+                # Records after seq belong to the next snapshot
+                journal.rotate(seq)
+                journal.write_snapshot(scores, seq)
+
+            # Write atomically by writing to a temp file and renaming.
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as score_file:
+                json.dump(scores, score_file)
+            os.replace(tmp_path, self.path)
+            self._flushed_version = version
+        metrics.SCORE_FLUSH.observe(time.perf_counter() - started)
+        return True
+
+    def start_flusher(self, interval: float):
+        """Flush in the background every ``interval`` seconds."""
+        if self._flusher is not None:
+            return
+
+        def flush_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush()
+                except Exception as err:
+                    print("Failed to flush scores:", repr(err))
+
+        self._flusher = threading.Thread(target=flush_loop, daemon=True)
+        self._flusher.start()
+
+
+# Singleton instance
+_score_store = None
+
+def get_score_store(path: str = "scores.json") -> ScoreStore:
+    """Get or create the singleton ScoreStore instance."""
+    global _score_store
+    if _score_store is None:
+        _score_store = ScoreStore(path)
+    return _score_store
@@ -0,0 +1,150 @@
+"""
+Pool of source addresses for outgoing probes.
+
+The engine used to give eth0 a new random address at the start of every
+cycle, which ran a shell command, cut off connections in flight and moved
+every probe to the same address. Instead, a fixed pool of local addresses
+is configured once at startup and each new probe connection binds to the
+next address from it, round-robin or at random.
+
+Pool addresses must already be assigned to an interface (e.g.
+``ip addr add 10.0.0.7/24 dev eth0``); any that can't be bound at startup
+are reported and left out. On Linux all of 127.0.0.0/8 is local, so a pool
+like ``127.0.0.2-127.0.0.9`` works for testing without adding aliases.
+With no pool the kernel picks the source address as usual.
+"""
+
+import ipaddress
+import itertools
+import random
+import socket
+import threading
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+
+STRATEGIES = ("round_robin", "random")
+# Largest pool a range or network may expand to
+MAX_ADDRESSES = 4096
+
+
+def parse_addresses(entries: Iterable[str]) -> List[str]:
+    """
+    Expand pool entries into addresses. An entry is an address
+    (``10.0.0.5``), a network (``10.0.0.0/28``, its host addresses) or an
+    inclusive range (``10.0.0.2-10.0.0.20``). Raises ValueError.
+    """
+    addresses: List[str] = []
+    for entry in entries:
+        entry = str(entry).strip()
+        if "-" in entry:
+            first, last = (ipaddress.ip_address(part.strip()) for part in entry.split("-", 1))
+            if first.version != last.version or last < first:
+                raise ValueError(f"Invalid source address range {entry}")
+            count = int(last) - int(first) + 1
+            if count > MAX_ADDRESSES:
+                raise ValueError(f"Source address range {entry} has more than {MAX_ADDRESSES} addresses")
+            addresses.extend(str(first + offset) for offset in range(count))
+        elif "/" in entry:
+            network = ipaddress.ip_network(entry, strict=False)
+            if network.num_addresses > MAX_ADDRESSES:
+                raise ValueError(f"Source network {entry} has more than {MAX_ADDRESSES} addresses")
+            hosts = list(network.hosts()) or [network.network_address]
+            addresses.extend(str(address) for address in hosts)
+        else:
+            addresses.append(str(ipaddress.ip_address(entry)))
+    # Keep the configured order, without duplicates
+    return list(dict.fromkeys(addresses))
+
+
+def _bindable(address: str) -> bool:
+    family = socket.AF_INET6 if ":" in address else socket.AF_INET
+    try:
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.bind((address, 0))
+        return True
+    except OSError:
+        return False
+
+
+class SourceAddressPool:
+    """Hands out local source addresses for probe sockets."""
+
+    def __init__(self, addresses: Sequence[str] = (), strategy: str = "round_robin"):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown source address strategy {strategy!r}; expected one of {STRATEGIES}")
+        self.addresses: Tuple[str, ...] = tuple(addresses)
+        self.strategy = strategy
+        self._lock = threading.Lock()
+        self._cycle = itertools.cycle(self.addresses)
+
+    @classmethod
+    def from_config(cls, config_loader) -> Optional["SourceAddressPool"]:
+        """
+        A pool from ``source_addresses`` in master_config.json, keeping only
+        addresses this machine can bind, or None if none are configured.
+        """
+        settings = config_loader.get_source_addresses_config()
+        return cls.from_entries(settings.get('addresses', []), settings.get('strategy', 'round_robin'))
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[str], strategy: str = "round_robin") -> Optional["SourceAddressPool"]:
+        """A pool from address, network and range entries; see parse_addresses."""
+        addresses = parse_addresses(entries)
+        if not addresses:
+            return None
+        usable = [address for address in addresses if _bindable(address)]
+        if len(usable) < len(addresses):
+            skipped = [address for address in addresses if address not in set(usable)]
+            print(f"Skipping {len(skipped)} source address(es) not assigned to this machine:",
+                  ", ".join(skipped[:10]) + (" ..." if len(skipped) > 10 else ""))
+        if not usable:
+            print("No usable source addresses; probes will use the default route's address")
+            return None
+        print(f"Probes will use {len(usable)} source address(es) ({strategy})")
+        return cls(usable, strategy)
+
+    def next(self) -> Optional[str]:
+        """The source address for the next connection, or None for the kernel's choice."""
+        if not self.addresses:
+            return None
+        if self.strategy == "random":
+            return random.choice(self.addresses)
+        with self._lock:
+            return next(self._cycle)
+
+    def bind_address(self) -> Optional[Tuple[str, int]]:
+        """``(address, 0)`` for socket.create_connection's ``source_address``."""
+        address = self.next()
+        return (address, 0) if address else None
+
+    def connect(self, address: Tuple[str, int], timeout: Optional[float] = None) -> socket.socket:
+        """socket.create_connection from the next source address."""
+        return socket.create_connection(address, timeout=timeout, source_address=self.bind_address())
+
+    def udp_socket(self) -> socket.socket:
+        """An IPv4 UDP socket bound to the next source address."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        address = self.next()
+        if address:
+            try:
+                sock.bind((address, 0))
+            except OSError:
+                sock.close()
+                raise
+        return sock
+
+
+# Singleton instance; without configure_source_pool() probes are not bound
+_source_pool = SourceAddressPool()
+_source_pool_lock = threading.Lock()
+
+def configure_source_pool(pool: Optional[SourceAddressPool]) -> SourceAddressPool:
+    """Install the process-wide pool once at startup (None clears it)."""
+    global _source_pool
+    with _source_pool_lock:
+        _source_pool = pool if pool is not None else SourceAddressPool()
+        return _source_pool
+
+def get_source_pool() -> SourceAddressPool:
+    """Get the shared SourceAddressPool instance."""
+    return _source_pool
@@ -0,0 +1,158 @@
+"""
+Persistent SSH transport pool for SSH service checks.
+
+Building a new paramiko.SSHClient per check pays for a full key exchange
+and password authentication every cycle. The pool instead keeps one
+authenticated transport per (host, port) across cycles and checks liveness
+by opening a channel and running the check command on it. A transport is
+only rebuilt when it dies or when the team's credentials change.
+"""
+
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+
+import paramiko
+
+from source_addresses import get_source_pool
+
+
+DEFAULT_MAX_OUTPUT = 4096
+
+
+def _credential_fingerprint(username: str, password: str) -> str:
+    # Only a digest is kept alongside the transport
+    return hashlib.sha256(f"{username}\0{password}".encode("utf-8")).hexdigest()
+
+
+class _PooledTransport:
+    """An authenticated transport and the credentials it was opened with."""
+
+    def __init__(self):
+        # Serializes checks against one host so a reconnect happens once
+        self.lock = threading.Lock()
+        self.transport: Optional[paramiko.Transport] = None
+        self.fingerprint: Optional[str] = None
+
+    def close(self):
+        if self.transport is not None:
+            try:
+                self.transport.close()
+            except Exception:
+                pass
+        self.transport = None
+        self.fingerprint = None
+
+
+class SSHPool:
+    """Keeps authenticated SSH transports alive between checks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, int], _PooledTransport] = {}
+
+    def _entry(self, ip: str, port: int) -> _PooledTransport:
+        with self._lock:
+            entry = self._entries.get((ip, port))
+            if entry is None:
+                entry = self._entries[(ip, port)] = _PooledTransport()
+            return entry
+
+    @staticmethod
+    def _connect(ip: str, port: int, username: str, password: str,
+                 timeout: float) -> paramiko.Transport:
+        sock = get_source_pool().connect((ip, port), timeout=timeout)
+        transport = paramiko.Transport(sock)
+        try:
+            transport.banner_timeout = timeout
+            transport.start_client(timeout=timeout)
+            transport.auth_password(username, password)
+            if not transport.is_authenticated():
+                raise paramiko.AuthenticationException("Authentication failed.")
+            # Keep NAT/conntrack state alive between cycles
+            transport.set_keepalive(30)
+        except Exception:
+            transport.close()
+            raise
+        return transport
+
+    @staticmethod
+    def _read_capped(recv, limit: int) -> bytes:
+        data = b""
+        while len(data) < limit:
+            chunk = recv(min(4096, limit - len(data)))
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def _exec(self, transport: paramiko.Transport, command: str, timeout: float,
+              max_output: int) -> Tuple[str, str]:
+        channel = transport.open_session(timeout=timeout)
+        try:
+            channel.settimeout(timeout)
+            channel.exec_command(command)
+            output = self._read_capped(channel.recv, max_output)
+            if len(output) >= max_output:
+                # Output was capped; the command may still be writing, so
+                # don't wait for it to finish before looking at stderr.
+                error = channel.recv_stderr(max_output) if channel.recv_stderr_ready() else b""
+            else:
+                error = self._read_capped(channel.recv_stderr, max_output)
+        finally:
+            channel.close()
+        return output.decode(errors="replace"), error.decode(errors="replace")
+
+    def run(self, ip: str, port: int, username: str, password: str, command: str,
+            timeout: float = 20, max_output: int = DEFAULT_MAX_OUTPUT) -> Tuple[bool, str]:
+        """
+        Run ``command`` over a pooled transport. Returns ``(ok, output)`` or
+        ``(False, error)`` in the same form as Services.ssh_connection.
+        """
+        entry = self._entry(ip, port)
+        fingerprint = _credential_fingerprint(username, password)
+        with entry.lock:
+            if entry.fingerprint != fingerprint:
+                # Credentials changed in team_configs.json; re-authenticate
+                entry.close()
+
+            # A pooled transport may have died since the last check; if
+            # opening a channel on it fails, reconnect once and retry.
+            for attempt in range(2):
+                reused = entry.transport is not None and entry.transport.is_active()
+                try:
+                    if not reused:
+                        entry.close()
+                        entry.transport = self._connect(ip, port, username, password, timeout)
+                        entry.fingerprint = fingerprint
+                    output, error = self._exec(entry.transport, command, timeout, max_output)
+                except (paramiko.SSHException, EOFError, OSError) as e:
+                    entry.close()
+                    if reused and attempt == 0 and not isinstance(e, paramiko.AuthenticationException):
+                        continue
+                    return (False, str(e))
+                if error:
+                    return (False, error)
+                return (True, output)
+        return (False, "SSH check failed")
+
+    def close_all(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            with entry.lock:
+                entry.close()
+
+
+# Singleton instance
+_ssh_pool = None
+_ssh_pool_lock = threading.Lock()
+
+def get_ssh_pool() -> SSHPool:
+    """Get or create the shared SSHPool instance."""
+    global _ssh_pool
+    with _ssh_pool_lock:
+        if _ssh_pool is None:
+            _ssh_pool = SSHPool()
+        return _ssh_pool
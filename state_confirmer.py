@@ -0,0 +1,52 @@
+"""
+Confirmation of check state changes before they are scored.
+
+A single dropped packet or slow response should not flip a cell from up to
+down (or back). Each (team, score_key) cell remembers its confirmed state;
+a result that disagrees with it is held back until ``confirm_count``
+results in a row agree, and only then scored. A held result scores nothing
+and leaves the cell as it was. A result matching the confirmed state is
+scored as usual and drops any unconfirmed streak.
+
+The fixed-rate scheduler rechecks cells with a pending change after
+``recheck_seconds`` instead of waiting for their next slot, so a flip is
+confirmed within a few seconds while steady cells keep their normal cadence.
+In cycle mode the grader reruns them at the end of each cycle.
+"""
+
+import threading
+from typing import Dict, List, Tuple
+
+
+class StateConfirmer:
+    """Tracks confirmed up/down states and unconfirmed streaks per cell."""
+
+    def __init__(self, confirm_count: int = 1):
+        self.confirm_count = max(1, int(confirm_count))
+        self._lock = threading.Lock()
+        # (team, score_key) -> [confirmed ok or None, results in a row against it]
+        self._cells: Dict[Tuple[str, str], List] = {}
+
+    def observe(self, team: str, score_key: str, ok: bool) -> bool:
+        """Add one result; True if it should be scored."""
+        with self._lock:
+            cell = self._cells.get((team, score_key))
+            if cell is None:
+                # Nothing confirmed yet; the first result sets the state
+                self._cells[(team, score_key)] = [ok, 0]
+                return True
+            if ok == cell[0]:
+                cell[1] = 0
+                return True
+            cell[1] += 1
+            if cell[1] < self.confirm_count:
+                return False
+            cell[0] = ok
+            cell[1] = 0
+            return True
+
+    def pending(self, team: str, score_key: str) -> bool:
+        """True if the cell has an unconfirmed change waiting for more results."""
+        with self._lock:
+            cell = self._cells.get((team, score_key))
+            return cell is not None and cell[1] > 0
@@ -1,4 +1,4 @@
-// Render a teams x systems status table and update it on 'scores' socket events.
+// Render a teams x systems status table and update it from the score delta stream.
 (function () {
   const socket = io();
 
@@ -108,6 +108,21 @@
     container.appendChild(table);
   }
 
+  function setCellStatus(td, err) {
+    if (err === 'Success') {
+      td.className = 'ok';
+      td.textContent = 'OK';
+    } else if (err === 'Not tested') {
+      td.className = 'unknown';
+      td.textContent = 'Not tested';
+    } else {
+      // Hide error details on front page; just show FAIL without tooltip
+      td.className = 'fail';
+      td.textContent = 'FAIL';
+    }
+    td.removeAttribute('title');
+  }
+
   function updateTableFromScores(scores) {
     // If table doesn't exist yet, build it
     const container = document.getElementById('tableContainer');
@@ -128,48 +143,53 @@
         const svcObj = scores[team] && scores[team][svc];
         const err = svcObj ? svcObj.error : 'Not tested';
         if (!td) return;
-        if (err === 'Success') {
-          td.className = 'ok';
-          td.textContent = 'OK';
-          td.removeAttribute('title');
-        } else if (err === 'Not tested') {
-          td.className = 'unknown';
-          td.textContent = 'Not tested';
-          td.removeAttribute('title');
-        } else {
-          // Hide error details on front page; just show FAIL without tooltip
-          td.className = 'fail';
-          td.textContent = 'FAIL';
-          td.removeAttribute('title');
-        }
+        setCellStatus(td, err);
       });
     });
   }
 
-  // On connect receive initial scores through socket as in leaderboard.js
-  socket.on('scores', function (scores) {
-    try {
-      // If no table exists, build it; else update
-      updateTableFromScores(scores);
-    } catch (err) {
-      console.error('Error updating table from scores', err);
-      if (window.AppNotice) AppNotice.error('Failed to update leaderboard table from scores.');
+  // Only touch the cells named in a delta
+  function updateTableFromChanges(scores, changes) {
+    const container = document.getElementById('tableContainer');
+    if (!container) return;
+    if (!container.querySelector('table')) {
+      makeTable(scores);
+      return;
+    }
+    for (const change of changes) {
+      const team = change[0];
+      const svc = change[1];
+      const td = container.querySelector(`td[data-team="${team}"][data-service="${svc}"]`);
+      if (!td) {
+        // A team or service we haven't drawn yet; rebuild once
+        makeTable(scores);
+        return;
+      }
+      setCellStatus(td, change[3]);
+    }
+  }
+
+  const stream = ScoreStream.subscribe(socket, {
+    onFull: function (scores) {
+      try {
+        updateTableFromScores(scores);
+      } catch (err) {
+        console.error('Error updating table from scores', err);
+        if (window.AppNotice) AppNotice.error('Failed to update leaderboard table from scores.');
+      }
+    },
+    onDelta: function (scores, changes) {
+      try {
+        updateTableFromChanges(scores, changes);
+      } catch (err) {
+        console.error('Error updating table from score changes', err);
+        if (window.AppNotice) AppNotice.error('Failed to update leaderboard table from scores.');
+      }
     }
   });
 
   socket.on('connect', function () {
     console.log('Connected to scoreboard socket');
-    // Also attempt a one-time fetch of scores.json for environments where
-    // the socket event might not arrive (e.g., static preview).
-    fetch('/scores.json').then(r => {
-      if (!r.ok) return null;
-      return r.json();
-    }).then(data => {
-      if (data) updateTableFromScores(data);
-    }).catch((e) => {
-      console.warn('Initial scores fetch failed', e);
-      if (window.AppNotice) AppNotice.warn('Could not load initial scores. Waiting for live updates...');
-    });
   });
 
   socket.on('disconnect', function (){
@@ -178,13 +198,21 @@
 
   // Initialize by loading systems config first
   loadSystemsConfig().then(() => {
-    // Try to fetch initial scores
+    // Draw with whatever the socket sync delivered while we were loading,
+    // or fetch scores.json if the socket hasn't synced yet (e.g. static preview).
+    if (stream.synced()) {
+      makeTable(stream.scores());
+      return;
+    }
     fetch('/scores.json').then(r => {
       if (!r.ok) return null;
       return r.json();
     }).then(data => {
-      if (data) updateTableFromScores(data);
-    }).catch(() => {});
+      if (data && !stream.synced()) updateTableFromScores(data);
+    }).catch((e) => {
+      console.warn('Initial scores fetch failed', e);
+      if (window.AppNotice) AppNotice.warn('Could not load initial scores. Waiting for live updates...');
+    });
   });
 
 })();
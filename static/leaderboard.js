@@ -1,5 +1,6 @@
-// Connect to Socket.IO server and render a stacked vertical bar chart
-// Expects a `scores` object like: { team1: { ubuntu1ping: {score: 0}, ... }, team2: {...} }
+// Connect to Socket.IO server and render a stacked vertical bar chart in rank
+// order, plus a rank table. Ranks come from /api/leaderboard; bar heights come
+// from a `scores` object like: { team1: { ubuntu1ping: {score: 0}, ... }, team2: {...} }
 
 (function () {
   // Load socket.io from the default namespace
@@ -89,17 +90,103 @@
     leaderboardChart = new Chart(ctx, chartConfig);
   }
 
+  // Ranks and totals are maintained by the server (/api/leaderboard plus
+  // 'leaderboardDelta' events); the score stream only fills in the bars.
+  let ranking = {};       // team -> { rank, total, name }
+  let rankVersion = null; // leaderboard version the ranking reflects
+  let teamOrder = [];     // team ids in rank order (chart columns)
+  let teamIndex = {};     // team -> column
+  let rankRequest = null;
+
+  function loadRanking() {
+    if (rankRequest) return rankRequest;
+    rankRequest = (async function () {
+      const teams = [];
+      let version = 0;
+      let offset = 0;
+      let totalTeams = 1;
+      while (offset < totalTeams) {
+        const res = await fetch(`/api/leaderboard?offset=${offset}&limit=500`);
+        if (!res.ok) throw new Error('Failed to load leaderboard');
+        const page = await res.json();
+        version = page.version;
+        totalTeams = page.total_teams;
+        if (!page.teams.length) break;
+        teams.push(...page.teams);
+        offset += page.teams.length;
+      }
+      ranking = {};
+      teams.forEach(entry => {
+        ranking[entry.team] = { rank: entry.rank, total: entry.total, name: entry.name };
+      });
+      rankVersion = version;
+      applyOrder();
+    })().catch(err => {
+      console.error('Failed to load leaderboard', err);
+      if (window.AppNotice) AppNotice.error('Failed to load leaderboard ranks.');
+    }).finally(() => { rankRequest = null; });
+    return rankRequest;
+  }
+
+  function applyOrder() {
+    teamOrder = Object.keys(ranking).sort((a, b) =>
+      ranking[a].rank - ranking[b].rank || (a < b ? -1 : a > b ? 1 : 0));
+    teamIndex = {};
+    teamOrder.forEach((team, idx) => { teamIndex[team] = idx; });
+    renderRankTable();
+    if (stream.synced()) updateChartFromScores(stream.scores());
+  }
+
+  function renderRankTable() {
+    const body = document.getElementById('rankTable');
+    if (!body) return;
+    const rows = document.createDocumentFragment();
+    teamOrder.forEach(team => {
+      const entry = ranking[team];
+      const row = document.createElement('tr');
+      [entry.rank, entry.name, entry.total].forEach(value => {
+        const cell = document.createElement('td');
+        cell.textContent = value;
+        row.appendChild(cell);
+      });
+      rows.appendChild(row);
+    });
+    body.replaceChildren(rows);
+  }
+
+  socket.on('leaderboardDelta', function (payload) {
+    // Ignore events already covered by the ranking we fetched
+    if (rankVersion === null || !payload || payload.version <= rankVersion) return;
+    rankVersion = payload.version;
+    let reorder = false;
+    (payload.removed || []).forEach(team => {
+      delete ranking[team];
+      reorder = true;
+    });
+    (payload.teams || []).forEach(change => {
+      const [team, rank, total] = change;
+      const entry = ranking[team];
+      if (!entry) {
+        ranking[team] = { rank: rank, total: total, name: team };
+        reorder = true;
+        return;
+      }
+      if (entry.rank !== rank) reorder = true;
+      entry.rank = rank;
+      entry.total = total;
+    });
+    if (reorder) applyOrder();
+    else renderRankTable();
+  });
+
+  // Redraw every bar; only needed when the column order changes
   function updateChartFromScores(scores) {
     if (!leaderboardChart) return;
-    
-    // teams sorted by name
-    const teams = Object.keys(scores).sort();
 
-    // Reset labels and data
-    leaderboardChart.data.labels = teams;
+    leaderboardChart.data.labels = teamOrder.map(team => ranking[team].name);
     leaderboardChart.data.datasets.forEach(ds => ds.data = []);
 
-    teams.forEach(team => {
+    teamOrder.forEach(team => {
       serviceOrder.forEach((svc, idx) => {
         const scoreObj = scores[team] ? scores[team][svc] : null;
         const pts = scoreObj ? (scoreObj.score || 0) : 0;
@@ -110,37 +197,51 @@
     leaderboardChart.update();
   }
 
-  // Receive initial scores on connect (server emits when a client connects)
-  socket.on('scores', function (scores) {
-    console.log('Received scores update', scores);
-    try {
-      updateChartFromScores(scores);
-    } catch (err) {
-      console.error('Error updating chart from scores', err);
-      if (window.AppNotice) AppNotice.error('Failed to update leaderboard chart from scores.');
+  // Move only the bars that changed
+  function updateChartFromChanges(changes) {
+    if (!leaderboardChart) return;
+    changes.forEach(change => {
+      const column = teamIndex[change[0]];
+      const idx = serviceOrder.indexOf(change[1]);
+      if (column === undefined || idx < 0) return;
+      leaderboardChart.data.datasets[idx].data[column] = change[2] || 0;
+    });
+    leaderboardChart.update('none');
+  }
+
+  // Full scoreboard on connect, then only the changed cells
+  const stream = ScoreStream.subscribe(socket, {
+    onFull: function (scores) {
+      try {
+        updateChartFromScores(scores);
+      } catch (err) {
+        console.error('Error updating chart from scores', err);
+        if (window.AppNotice) AppNotice.error('Failed to update leaderboard chart from scores.');
+      }
+    },
+    onDelta: function (scores, changes) {
+      try {
+        updateChartFromChanges(changes);
+      } catch (err) {
+        console.error('Error updating chart from scores', err);
+      }
     }
   });
 
-  // Also listen for live broadcasts that update scores
-  // (same event name used by server)
   socket.on('connect', function () {
     console.log('Connected to scoreboard socket');
+    // Rank events may have been missed while disconnected
+    if (leaderboardChart) loadRanking();
   });
 
   socket.on('disconnect', function (){
     if (window.AppNotice) AppNotice.warn('Disconnected from live updates. Attempting to reconnect...');
   });
 
-  // Initialize by loading systems config and building chart
+  // Initialize by loading systems config, building the chart and fetching ranks
   loadSystemsConfig().then(() => {
     initChart();
-    // Try to fetch initial scores
-    fetch('/scores.json').then(r => {
-      if (!r.ok) return null;
-      return r.json();
-    }).then(data => {
-      if (data) updateChartFromScores(data);
-    }).catch(() => {});
+    return loadRanking();
   });
 
 })();
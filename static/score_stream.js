@@ -0,0 +1,85 @@
+// Keep a local copy of the scores in sync with the server's delta stream.
+// The server sends 'scoresSync' ({seq, scores}) on connect and numbered
+// 'scoresDelta' events ({seq, changes: [[team, key, score, status], ...]})
+// afterwards. If a delta arrives out of sequence we ask for a full resync.
+//
+// The public stream carries statuses ('Success', 'Not tested', 'Failed')
+// rather than error text, and may arrive as packed binary deltas (see
+// score_broadcaster.py). Pass {channel: 'team'} to follow the logged-in
+// team's own stream ('teamScoresSync' / 'teamScoresDelta') with full errors.
+(function () {
+  const STATUSES = ['Not tested', 'Success', 'Failed'];
+  const RECORD_BYTES = 9;
+
+  // Unpack a binary public delta using the cell table from the last sync
+  function decodeBinary(buffer, cells) {
+    const view = new DataView(buffer instanceof ArrayBuffer ? buffer : buffer.buffer,
+      buffer.byteOffset || 0, buffer.byteLength);
+    const changes = [];
+    for (let offset = 4; offset + RECORD_BYTES <= view.byteLength; offset += RECORD_BYTES) {
+      const cell = cells[view.getUint32(offset, true)];
+      // A cell added after our sync; the caller resyncs
+      if (!cell) return { seq: view.getUint32(0, true), changes: null };
+      changes.push([cell[0], cell[1], view.getInt32(offset + 4, true),
+        STATUSES[view.getUint8(offset + 8)]]);
+    }
+    return { seq: view.getUint32(0, true), changes: changes };
+  }
+
+  function subscribe(socket, handlers, options) {
+    const team = options && options.channel === 'team';
+    const syncEvent = team ? 'teamScoresSync' : 'scoresSync';
+    const deltaEvent = team ? 'teamScoresDelta' : 'scoresDelta';
+    let scores = {};
+    let seq = null;
+    let cells = [];
+
+    function resync() {
+      seq = null;
+      socket.emit('resync', team ? { channel: 'team' } : undefined);
+    }
+
+    socket.on(syncEvent, function (payload) {
+      scores = (payload && payload.scores) || {};
+      seq = payload && typeof payload.seq === 'number' ? payload.seq : 0;
+      cells = (payload && payload.cells) || [];
+      if (handlers.onFull) handlers.onFull(scores);
+    });
+
+    socket.on(deltaEvent, function (payload) {
+      // Still waiting for the initial sync (or a requested resync)
+      if (seq === null || !payload) return;
+      if (payload instanceof ArrayBuffer || ArrayBuffer.isView(payload)) {
+        payload = decodeBinary(payload, cells);
+      }
+      // Already covered by the snapshot we have
+      if (payload.seq <= seq) return;
+      if (payload.seq !== seq + 1 || !payload.changes) {
+        resync();
+        return;
+      }
+      seq = payload.seq;
+      const changes = payload.changes;
+      changes.forEach(function (change) {
+        const team = change[0];
+        const key = change[1];
+        if (!scores[team]) scores[team] = {};
+        scores[team][key] = { score: change[2], error: change[3] };
+      });
+      if (handlers.onDelta) handlers.onDelta(scores, changes);
+      else if (handlers.onFull) handlers.onFull(scores);
+    });
+
+    socket.on('disconnect', function () {
+      // The server sends a fresh sync when we reconnect
+      seq = null;
+    });
+
+    return {
+      scores: function () { return scores; },
+      synced: function () { return seq !== null; }
+    };
+  }
+
+  window.ScoreStream = { subscribe: subscribe };
+})();
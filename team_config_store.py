@@ -0,0 +1,148 @@
+"""
+Versioned in-memory store for team_configs.json.
+
+Teams edit their credentials and ports through /api/team-configs while
+grading is running. Edits are applied copy-on-write: every update swaps in a
+new top-level mapping and bumps the version, and the mapping a grading cycle
+took at its start is never modified. The grader reads configs from memory
+only; a background writer persists the latest version to disk atomically.
+"""
+
+import copy
+import json
+import os
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+
+class TeamConfigStore:
+    """Holds every team's config and persists changes in the background."""
+
+    def __init__(self, path: str = "team_configs.json"):
+        self.path = path
+        self._lock = threading.Lock()
+        # Never mutated after being published; updates replace it
+        self._configs: Mapping[str, Dict[str, Any]] = MappingProxyType({})
+        self._version = 0
+        self._saved_version = 0
+        self._dirty = threading.Condition(threading.Lock())
+        # Serializes writes so two saves never race on the tmp file
+        self._write_lock = threading.Lock()
+        self._writer = None
+
+    @property
+    def version(self) -> int:
+        """Bumped on every change to any team's config."""
+        return self._version
+
+    def load(self, defaults: Dict[str, Dict[str, Any]]):
+        """
+        Load team_configs.json, falling back to ``defaults`` when it is
+        missing or invalid. Teams and systems missing from the file are
+        filled in from ``defaults``.
+        """
+        try:
+            with open(self.path, "r") as config_file:
+                data = json.load(config_file)
+            if not isinstance(data, dict):
+                data = {}
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+
+        configs = {}
+        for team_id, systems in defaults.items():
+            team = copy.deepcopy(systems)
+            team.update(data.get(team_id, {}))
+            configs[team_id] = team
+        # Keep teams that are no longer in master_config.json
+        for team_id, systems in data.items():
+            configs.setdefault(team_id, systems)
+
+        with self._lock:
+            self._configs = MappingProxyType(configs)
+            self._version += 1
+            # Only write the file back if we had to fill something in
+            if configs == data:
+                self._saved_version = self._version
+                return
+        self._schedule_save()
+
+    def snapshot(self) -> Tuple[int, Mapping[str, Dict[str, Any]]]:
+        """
+        Return ``(version, configs)``. The mapping is immutable and stays
+        unchanged by later updates, so it is safe to hold for a whole cycle.
+        Treat the nested dicts as read-only.
+        """
+        with self._lock:
+            return self._version, self._configs
+
+    def get_team(self, team_id: str) -> Dict[str, Any]:
+        """Return a copy of one team's config (empty if unknown)."""
+        _, configs = self.snapshot()
+        return copy.deepcopy(configs.get(team_id, {}))
+
+    def update_team(self, team_id: str, team_config: Dict[str, Any]) -> int:
+        """
+        Replace one team's config and schedule a save. Returns the new
+        version. Never waits on grading or disk I/O.
+        """
+        # Copy so later changes by the caller can't leak into snapshots
+        team_config = copy.deepcopy(team_config)
+        with self._lock:
+            configs = dict(self._configs)
+            configs[team_id] = team_config
+            self._configs = MappingProxyType(configs)
+            self._version += 1
+            version = self._version
+        self._schedule_save()
+        return version
+
+    def _schedule_save(self):
+        with self._dirty:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+                self._writer.start()
+            self._dirty.notify()
+
+    def _writer_loop(self):
+        while True:
+            with self._dirty:
+                while self._saved_version == self._version:
+                    self._dirty.wait()
+            try:
+                self.save()
+            except Exception as err:
+                print("Failed to save team configs:", repr(err))
+                # Don't spin on a persistent error; retry on the next update
+                with self._dirty:
+                    self._dirty.wait(5)
+
+    def save(self, force: bool = False) -> bool:
+        """
+        Write the current configs to disk atomically. Returns True if a
+        file was written; unchanged configs are skipped unless ``force``.
+        """
+        with self._write_lock:
+            version, configs = self.snapshot()
+            if not force and version == self._saved_version:
+                return False
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as config_file:
+                json.dump(dict(configs), config_file, indent=2)
+            os.replace(tmp_path, self.path)
+            self._saved_version = version
+            return True
+
+
+# Singleton instance
+_team_config_store: Optional[TeamConfigStore] = None
+_team_config_store_lock = threading.Lock()
+
+def get_team_config_store(path: str = "team_configs.json") -> TeamConfigStore:
+    """Get or create the shared TeamConfigStore instance."""
+    global _team_config_store
+    with _team_config_store_lock:
+        if _team_config_store is None:
+            _team_config_store = TeamConfigStore(path)
+        return _team_config_store
@@ -1,36 +1,40 @@
-import subprocess
-import random
 import paramiko
 import threading
-import requests
 import ldap3
+from icmp_prober import PingResult, get_icmp_prober
+from http_checker import WebCheckResult, get_http_checker
+from ssh_pool import get_ssh_pool
+from ldap_pool import get_ldap_pool
+from source_addresses import get_source_pool
 
 class Services:
     def __init__(self):
-        self.ip = self.rotate_private_ips()
+        # Probes take their source address from the pool in source_addresses.py
         self.grading_cycle_count = 0  # Initialize grading cycle counter
 
-    def rotate_private_ips(self):
-        self.ip = f"10.0.0.{random.randint(2,254)}"
-        subprocess.run(f"ifconfig eth0 {self.ip}", shell=True)
-
     def increment_grading_cycle(self):
         self.grading_cycle_count += 1  # Increment the grading cycle counter
 
-    def ssh_connection(self, username, password, ip, os, port=22):
+    def ssh_connection(self, username, password, ip, os, port=22, timeout=20,
+                       persistent=True, max_output=4096):
+        command = 'dir' if os == "windows" else 'ls'
+        if persistent:
+            # Reuses one authenticated transport per host; see ssh_pool.py
+            try:
+                return get_ssh_pool().run(ip, port, username, password, command,
+                                          timeout=timeout, max_output=max_output)
+            except Exception as e:
+                return (False, str(e))
+
         try:
             client = paramiko.SSHClient()
             client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            client.connect(ip, port=port, username=username, password=password, timeout=20)
+            sock = get_source_pool().connect((ip, port), timeout=timeout)
+            client.connect(ip, port=port, username=username, password=password, timeout=timeout, sock=sock)
 
-            if os == "windows":
-                stdin, stdout, stderr = client.exec_command('dir')
-                output = stdout.read().decode()
-                error = stderr.read().decode()
-            else:
-                stdin, stdout, stderr = client.exec_command('ls')
-                output = stdout.read().decode()
-                error = stderr.read().decode()
+            stdin, stdout, stderr = client.exec_command(command)
+            output = stdout.read(max_output).decode(errors="replace")
+            error = stderr.read(max_output).decode(errors="replace")
             
             client.close()
 
@@ -40,32 +44,46 @@ class Services:
         except Exception as e:
             return (False, str(e))
 
-    def web_request(self, url):
+    def web_request(self, url, connect_timeout=5, timeout=20, max_bytes=65536,
+                    expect_substring=None, expect_sha256=None):
+        # Pooled keep-alive sessions and capped reads; see http_checker.py
         try:
-            response = requests.get(url, timeout=20)
-            if response.status_code == 200:
-                return (True, response.text)
-            return (False, response.reason)
+            return get_http_checker().check(
+                url,
+                connect_timeout=connect_timeout,
+                read_timeout=timeout,
+                max_bytes=max_bytes,
+                expect_substring=expect_substring,
+                expect_sha256=expect_sha256,
+            )
         except Exception as e:
-            return (False, str(e))
+            return (False, str(e), WebCheckResult())
 
-    def ping_host(self, ip):
+    def ping_host(self, ip, count=3, timeout=2.0):
+        # All pings share one ICMP socket; see icmp_prober.py
         try:
-            response = subprocess.run(f"ping -c 4 {ip}", stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, timeout=20)
-            if response.returncode == 0:
-                return (True, response.stdout.decode())
-            return (False, response.stderr.decode())
+            result = get_icmp_prober().ping(ip, count=count, timeout=timeout)
         except Exception as e:
-            return (False, str(e))
+            result = PingResult(ip)
+            result.error = str(e)
+        return (bool(result.received), result.summary(), result)
+
+    def active_directory(self, domain, username, password, timeout, port=389, persistent=True):
+        if persistent:
+            # Reuses bound connections and cached DNS; see ldap_pool.py
+            try:
+                return get_ldap_pool().bind(domain, username, password, timeout=timeout, port=port)
+            except Exception as e:
+                return (False, str(e))
 
-    def active_directory(self, domain, username, password, timeout):
         try:
-            server = ldap3.Server(domain, connect_timeout=timeout)
-            conn = ldap3.Connection(server, user=username, password=password)
+            server = ldap3.Server(domain, port=port, connect_timeout=timeout)
+            conn = ldap3.Connection(server, user=username, password=password, receive_timeout=timeout,
+                                    source_address=get_source_pool().next())
             if conn.bind():
                 conn.unbind()
                 return (True, "Authentication successful")
             else:
                 return (False, f"Authentication failed: {conn.result}")
         except Exception as e:
-            return (False, str(e))
\ No newline at end of file
+            return (False, str(e))
@@ -0,0 +1,183 @@
+"""
+Multi-process grading for the scoring engine.
+
+The web server process runs under eventlet, so every check it runs shares
+one OS thread with Flask and Socket.IO. With ``grading.worker_processes``
+set, checks are sent to that many grading_worker.py processes instead. Each
+worker owns a shard of teams (a team always goes to the same worker, so its
+pooled SSH/LDAP/HTTP connections stay in one place) and streams results
+back over its stdout pipe. Results are applied to the ScoreStore here, in
+the process that owns the scores.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grading_worker.py")
+
+
+class _Worker:
+    """One worker process and the checks it hasn't answered yet."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[subprocess.Popen] = None
+        self.write_lock = threading.Lock()
+        # request id -> (spec, callback)
+        self.pending: Dict[int, tuple] = {}
+
+
+class WorkerPool:
+    """Shards checks by team across grading worker processes."""
+
+    def __init__(self, processes: int, on_result: Callable[[Dict[str, Any], bool, str, float], None],
+                 config_path: str = "master_config.json"):
+        self.on_result = on_result
+        self.config_path = config_path
+        self._workers = [_Worker(index) for index in range(max(1, int(processes)))]
+        self._cond = threading.Condition()
+        self._next_id = 0
+        self._in_flight = 0
+        self._stopped = False
+        # team id -> worker index
+        self._shards: Dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, config_loader, on_result) -> "WorkerPool":
+        grading = config_loader.get_grading_config()
+        return cls(grading.get('worker_processes', 1), on_result, config_loader.config_path)
+
+    @property
+    def size(self) -> int:
+        return len(self._workers)
+
+    def shard_for(self, team_id: str) -> int:
+        """
+        Worker index for a team. Teams are dealt out round-robin as they are
+        first seen and keep their worker for the life of the pool.
+        """
+        shard = self._shards.get(team_id)
+        if shard is None:
+            with self._cond:
+                shard = self._shards.setdefault(team_id, len(self._shards) % len(self._workers))
+        return shard
+
+    def _spawn(self, worker: _Worker):
+        # Caller holds worker.write_lock
+        process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT,
+             "--shard", str(worker.index), "--shards", str(len(self._workers)),
+             "--config", self.config_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        worker.process = process
+        threading.Thread(target=self._read_results, args=(worker, process), daemon=True).start()
+
+    def submit(self, spec: Dict[str, Any], callback: Optional[Callable[[Any, float], None]] = None):
+        """
+        Send ``spec`` to the worker that owns its team. ``callback(result,
+        elapsed_seconds)`` runs once the result has been recorded.
+        """
+        worker = self._workers[self.shard_for(spec['team_id'])]
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("WorkerPool has been stopped")
+            self._next_id += 1
+            request_id = self._next_id
+            self._in_flight += 1
+        line = json.dumps({"id": request_id, "spec": spec}, separators=(",", ":")).encode("utf-8") + b"\n"
+
+        failed = None
+        with worker.write_lock:
+            worker.pending[request_id] = (spec, callback)
+            try:
+                if worker.process is None:
+                    self._spawn(worker)
+                worker.process.stdin.write(line)
+                worker.process.stdin.flush()
+            except OSError as err:
+                print(f"Failed to send check to grading worker {worker.index}:", repr(err))
+                # If the process is running, its reader thread fails the
+                # check once it notices the process has gone.
+                if worker.process is None:
+                    worker.pending.pop(request_id, None)
+                    failed = str(err)
+        if failed is not None:
+            self._complete(spec, callback, (False, failed), 0.0, record=False)
+
+    def _read_results(self, worker: _Worker, process: subprocess.Popen):
+        for line in process.stdout:
+            try:
+                message = json.loads(line)
+                request_id = message["id"]
+            except (ValueError, KeyError, TypeError):
+                continue
+            with worker.write_lock:
+                job = worker.pending.pop(request_id, None)
+            if job is None:
+                continue
+            spec, callback = job
+            self._complete(spec, callback, (bool(message.get("ok")), str(message.get("message", ""))),
+                           float(message.get("elapsed", 0.0)))
+
+        # The worker exited; don't score its unfinished checks against the
+        # teams, and start a fresh process on the next submit.
+        code = process.wait()
+        with worker.write_lock:
+            if worker.process is process:
+                worker.process = None
+            orphaned = list(worker.pending.values())
+            worker.pending.clear()
+        if not self._stopped:
+            print(f"Grading worker {worker.index} exited with code {code}; "
+                  f"{len(orphaned)} checks dropped")
+        for spec, callback in orphaned:
+            self._complete(spec, callback, (False, "Grading worker exited"), 0.0, record=False)
+
+    def _complete(self, spec, callback, result, elapsed, record=True):
+        try:
+            if record:
+                self.on_result(spec, result[0], result[1], elapsed)
+            if callback is not None:
+                callback(result, elapsed)
+        except Exception as err:
+            print(f"Result handler for {spec.get('service')} raised:", repr(err))
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def pending_count(self) -> int:
+        """Number of checks sent to workers and not yet answered."""
+        with self._cond:
+            return self._in_flight
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every submitted check has been answered."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def stop(self):
+        """Close the workers' stdin; they exit once their checks finish."""
+        with self._cond:
+            self._stopped = True
+        for worker in self._workers:
+            with worker.write_lock:
+                if worker.process is not None:
+                    try:
+                        worker.process.stdin.close()
+                    except OSError:
+                        pass